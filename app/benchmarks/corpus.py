@@ -0,0 +1,58 @@
+import json
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+CHANNELS = ["finprofit", "omyinvestments", "ecotopor", "markettwits", "bankrollo"]
+
+VOCABULARY = (
+    "ставка ЦБ ключевая инфляция рубль доллар евро юань курс нефть Brent газ золото биткоин "
+    "акции облигации ОФЗ дивиденды отчетность выручка прибыль EBITDA долг IPO байбэк индекс "
+    "Мосбиржа РТС S&P ФРС ЕЦБ санкции экспорт импорт бюджет дефицит налог НДС ВВП рост падение "
+    "прогноз аналитики снижение повышение рекордный квартал год месяц неделя вклады депозиты "
+    "ипотека кредит банк Сбербанк ВТБ Газпром Лукойл Роснефть Норникель Яндекс Ozon МТС Магнит "
+    "$SBER $GAZP $LKOH $YDEX $GMKN $ROSN $VTBR 21% 16,5% 100 млрд млн трлн руб"
+).split()
+
+
+def generate_corpus(n: int, seed: int = 0, days: int = 365, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Synthetic Telegram posts in the telegram_messages.json shape, newest first.
+
+    Word frequencies follow a Zipf-like distribution, post lengths vary
+    between 15 and 150 words and dates are spread over the last days days.
+    """
+    rng = np.random.default_rng(seed)
+    now = now or datetime.now(timezone.utc)
+    weights = 1.0 / np.arange(1, len(VOCABULARY) + 1)
+    weights /= weights.sum()
+
+    lengths = rng.integers(15, 150, size=n)
+    words = rng.choice(len(VOCABULARY), size=int(lengths.sum()), p=weights)
+    ages = np.sort(rng.uniform(0, days * 86400, size=n))
+    channels = rng.integers(0, len(CHANNELS), size=n)
+
+    documents, offset = [], 0
+    for i in range(n):
+        text = " ".join(VOCABULARY[w] for w in words[offset : offset + lengths[i]])
+        offset += lengths[i]
+        documents.append({
+            "text": text,
+            "link": f"https://t.me/{CHANNELS[channels[i]]}/{n - i}",
+            "date": (now - timedelta(seconds=float(ages[i]))).isoformat(),
+        })
+    return documents
+
+
+def generate_queries(n: int, seed: int = 1) -> List[str]:
+    rng = np.random.default_rng(seed)
+    return [
+        " ".join(VOCABULARY[w] for w in rng.choice(len(VOCABULARY), size=rng.integers(3, 7), replace=False))
+        + "?"
+        for _ in range(n)
+    ]
+
+
+def write_corpus(path: str, documents: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(documents, f, ensure_ascii=False, indent=4)
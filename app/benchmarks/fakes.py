@@ -0,0 +1,86 @@
+import hashlib
+import time
+import numpy as np
+from typing import Callable, Iterator, List, Optional
+
+import gpt_client
+from sparse_index import tokenize
+
+
+class FakeEmbeddingBackend:
+    """
+    Deterministic offline stand-in for an embedding API.
+
+    A text is embedded as its normalized bag of hashed tokens, so texts
+    sharing words end up close together and retrieval behaves plausibly,
+    while the cost is pure local CPU.
+    """
+
+    def __init__(self, dimension: int = 256, batch_size: int = 512, latency_s: float = 0.0):
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self.latency_s = latency_s
+        self.name = f"fake-{dimension}"
+        self.calls = 0
+
+    def _bucket(self, token: str) -> int:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest()
+        return int.from_bytes(digest, "little") % self.dimension
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        vectors = np.zeros((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                vectors[row, self._bucket(token)] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-6)
+
+    def embed_many(self, texts: List[str], on_batch: Callable[[List[str], np.ndarray], None]):
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i : i + self.batch_size]
+            on_batch(batch, self.embed(batch))
+
+
+class FakeGPTClient:
+    """
+    Offline stand-in for GPTTunnelClient that answers with a canned text.
+
+    Args:
+        answer: Text returned for every request
+        first_token_s: Simulated time to first token
+        chunk_words: Words per streamed chunk
+    """
+
+    def __init__(self, answer: Optional[str] = None, first_token_s: float = 0.0, chunk_words: int = 3):
+        self.answer = answer or "Краткий ответ.\n" + " ".join(["Подробный ответ по источникам."] * 40)
+        self.first_token_s = first_token_s
+        self.chunk_words = chunk_words
+        self.requests = 0
+
+    def chat_completion(self, messages, model="gpt-4o", **params) -> str:
+        self.requests += 1
+        if self.first_token_s:
+            time.sleep(self.first_token_s)
+        return self.answer
+
+    def stream_chat_completion(self, messages, model="gpt-4o", **params) -> Iterator[str]:
+        self.requests += 1
+        if self.first_token_s:
+            time.sleep(self.first_token_s)
+        words = self.answer.split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            yield " ".join(words[i : i + self.chunk_words]) + " "
+
+    def close(self):
+        pass
+
+
+def install_fake_llm(client: Optional[FakeGPTClient] = None) -> FakeGPTClient:
+    """Make gpt_client's module-level helpers use a fake client."""
+    client = client or FakeGPTClient()
+    with gpt_client._default_client_lock:
+        gpt_client._default_client = client
+    return client
@@ -0,0 +1,208 @@
+"""
+Offline benchmarks for indexing, retrieval and startup.
+
+Run from the app directory:
+
+    python -m benchmarks.run --sizes 1k,100k
+    python -m benchmarks.run --sizes 1k,100k,1m --save-baseline
+
+Building and serving each corpus size run in separate subprocesses, so
+peak RSS is measured per phase and startup is measured from a fresh
+process. Embeddings and LLM calls are served by the deterministic fakes,
+so results only reflect local work and no API key is needed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+from typing import Any, Dict, List
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Differences below these floors are noise, whatever the relative change
+ABSOLUTE_FLOORS = {"_s": 0.05, "_ms": 0.5, "_mb": 32.0}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def percentiles(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def corpus_paths(workdir: str) -> Dict[str, str]:
+    return {
+        "data_file": os.path.join(workdir, "telegram_messages.json"),
+        "index_file": os.path.join(workdir, "faiss_index.idx"),
+        "cache_file": os.path.join(workdir, "embedding_cache.pkl"),
+        "store_file": os.path.join(workdir, "embedding_store"),
+        "snapshot_dir": os.path.join(workdir, "snapshots"),
+    }
+
+
+def run_build(size: int, workdir: str) -> Dict[str, Any]:
+    """Generate a corpus, build its index and apply one refresh, as the refresh worker would."""
+    from rag_system import RAGSystem
+    from market_data import MarketDataFetcher
+    from benchmarks.corpus import generate_corpus, write_corpus
+    from benchmarks.fakes import FakeEmbeddingBackend
+
+    paths = corpus_paths(workdir)
+    documents = generate_corpus(size)
+    write_corpus(paths["data_file"], documents)
+    del documents
+
+    start = time.perf_counter()
+    writer = RAGSystem(embedding_backend=FakeEmbeddingBackend(), **paths)
+    build_s = time.perf_counter() - start
+
+    # one refresh worth of new posts, without touching the network
+    writer.market_data = MarketDataFetcher(sources=[], cache_file=os.path.join(workdir, "market.json"))
+    batch = generate_corpus(max(size // 100, 10), seed=2)
+    for i, msg in enumerate(batch):
+        msg["link"] = f"https://t.me/benchmark/{i}"
+    start = time.perf_counter()
+    writer.update_documents(batch)
+    update_s = time.perf_counter() - start
+
+    return {
+        "build_s": round(build_s, 3),
+        "update_s": round(update_s, 3),
+        "build_peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_serve(workdir: str, n_queries: int) -> Dict[str, Any]:
+    """Start a read-only instance like the app does and answer questions with the fake LLM."""
+    from rag_system import RAGSystem
+    from context_builder import ContextBuilder
+    from gpt_client import stream_chat_completion_with_history
+    from benchmarks.corpus import generate_queries
+    from benchmarks.fakes import FakeEmbeddingBackend, install_fake_llm
+
+    install_fake_llm()
+    start = time.perf_counter()
+    rag_system = RAGSystem(embedding_backend=FakeEmbeddingBackend(), read_only=True, **corpus_paths(workdir))
+    rag_system.warm_up()
+    result = {"cold_start_s": round(time.perf_counter() - start, 3)}
+
+    retrieval_ms, answer_ms = [], []
+    context_builder = ContextBuilder()
+    for query in generate_queries(n_queries):
+        start = time.perf_counter()
+        docs = rag_system.get_relevant_documents(query)
+        retrieval_ms.append((time.perf_counter() - start) * 1000)
+
+        context, _ = context_builder.build_context(docs)
+        history = context_builder.build_history([])
+        "".join(stream_chat_completion_with_history(f"Context: {context}\n\nQuestion: {query}", history))
+        answer_ms.append((time.perf_counter() - start) * 1000)
+
+    result.update({f"retrieval_{k}": v for k, v in percentiles(retrieval_ms).items()})
+    result.update({f"answer_{k}": v for k, v in percentiles(answer_ms).items()})
+    result["serve_peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_child(*args: str) -> Dict[str, Any]:
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", *args],
+        cwd=app_dir,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"benchmark step {args} failed:\n{completed.stderr}")
+    # the result is the last line; everything before it is RAGSystem logging
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_size(size: int, n_queries: int) -> Dict[str, Any]:
+    """Build and serve one corpus size, each phase in a fresh process."""
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        result = {"size": size}
+        result.update(run_child("--build", str(size), "--workdir", workdir))
+        result.update(run_child("--serve", "--workdir", workdir, "--queries", str(n_queries)))
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def find_regressions(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Metrics that got slower or bigger than the baseline by more than tolerance."""
+    regressions = []
+    for metric, old in baseline.items():
+        floor = next((v for suffix, v in ABSOLUTE_FLOORS.items() if metric.endswith(suffix)), None)
+        new = result.get(metric)
+        if floor is None or new is None:
+            continue
+        if new > old * (1 + tolerance) and new - old > floor:
+            regressions.append(f"{metric}: {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline indexing, retrieval and startup benchmarks")
+    parser.add_argument("--sizes", default="1k,100k", help="Corpus sizes, e.g. 1k,100k,1m")
+    parser.add_argument("--queries", type=int, default=200, help="Questions per corpus")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--build", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build is not None:
+        print(json.dumps(run_build(args.build, args.workdir)))
+        return
+    if args.serve:
+        print(json.dumps(run_serve(args.workdir, args.queries)))
+        return
+
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    failed = False
+    for size in (parse_size(text) for text in args.sizes.split(",")):
+        result = run_size(size, args.queries)
+        print(json.dumps(result))
+        if args.save_baseline:
+            baselines[str(size)] = result
+        elif str(size) in baselines:
+            regressions = find_regressions(result, baselines[str(size)], args.tolerance)
+            for regression in regressions:
+                print(f"REGRESSION ({size} documents) {regression}")
+            failed = failed or bool(regressions)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline saved to {BASELINE_FILE}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,94 @@
 import json
 import os
+import hashlib
+import sqlite3
+import threading
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    filename TEXT PRIMARY KEY,
+    session_name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    log_size INTEGER NOT NULL,
+    last_message_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+"""
+
+
+def message_hash(message: Dict[str, Any]) -> str:
+    encoded = json.dumps(message, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
 
 class ChatManager:
-    """Manages chat history with save/load functionality."""
+    """
+    Manages chat history with save/load functionality.
+
+    Every session is an append-only JSON Lines log (one message per line)
+    plus a row in a SQLite index holding its metadata, so listing sessions
+    never opens the logs and saving a growing conversation only appends the
+    new messages. Sessions saved by older versions as whole .json files are
+    indexed once and converted to a log the next time they are saved.
+    """
     
     def __init__(self, history_dir: str = "data/chat_history"):
         self.history_dir = history_dir
         self.ensure_history_dir()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.history_dir, "sessions.sqlite"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self.index_legacy_sessions()
     
     def ensure_history_dir(self):
         """Ensure the history directory exists."""
         if not os.path.exists(self.history_dir):
             os.makedirs(self.history_dir)
     
+    def index_legacy_sessions(self):
+        """Add metadata of whole-file .json sessions that are not indexed yet."""
+        with self._lock:
+            indexed = {row[0] for row in self._conn.execute("SELECT filename FROM sessions")}
+        for filename in os.listdir(self.history_dir):
+            if not filename.endswith('.json') or filename in indexed:
+                continue
+            filepath = os.path.join(self.history_dir, filename)
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                modified = datetime.fromtimestamp(os.stat(filepath).st_mtime).isoformat()
+                if isinstance(data, dict) and "metadata" in data:
+                    metadata = data["metadata"]
+                    session_name = metadata.get("session_name", filename[:-len('.json')])
+                    created_at = metadata.get("created_at", modified)
+                    message_count = len(data.get("chat_history", []))
+                else:
+                    session_name = filename[:-len('.json')]
+                    created_at = modified
+                    message_count = len(data) if isinstance(data, list) else 0
+            except Exception as e:
+                print(f"Error reading {filename}: {e}")
+                continue
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                    (filename, session_name, created_at, created_at, message_count, 0),
+                )
+    
     def save_chat_history(self, chat_history: List[Dict[str, Any]], session_name: str = None) -> str:
         """
-        Save chat history to a JSON file.
+        Save chat history to the session's message log.
+        
+        Messages already in the log are not written again; the log is only
+        rewritten when the history no longer starts with what was saved.
         
         Args:
             chat_history: List of chat messages
@@ -29,27 +100,53 @@ class ChatManager:
         if not session_name:
             session_name = f"chat_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        filename = f"{session_name}.json"
+        filename = f"{session_name}.jsonl"
         filepath = os.path.join(self.history_dir, filename)
+        now = datetime.now().isoformat()
         
-        # Add metadata
-        save_data = {
-            "metadata": {
-                "created_at": datetime.now().isoformat(),
-                "message_count": len(chat_history),
-                "session_name": session_name
-            },
-            "chat_history": chat_history
-        }
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, message_count, log_size, last_message_hash FROM sessions WHERE filename = ?",
+                (filename,),
+            ).fetchone()
+            
+            created_at, saved_count, log_size = now, 0, 0
+            if row is not None:
+                created_at = row[0]
+                count, size, last_hash = row[1], row[2], row[3]
+                if 0 < count <= len(chat_history) and message_hash(chat_history[count - 1]) == last_hash:
+                    saved_count, log_size = count, size
+            
+            # Cut anything a crashed save appended after the indexed size
+            with open(filepath, 'ab') as f:
+                f.truncate(log_size)
+                lines = "".join(
+                    json.dumps(message, ensure_ascii=False) + "\n" for message in chat_history[saved_count:]
+                )
+                f.write(lines.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+                log_size = f.tell()
+            
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        filename, session_name, created_at, now, len(chat_history), log_size,
+                        message_hash(chat_history[-1]) if chat_history else None,
+                    ),
+                )
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, ensure_ascii=False, indent=2)
+        # A legacy whole-file session with the same name is superseded by the log
+        legacy_filename = f"{session_name}.json"
+        if os.path.exists(os.path.join(self.history_dir, legacy_filename)):
+            self.delete_session(legacy_filename)
         
         return filepath
     
     def load_chat_history(self, filename: str) -> List[Dict[str, Any]]:
         """
-        Load chat history from a JSON file.
+        Load chat history of a saved session.
         
         Args:
             filename: Name of the file to load
@@ -62,6 +159,16 @@ class ChatManager:
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Chat history file not found: {filepath}")
         
+        if filename.endswith('.jsonl'):
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT log_size FROM sessions WHERE filename = ?", (filename,)
+                ).fetchone()
+            with open(filepath, 'rb') as f:
+                # ignore a partial append that never made it into the index
+                data = f.read(row[0]) if row is not None else f.read()
+            return [json.loads(line) for line in data.decode('utf-8').splitlines() if line]
+        
         with open(filepath, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
@@ -73,45 +180,38 @@ class ChatManager:
         else:
             raise ValueError("Invalid chat history file format")
     
-    def list_saved_sessions(self) -> List[Dict[str, Any]]:
+    def list_saved_sessions(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
         """
-        List all saved chat sessions.
+        List saved chat sessions, most recently saved first.
         
+        Args:
+            limit: Return at most this many sessions (all if None)
+            offset: Number of sessions to skip, for pagination
+            
         Returns:
             List of session info dictionaries
         """
-        sessions = []
-        
-        if not os.path.exists(self.history_dir):
-            return sessions
-        
-        for filename in os.listdir(self.history_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(self.history_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    if isinstance(data, dict) and "metadata" in data:
-                        session_info = data["metadata"].copy()
-                        session_info["filename"] = filename
-                        sessions.append(session_info)
-                    else:
-                        # Old format - create basic metadata
-                        stat = os.stat(filepath)
-                        sessions.append({
-                            "filename": filename,
-                            "session_name": filename.replace('.json', ''),
-                            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                            "message_count": len(data) if isinstance(data, list) else "Unknown"
-                        })
-                except Exception as e:
-                    print(f"Error reading {filename}: {e}")
-                    continue
-        
-        # Sort by creation date (newest first)
-        sessions.sort(key=lambda x: x["created_at"], reverse=True)
-        return sessions
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, session_name, created_at, updated_at, message_count FROM sessions "
+                "ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [
+            {
+                "filename": filename,
+                "session_name": session_name,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "message_count": message_count,
+            }
+            for filename, session_name, created_at, updated_at, message_count in rows
+        ]
+    
+    def count_sessions(self) -> int:
+        """Number of saved sessions."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
     
     def delete_session(self, filename: str) -> bool:
         """
@@ -126,10 +226,14 @@ class ChatManager:
         filepath = os.path.join(self.history_dir, filename)
         
         try:
+            with self._lock, self._conn:
+                deleted = self._conn.execute(
+                    "DELETE FROM sessions WHERE filename = ?", (filename,)
+                ).rowcount
             if os.path.exists(filepath):
                 os.remove(filepath)
                 return True
-            return False
+            return deleted > 0
         except Exception as e:
             print(f"Error deleting {filename}: {e}")
             return False
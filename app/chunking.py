@@ -0,0 +1,163 @@
+import os
+import re
+import hashlib
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+
+# Long posts are split into windows of CHUNK_WORDS words that overlap by
+# CHUNK_OVERLAP words, so a fact on a window border is whole in one chunk
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+
+# End offset of a chunk that runs to the end of its parent's text
+WHOLE = -1
+
+WORD_PATTERN = re.compile(r"\S+")
+
+
+def chunk_spans(text: str, chunk_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP) -> List[Tuple[int, int]]:
+    """
+    Character spans of the chunks of a text. Texts of up to chunk_words
+    words are a single (0, WHOLE) chunk.
+    """
+    words = [match.span() for match in WORD_PATTERN.finditer(text)]
+    if len(words) <= chunk_words:
+        return [(0, WHOLE)]
+    step = chunk_words - overlap_words
+    spans = []
+    for first in range(0, len(words), step):
+        last = min(first + chunk_words, len(words)) - 1
+        spans.append((words[first][0], words[last][1]))
+        if last == len(words) - 1:
+            break
+    return spans
+
+
+def chunk_id(parent_id: int, number: int) -> int:
+    """Stable 63-bit FAISS id of the number-th chunk of a split document."""
+    digest = hashlib.blake2b(
+        parent_id.to_bytes(8, "little") + number.to_bytes(4, "little"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF
+
+
+def excerpt(text: str, spans: Iterable[Tuple[int, int]]) -> str:
+    """The parts of a text covered by the given chunk spans, overlaps merged, in text order."""
+    merged = []
+    for start, end in sorted(spans):
+        if end == WHOLE:
+            return text
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return " … ".join(text[start:end] for start, end in merged)
+
+
+class ChunkTable:
+    """
+    Array-backed map from the chunk ids in the indexes to their parent
+    documents and character spans.
+
+    A post that fits in one chunk keeps its document id as chunk id and
+    spans its whole text, so short posts reuse their whole-text embeddings.
+    Chunk texts are never stored; they are sliced from the parent on demand.
+    """
+
+    def __init__(self, ids: np.ndarray, parents: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+        self.ids = ids
+        self.parents = parents
+        self.starts = starts
+        self.ends = ends
+        self._order = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._order]
+
+    @classmethod
+    def empty(cls) -> "ChunkTable":
+        return cls.whole_documents(np.empty(0, dtype="int64"))
+
+    @classmethod
+    def whole_documents(cls, doc_ids: np.ndarray) -> "ChunkTable":
+        """One chunk per document, as indexes built before chunking have."""
+        doc_ids = np.asarray(doc_ids, dtype="int64")
+        return cls(doc_ids, doc_ids, np.zeros(len(doc_ids), dtype="int32"), np.full(len(doc_ids), WHOLE, dtype="int32"))
+
+    @classmethod
+    def from_texts(cls, texts: Dict[int, str], chunk_words: int = CHUNK_WORDS,
+                   overlap_words: int = CHUNK_OVERLAP) -> "ChunkTable":
+        """
+        Args:
+            texts: Document texts keyed by document id
+        """
+        ids, parents, starts, ends = [], [], [], []
+        for doc_id, text in texts.items():
+            spans = chunk_spans(text, chunk_words, overlap_words)
+            for number, (start, end) in enumerate(spans):
+                ids.append(doc_id if len(spans) == 1 else chunk_id(doc_id, number))
+                parents.append(doc_id)
+                starts.append(start)
+                ends.append(end)
+        return cls(
+            np.array(ids, dtype="int64"),
+            np.array(parents, dtype="int64"),
+            np.array(starts, dtype="int32"),
+            np.array(ends, dtype="int32"),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ChunkTable":
+        with np.load(path) as data:
+            return cls(data["ids"], data["parents"], data["starts"], data["ends"])
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, ids=self.ids, parents=self.parents, starts=self.starts, ends=self.ends)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def texts(self, parent_texts: Dict[int, str]) -> List[str]:
+        """Chunk texts in table order, sliced from the parent texts keyed by document id."""
+        return [
+            parent_texts[parent][start:] if end == WHOLE else parent_texts[parent][start:end]
+            for parent, start, end in zip(self.parents.tolist(), self.starts.tolist(), self.ends.tolist())
+        ]
+
+    def lookup(self, chunk_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Map chunk ids returned by a search to their parents and spans.
+
+        Returns:
+            Tuple of (parent ids, starts, ends); parent id -1 for unknown chunks
+        """
+        chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        if len(self._sorted_ids) == 0:
+            missing = np.full(chunk_ids.shape, -1, dtype="int64")
+            return missing, np.zeros_like(missing), np.zeros_like(missing)
+        slots = np.minimum(np.searchsorted(self._sorted_ids, chunk_ids), len(self._sorted_ids) - 1)
+        found = self._sorted_ids[slots] == chunk_ids
+        rows = self._order[slots]
+        return (
+            np.where(found, self.parents[rows], -1),
+            self.starts[rows],
+            self.ends[rows],
+        )
+
+    def without_parents(self, parent_ids: Iterable[int]) -> Tuple["ChunkTable", List[int]]:
+        """
+        Returns:
+            Tuple of (table without the chunks of these documents, ids of the removed chunks)
+        """
+        drop = np.isin(self.parents, np.asarray(list(parent_ids), dtype="int64"))
+        keep = ~drop
+        table = ChunkTable(self.ids[keep], self.parents[keep], self.starts[keep], self.ends[keep])
+        return table, self.ids[drop].tolist()
+
+    def concat(self, other: "ChunkTable") -> "ChunkTable":
+        return ChunkTable(
+            np.concatenate([self.ids, other.ids]),
+            np.concatenate([self.parents, other.parents]),
+            np.concatenate([self.starts, other.starts]),
+            np.concatenate([self.ends, other.ends]),
+        )
@@ -0,0 +1,123 @@
+import re
+from typing import List, Dict, Any, Tuple
+
+from tokens import count_tokens, truncate_tokens
+
+# gpt-4o tokenizer
+ENCODING = "o200k_base"
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Word n-grams of a normalized text, used for near-duplicate checks."""
+    words = re.findall(r"\w+", text.casefold())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextBuilder:
+    """
+    Assembles the retrieval context and conversation history for a question
+    within fixed token budgets.
+
+    Args:
+        context_budget: Tokens available for retrieved documents
+        history_budget: Tokens available for previous messages
+        max_doc_tokens: Longer posts are truncated to this many tokens
+        max_message_tokens: Longer history messages are truncated to this many tokens
+        history_window: Number of most recent messages passed verbatim
+        dedup_threshold: Shingle Jaccard similarity above which posts count as duplicates
+    """
+
+    def __init__(self, context_budget: int = 6000, history_budget: int = 2000, max_doc_tokens: int = 500,
+                 max_message_tokens: int = 600, history_window: int = 6, dedup_threshold: float = 0.8):
+        self.context_budget = context_budget
+        self.history_budget = history_budget
+        self.max_doc_tokens = max_doc_tokens
+        self.max_message_tokens = max_message_tokens
+        self.history_window = history_window
+        self.dedup_threshold = dedup_threshold
+
+    def build_context(self, documents: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Fill the context budget with documents in score order.
+
+        Args:
+            documents: Retrieved documents, best first
+
+        Returns:
+            Tuple of (context text, documents that made it into the context)
+        """
+        lines, used_docs, kept_shingles = [], [], []
+        used_tokens = 0
+        for doc in documents:
+            doc_shingles = shingles(doc["text"])
+            if any(jaccard(doc_shingles, kept) >= self.dedup_threshold for kept in kept_shingles):
+                continue
+
+            text = truncate_tokens(doc["text"], self.max_doc_tokens, ENCODING)
+            line = f"{text} [Link to Info]({doc['link']})"
+            tokens = count_tokens(line, ENCODING)
+            if used_tokens + tokens > self.context_budget:
+                # a shorter post further down may still fit
+                continue
+
+            lines.append(line)
+            used_docs.append(doc)
+            kept_shingles.append(doc_shingles)
+            used_tokens += tokens
+        return "\n".join(lines), used_docs
+
+    def build_history(self, chat_history: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Keep the most recent messages that fit the history budget and replace
+        everything older with a short extractive summary.
+
+        Returns:
+            List of {"role", "content"} messages, oldest first
+        """
+        messages = [msg for msg in chat_history if msg["role"] in ("user", "assistant")]
+        recent, used_tokens = [], 0
+        for msg in reversed(messages[-self.history_window:]):
+            content = truncate_tokens(msg["content"], self.max_message_tokens, ENCODING)
+            tokens = count_tokens(content, ENCODING)
+            if used_tokens + tokens > self.history_budget:
+                break
+            recent.append({"role": msg["role"], "content": content})
+            used_tokens += tokens
+        recent.reverse()
+
+        older = messages[: len(messages) - len(recent)]
+        if not older or used_tokens >= self.history_budget:
+            return recent
+
+        summary = self.summarize(older, self.history_budget - used_tokens)
+        return [{"role": "system", "content": summary}] + recent
+
+    def summarize(self, messages: List[Dict[str, Any]], max_tokens: int) -> str:
+        """
+        Extractive summary of older turns: each question and the first line
+        of each answer (the assistant is prompted to open with a short summary).
+        """
+        points = []
+        for msg in messages:
+            first_line = msg["content"].strip().split("\n", 1)[0]
+            prefix = "Вопрос" if msg["role"] == "user" else "Ответ"
+            points.append(f"- {prefix}: {truncate_tokens(first_line, 60, ENCODING)}")
+
+        header = "Краткое содержание предыдущей части диалога:"
+        # keep the newest points when the summary itself is over budget
+        kept, used_tokens = [], count_tokens(header, ENCODING)
+        for point in reversed(points):
+            tokens = count_tokens(point, ENCODING)
+            if used_tokens + tokens > max_tokens:
+                break
+            kept.append(point)
+            used_tokens += tokens
+        return "\n".join([header] + kept[::-1])
@@ -0,0 +1,169 @@
+import hashlib
+import numpy as np
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from context_builder import jaccard, shingles
+
+# MinHash signatures have one value per permutation; LSH splits them into
+# bands of NUM_PERMUTATIONS // bands rows
+NUM_PERMUTATIONS = 128
+
+# Posts with fewer word 3-grams than this are too short to fingerprint reliably
+MIN_SHINGLES = 8
+
+# Reposts with a signature or a few edited words stay above this; templated
+# posts that only differ in their numbers fall below it
+MIN_SIMILARITY = 0.75
+
+# Multiply-shift hash functions h(x) = (a * x + b) mod 2**64 >> 32, a odd;
+# fixed so that signatures are comparable across processes
+_rng = np.random.default_rng(0x5EED)
+_MULTIPLIERS = _rng.integers(0, 2**63, size=NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_INCREMENTS = _rng.integers(0, 2**63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """
+    MinHash signature (NUM_PERMUTATIONS uint32 values) of a text's word
+    3-grams, or None for very short texts. The share of equal values of two
+    signatures estimates the Jaccard similarity of the texts' shingles.
+    """
+    grams = shingles(text)
+    if len(grams) < MIN_SHINGLES:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+         for gram in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+    with np.errstate(over="ignore"):
+        permuted = hashes[:, None] * _MULTIPLIERS + _INCREMENTS
+    return (permuted >> np.uint64(32)).astype(np.uint32).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of recent canonical documents.
+
+    Signatures are split into bands; documents sharing all values of any
+    band are candidates. With 32 bands of 4 rows a pair at Jaccard 0.75 is
+    found with near certainty and one at 0.3 only rarely, however short the
+    posts are. Candidates are confirmed by exact shingle similarity. Only
+    documents from the last window_days are kept, since reposts follow the
+    original within days.
+    """
+
+    def __init__(self, bands: int = 32, window_days: float = 7.0):
+        self.bands = bands
+        self.rows = NUM_PERMUTATIONS // bands
+        self.window_seconds = window_days * 86400
+        self.buckets = [{} for _ in range(self.bands)]
+        self.entries = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _band_values(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows : (band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, link: str, signature: np.ndarray, epoch: float):
+        self.remove(link)
+        self.entries[link] = (signature, epoch)
+        for bucket, value in zip(self.buckets, self._band_values(signature)):
+            bucket.setdefault(value, set()).add(link)
+
+    def remove(self, link: str):
+        entry = self.entries.pop(link, None)
+        if entry is None:
+            return
+        for bucket, value in zip(self.buckets, self._band_values(entry[0])):
+            links = bucket.get(value)
+            if links is not None:
+                links.discard(link)
+                if not links:
+                    del bucket[value]
+
+    def candidates(self, signature: np.ndarray) -> List[str]:
+        """Links of indexed documents sharing a band with the signature, most similar first."""
+        found = {}
+        for bucket, value in zip(self.buckets, self._band_values(signature)):
+            for link in bucket.get(value, ()):
+                if link not in found:
+                    found[link] = float(np.mean(signature == self.entries[link][0]))
+        return sorted(found, key=found.get, reverse=True)
+
+    def expire(self, now: float):
+        cutoff = now - self.window_seconds
+        for link in [link for link, (_, epoch) in self.entries.items() if epoch < cutoff]:
+            self.remove(link)
+
+
+def collapse_duplicates(messages: List[Dict[str, Any]], index: NearDuplicateIndex,
+                        load_stored: Callable[[List[str]], List[Dict[str, Any]]],
+                        include: Callable[[Dict[str, Any]], bool] = lambda msg: True,
+                        min_similarity: float = MIN_SIMILARITY) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Fold near-duplicate posts into one canonical document.
+
+    The earliest post of a cluster is canonical; the links of its reposts
+    are collected in its "alt_links" and the reposts are dropped. A post
+    that repeats an already stored document adds its link to that document
+    instead, which is then returned again so the store picks up the change
+    (its text is unchanged, so it is not re-embedded).
+
+    Args:
+        messages: New documents with normalized ISO dates
+        index: Signatures of recent canonical documents; updated in place
+        load_stored: Fetches stored documents by link
+        include: Whether a message takes part in deduplication at all
+        min_similarity: Shingle Jaccard similarity that confirms a MinHash candidate
+
+    Returns:
+        Tuple of (documents to ingest, number of dropped duplicates)
+    """
+    canonical = {}
+    stored = {}
+    updated = {}
+    dropped = set()
+
+    def lookup(link: str) -> Optional[Dict[str, Any]]:
+        if link in canonical:
+            return canonical[link]
+        if link not in stored:
+            found = load_stored([link])
+            stored[link] = found[0] if found else None
+        return stored[link]
+
+    order = sorted(range(len(messages)), key=lambda i: messages[i]["date"])
+    for i in order:
+        msg = messages[i]
+        if msg["text"] == "" or not include(msg):
+            continue
+        signature = minhash(msg["text"])
+        if signature is None:
+            continue
+        grams = shingles(msg["text"])
+        match = None
+        for link in index.candidates(signature):
+            if link == msg["link"]:
+                continue
+            doc = lookup(link)
+            if doc is not None and jaccard(grams, shingles(doc["text"])) >= min_similarity:
+                match = doc
+                break
+
+        if match is None:
+            index.add(msg["link"], signature, datetime.fromisoformat(msg["date"]).timestamp())
+            canonical[msg["link"]] = msg
+            continue
+        alt_links = match.setdefault("alt_links", [])
+        if msg["link"] not in alt_links:
+            alt_links.append(msg["link"])
+        if match["link"] not in canonical:
+            updated[match["link"]] = match
+        dropped.add(i)
+
+    kept = [msg for i, msg in enumerate(messages) if i not in dropped]
+    return kept + list(updated.values()), len(dropped)
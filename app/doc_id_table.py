@@ -0,0 +1,77 @@
+import os
+import hashlib
+import numpy as np
+from typing import List, Dict, Any
+
+# Marks documents that are kept in the store but have no vector in the index
+# (e.g. spam posts whose text was blanked in update_documents).
+NOT_INDEXED = -1
+
+
+def document_id(doc: Dict[str, Any]) -> int:
+    """Stable 63-bit FAISS id of a document, derived from its link."""
+    digest = hashlib.blake2b(doc["link"].encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF
+
+
+class DocIdTable:
+    """
+    Array-backed mapping between FAISS ids and positions in the document store.
+
+    ids[pos] holds the FAISS id of the document at position pos, or
+    NOT_INDEXED if that document has no vector. The table is persisted as a
+    single int64 .npy file next to the index and memory-mapped on load.
+    """
+
+    def __init__(self, ids: np.ndarray):
+        self.ids = ids
+        self._order = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._order]
+
+    @classmethod
+    def from_documents(cls, documents: List[Dict[str, Any]]) -> "DocIdTable":
+        ids = np.fromiter(
+            (document_id(doc) if doc["text"] != "" else NOT_INDEXED for doc in documents),
+            dtype="int64",
+            count=len(documents),
+        )
+        return cls(ids)
+
+    @classmethod
+    def load(cls, path: str) -> "DocIdTable":
+        return cls(np.load(path, mmap_mode="r"))
+
+    def save(self, path: str):
+        """Write the table next to the index, replacing the old one atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(self.ids, dtype="int64"))
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def indexed_ids(self) -> np.ndarray:
+        """Unique ids that are expected to be present in the index."""
+        return np.unique(self.ids[self.ids != NOT_INDEXED])
+
+    def matches(self, other: "DocIdTable") -> bool:
+        return len(self) == len(other) and np.array_equal(self.ids, other.ids)
+
+    def positions(self, doc_ids: np.ndarray) -> np.ndarray:
+        """
+        Map FAISS ids to document positions.
+
+        Args:
+            doc_ids: Ids returned by index.search
+
+        Returns:
+            np.ndarray: Document positions, -1 for ids not in the table
+        """
+        doc_ids = np.asarray(doc_ids, dtype="int64")
+        if len(self._sorted_ids) == 0:
+            return np.full(doc_ids.shape, -1, dtype="int64")
+        slots = np.searchsorted(self._sorted_ids, doc_ids)
+        slots = np.minimum(slots, len(self._sorted_ids) - 1)
+        found = (self._sorted_ids[slots] == doc_ids) & (doc_ids != NOT_INDEXED)
+        return np.where(found, self._order[slots], -1)
@@ -0,0 +1,243 @@
+import json
+import sqlite3
+import threading
+import numpy as np
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote, urlparse
+
+# Fields stored in their own columns; anything else goes into "extra"
+CORE_FIELDS = ("text", "link", "date")
+
+# SQLite limits the number of bound parameters per statement
+MAX_QUERY_PARAMS = 500
+PAGE_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE documents (
+    pos INTEGER PRIMARY KEY,
+    link TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    date TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    extra TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX documents_epoch ON documents (epoch);
+CREATE INDEX documents_channel_epoch ON documents (channel, epoch);
+CREATE INDEX documents_link ON documents (link);
+"""
+
+COLUMNS = "pos, link, channel, date, epoch, text, extra"
+
+
+def channel_of(link: str) -> str:
+    """Telegram channel of a t.me link, or the host name for other sources."""
+    parsed = urlparse(link)
+    if parsed.netloc == "t.me":
+        return parsed.path.strip("/").split("/", 1)[0]
+    return parsed.netloc
+
+
+def epoch_of(date: str) -> int:
+    parsed = datetime.fromisoformat(date)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def to_row(pos: int, doc: Dict[str, Any]) -> tuple:
+    extra = {key: value for key, value in doc.items() if key not in CORE_FIELDS}
+    return (
+        pos,
+        doc["link"],
+        channel_of(doc["link"]),
+        doc["date"],
+        epoch_of(doc["date"]),
+        doc["text"],
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+
+def from_row(row: tuple) -> Dict[str, Any]:
+    doc = {"text": row[5], "link": row[1], "date": row[3]}
+    if row[6]:
+        doc.update(json.loads(row[6]))
+    return doc
+
+
+class DocumentStore:
+    """
+    Read-only document store backed by SQLite.
+
+    Documents are addressed by their position, which is what DocIdTable maps
+    FAISS ids to; texts are only read for the positions asked for. Date,
+    channel and link are indexed, so date-range and link lookups never scan
+    the archive. Stores are built once with create() (or in memory with
+    from_documents()) and never modified afterwards.
+    """
+
+    def __init__(self, path: str = ":memory:", connection: Optional[sqlite3.Connection] = None):
+        self.path = path
+        if connection is not None:
+            self._conn = connection
+        elif path == ":memory:":
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self._conn.executescript(SCHEMA + INDEXES)
+        else:
+            # immutable: snapshot files never change, so SQLite can skip locking
+            self._conn = sqlite3.connect(
+                f"file:{quote(path)}?mode=ro&immutable=1", uri=True, check_same_thread=False
+            )
+        self._lock = threading.Lock()
+        self._len = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    @classmethod
+    def create(cls, path: str, documents: Iterable[Dict[str, Any]], base: Optional["DocumentStore"] = None,
+               exclude_positions: Iterable[int] = ()) -> "DocumentStore":
+        """
+        Write a new store holding documents followed by the documents of
+        base (in their order) whose positions are not excluded.
+        """
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(SCHEMA)
+            pos = cls._insert(conn, documents, 0)
+            if base is not None:
+                excluded = set(exclude_positions)
+                kept = (row for row in base._iter_rows() if row[0] not in excluded)
+                with conn:
+                    conn.executemany(
+                        f"INSERT INTO documents ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        ((new_pos,) + row[1:] for new_pos, row in enumerate(kept, start=pos)),
+                    )
+            conn.executescript(INDEXES)
+            conn.commit()
+        finally:
+            conn.close()
+        return cls(path)
+
+    @classmethod
+    def from_documents(cls, documents: List[Dict[str, Any]]) -> "DocumentStore":
+        """In-memory store, used for the legacy JSON data file."""
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.executescript(SCHEMA)
+        cls._insert(conn, documents, 0)
+        conn.executescript(INDEXES)
+        return cls(connection=conn)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, documents: Iterable[Dict[str, Any]], start: int) -> int:
+        rows = [to_row(pos, doc) for pos, doc in enumerate(documents, start=start)]
+        with conn:
+            conn.executemany(f"INSERT INTO documents ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return start + len(rows)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, pos: int) -> Dict[str, Any]:
+        docs = self.get_many([pos])
+        if not docs:
+            raise IndexError(pos)
+        return docs[0]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in self._iter_rows():
+            yield from_row(row)
+
+    def _query(self, sql: str, params: Iterable[Any] = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    def _iter_rows(self) -> Iterator[tuple]:
+        """All rows in position order, read page by page."""
+        last = -1
+        while True:
+            rows = self._query(
+                f"SELECT {COLUMNS} FROM documents WHERE pos > ? ORDER BY pos LIMIT ?", (last, PAGE_SIZE)
+            )
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    def get_many(self, positions: Iterable[int]) -> List[Dict[str, Any]]:
+        """Documents at the given positions, in that order; unknown positions are skipped."""
+        positions = [int(pos) for pos in positions]
+        found = {}
+        for i in range(0, len(positions), MAX_QUERY_PARAMS):
+            chunk = positions[i : i + MAX_QUERY_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            for row in self._query(f"SELECT {COLUMNS} FROM documents WHERE pos IN ({placeholders})", chunk):
+                found[row[0]] = from_row(row)
+        return [found[pos] for pos in positions if pos in found]
+
+    def find_links(self, links: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Returns:
+            list: {"pos", "link", "text"} of every stored document with one of the links
+        """
+        links = list(dict.fromkeys(links))
+        matches = []
+        for i in range(0, len(links), MAX_QUERY_PARAMS):
+            chunk = links[i : i + MAX_QUERY_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._query(f"SELECT pos, link, text FROM documents WHERE link IN ({placeholders})", chunk)
+            matches.extend({"pos": pos, "link": link, "text": text} for pos, link, text in rows)
+        return matches
+
+    def between(self, start: datetime, end: datetime, channel: Optional[str] = None,
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Documents dated in [start, end), newest first.
+
+        Args:
+            channel: Only documents of this channel (see channel_of)
+            limit: Return at most this many documents
+        """
+        sql = f"SELECT {COLUMNS} FROM documents WHERE epoch >= ? AND epoch < ?"
+        params = [int(start.timestamp()), int(end.timestamp())]
+        if channel is not None:
+            sql += " AND channel = ?"
+            params.append(channel)
+        sql += " ORDER BY epoch DESC, pos"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [from_row(row) for row in self._query(sql, params)]
+
+    def channels_at(self, positions: Iterable[int]) -> Dict[int, str]:
+        """Channel of the document at each of the given positions."""
+        positions = [int(pos) for pos in positions]
+        channels = {}
+        for i in range(0, len(positions), MAX_QUERY_PARAMS):
+            chunk = positions[i : i + MAX_QUERY_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            channels.update(self._query(f"SELECT pos, channel FROM documents WHERE pos IN ({placeholders})", chunk))
+        return channels
+
+    def channel_names(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT DISTINCT channel FROM documents ORDER BY channel")]
+
+    def epochs(self) -> np.ndarray:
+        """Dates of all documents as float64 UTC epoch seconds, in position order."""
+        rows = self._query("SELECT epoch FROM documents ORDER BY pos")
+        return np.fromiter((row[0] for row in rows), dtype="float64", count=len(rows))
+
+    def save(self, path: str):
+        """Copy the whole store to a new database file."""
+        dest = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._conn.backup(dest)
+        finally:
+            dest.close()
+
+    def close(self):
+        self._conn.close()
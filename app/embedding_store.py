@@ -0,0 +1,133 @@
+import os
+import json
+import pickle
+import hashlib
+import numpy as np
+from typing import Iterable, List, Optional
+
+
+def text_key(text: str) -> int:
+    """64-bit content hash used as the store key of a text."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk store of text embeddings.
+
+    Vectors live in a raw float32 matrix (<path>.f32) that is memory-mapped
+    for reads; <path>.keys holds one int64 text hash per matrix row, in the
+    same order. Opening the store reads only the keys, lookups return views
+    into the mapped matrix, and adding a batch appends to both files.
+    """
+
+    def __init__(self, path: str = "data/embedding_store"):
+        self.vectors_file = f"{path}.f32"
+        self.keys_file = f"{path}.keys"
+        self.meta_file = f"{path}.json"
+        self.dim = None
+        self.rows = {}
+        self._vectors = None
+        self.load()
+
+    def load(self):
+        """Read the key index; vectors stay on disk until they are looked up."""
+        if not os.path.exists(self.meta_file):
+            return
+        with open(self.meta_file, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+
+        keys = np.empty(0, dtype="int64")
+        if os.path.exists(self.keys_file):
+            keys = np.fromfile(self.keys_file, dtype="int64")
+        vector_rows = 0
+        if os.path.exists(self.vectors_file):
+            vector_rows = os.path.getsize(self.vectors_file) // (4 * self.dim)
+        # Rows past the shorter of the two files belong to an interrupted append
+        count = min(len(keys), vector_rows)
+        self.rows = dict(zip(keys[:count].tolist(), range(count)))
+        self._truncate(count)
+
+    def _truncate(self, count: int):
+        if os.path.exists(self.keys_file) and os.path.getsize(self.keys_file) > count * 8:
+            os.truncate(self.keys_file, count * 8)
+        if os.path.exists(self.vectors_file) and os.path.getsize(self.vectors_file) > count * 4 * self.dim:
+            os.truncate(self.vectors_file, count * 4 * self.dim)
+
+    def _matrix(self) -> np.ndarray:
+        """Memory-mapped view of all stored vectors, remapped after appends."""
+        if self._vectors is None or len(self._vectors) < len(self.rows):
+            self._vectors = np.memmap(
+                self.vectors_file, dtype="float32", mode="r", shape=(len(self.rows), self.dim)
+            )
+        return self._vectors
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, text: str) -> bool:
+        return text_key(text) in self.rows
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Zero-copy lookup of a single embedding."""
+        row = self.rows.get(text_key(text))
+        if row is None:
+            return None
+        return self._matrix()[row]
+
+    def get_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Gather embeddings of texts that are all present in the store.
+
+        Returns:
+            np.ndarray: float32 matrix of shape (len(texts), dim)
+        """
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype="float32")
+        rows = np.fromiter((self.rows[text_key(t)] for t in texts), dtype="int64", count=len(texts))
+        return self._matrix()[rows]
+
+    def add(self, texts: Iterable[str], embeddings):
+        """
+        Append a batch of embeddings. Texts that are already stored are skipped.
+
+        Args:
+            texts: Embedded texts
+            embeddings: Matching vectors, one per text
+        """
+        keys, vectors, seen = [], [], set()
+        for text, emb in zip(texts, embeddings):
+            key = text_key(text)
+            if key not in self.rows and key not in seen:
+                seen.add(key)
+                keys.append(key)
+                vectors.append(emb)
+        if not keys:
+            return
+
+        vectors = np.asarray(vectors, dtype="float32")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self.meta_file, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "dtype": "float32"}, f)
+
+        # Vectors first: a crash before the keys are written leaves orphan
+        # rows that load() trims, never keys that point past the matrix.
+        with open(self.vectors_file, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.keys_file, "ab") as f:
+            f.write(np.asarray(keys, dtype="int64").tobytes())
+
+        start = len(self.rows)
+        self.rows.update(zip(keys, range(start, start + len(keys))))
+
+    def import_pickle_cache(self, cache_file: str):
+        """One-off migration of the legacy {text: embedding} pickle cache."""
+        with open(cache_file, "rb") as f:
+            cache = pickle.load(f)
+        texts = list(cache)
+        batch_size = 1000
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i : i + batch_size]
+            self.add(batch, [cache[t] for t in batch])
@@ -0,0 +1,243 @@
+import os
+import re
+import time
+import random
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional
+
+import openai
+from openai import OpenAI
+
+from metrics import metrics
+from tokens import count_tokens
+
+DEFAULT_LOCAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# Native output size of the OpenAI embedding models
+OPENAI_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+class EmbeddingError(Exception):
+    """Some batches could not be embedded; the others were already delivered."""
+
+    def __init__(self, failed_texts: List[str], last_error: Exception):
+        super().__init__(f"{len(failed_texts)} texts failed to embed: {last_error}")
+        self.failed_texts = failed_texts
+        self.last_error = last_error
+
+
+def token_batches(texts: List[str], max_batch_size: int, max_batch_tokens: int) -> Iterator[List[str]]:
+    """Split texts into batches bounded by both item count and token count."""
+    batch, batch_tokens = [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if batch and (len(batch) >= max_batch_size or batch_tokens + tokens > max_batch_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def retry_delay(error: Exception, attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter, honouring Retry-After when sent."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), cap)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class OpenAIEmbeddingBackend:
+    """
+    Remote embeddings from the OpenAI API.
+
+    One client (and its connection pool) is shared by all requests. Bulk
+    embedding runs up to max_concurrency batches in parallel, each batch
+    bounded by batch_size texts and max_batch_tokens tokens, and retries
+    429/5xx/connection errors with exponential backoff.
+
+    Args:
+        dimension: Shortened output size, for the text-embedding-3 models;
+            the model's native size if None
+    """
+
+    def __init__(self, model: str = "text-embedding-ada-002", batch_size: int = 100, dimension: Optional[int] = None,
+                 max_concurrency: int = 4, max_batch_tokens: int = 100_000, max_retries: int = 6):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.name = f"openai-{model}"
+        # Only a shortened size is sent to the API; it changes the vectors, so the name too
+        self.requested_dimension = None
+        if dimension is not None and dimension != OPENAI_DIMENSIONS.get(model):
+            self.requested_dimension = dimension
+            self.name += f"-{dimension}"
+        self._dimension = dimension or OPENAI_DIMENSIONS.get(model)
+        # Retries are handled here so that backoff can honour our own policy
+        self.client = OpenAI(max_retries=0)
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        metrics.inc("embedding_requests_total", backend=self.name)
+        metrics.inc("embedding_texts_total", len(texts), backend=self.name)
+        params = {"dimensions": self.requested_dimension} if self.requested_dimension else {}
+        response = self.client.embeddings.create(model=self.model, input=texts, timeout=timeout, **params)
+        if response.usage is not None:
+            metrics.inc("embedding_tokens_total", response.usage.total_tokens, backend=self.name)
+        vectors = np.asarray([data.embedding for data in response.data], dtype="float32")
+        if self._dimension is None and len(vectors):
+            self._dimension = vectors.shape[1]
+        return vectors
+
+    @property
+    def dimension(self) -> int:
+        """Vector size; for models of unknown size it is taken from a first response."""
+        if self._dimension is None:
+            self.embed(["dimension"])
+        return self._dimension
+
+    def embed_with_retry(self, texts: List[str]) -> np.ndarray:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embed(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    metrics.inc("embedding_errors_total", backend=self.name)
+                    raise
+                metrics.inc("embedding_retries_total", backend=self.name)
+                time.sleep(retry_delay(e, attempt))
+
+    def embed_many(self, texts: List[str], on_batch: Callable[[List[str], np.ndarray], None]):
+        """
+        Embed texts concurrently, handing every finished batch to on_batch
+        (in the calling thread) as soon as it arrives.
+
+        Raises:
+            EmbeddingError: If any batch still failed after retries
+        """
+        failed, last_error = [], None
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {
+                pool.submit(self.embed_with_retry, batch): batch
+                for batch in token_batches(texts, self.batch_size, self.max_batch_tokens)
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    on_batch(batch, future.result())
+                except Exception as e:
+                    failed.extend(batch)
+                    last_error = e
+        if failed:
+            raise EmbeddingError(failed, last_error)
+
+
+class SentenceTransformerBackend:
+    """
+    Local multilingual sentence-transformers model running on CPU.
+
+    Args:
+        model_name: Hugging Face model id
+        batch_size: Texts per forward pass; 32-64 is a good range on CPU
+        num_threads: torch intra-op threads, all cores if None
+        quantize: None or "int8" (dynamic quantization of Linear layers)
+    """
+
+    def __init__(self, model_name: str = DEFAULT_LOCAL_MODEL, batch_size: int = 64,
+                 num_threads: Optional[int] = None, quantize: Optional[str] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.quantize = quantize
+        suffix = f"-{quantize}" if quantize else ""
+        self.name = "st-" + re.sub(r"[^\w.-]", "_", model_name.split("/")[-1]) + suffix
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+
+        model = SentenceTransformer(self.model_name, device="cpu")
+        if self.quantize == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif self.quantize:
+            raise ValueError(f"Unknown quantization mode: {self.quantize}")
+        return model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        metrics.inc("embedding_requests_total", backend=self.name)
+        metrics.inc("embedding_texts_total", len(texts), backend=self.name)
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).astype("float32")
+
+    def embed_many(self, texts: List[str], on_batch: Callable[[List[str], np.ndarray], None]):
+        # Deliver in chunks so an interrupted reindex keeps what it computed
+        chunk_size = self.batch_size * 16
+        for i in range(0, len(texts), chunk_size):
+            chunk = texts[i : i + chunk_size]
+            on_batch(chunk, self.embed(chunk))
+
+
+def backend_from_env():
+    """
+    Build the embedding backend configured through environment variables:
+    EMBEDDING_BACKEND ("openai" or "local"), EMBEDDING_MODEL,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, EMBEDDING_DIMENSION,
+    EMBEDDING_THREADS and EMBEDDING_QUANTIZE.
+    """
+    kind = os.environ.get("EMBEDDING_BACKEND", "openai")
+    model = os.environ.get("EMBEDDING_MODEL")
+    batch_size = os.environ.get("EMBEDDING_BATCH_SIZE")
+    dimension = os.environ.get("EMBEDDING_DIMENSION")
+
+    if kind == "openai":
+        return OpenAIEmbeddingBackend(
+            model=model or "text-embedding-ada-002",
+            batch_size=int(batch_size or 100),
+            max_concurrency=int(os.environ.get("EMBEDDING_CONCURRENCY", 4)),
+            dimension=int(dimension) if dimension else None,
+        )
+    if kind == "local":
+        threads = os.environ.get("EMBEDDING_THREADS")
+        return SentenceTransformerBackend(
+            model_name=model or DEFAULT_LOCAL_MODEL,
+            batch_size=int(batch_size or 64),
+            num_threads=int(threads) if threads else None,
+            quantize=os.environ.get("EMBEDDING_QUANTIZE") or None,
+        )
+    raise ValueError(f"Unknown embedding backend: {kind}")
@@ -1,21 +1,203 @@
 import os
 import json
+import random
+import asyncio
+import threading
+import time
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 
 from dotenv import load_dotenv
 load_dotenv()
 
-def get_chat_completion(prompt, model="gpt-4o"):
-    url = "https://gptunnel.ru/v1/chat/completions"
-    api_key = ""
+from metrics import metrics
 
-    if not api_key:
-        raise ValueError("API key not found. Please set the GPT_TUNNEL_KEY environment variable.")
+GPT_TUNNEL_URL = "https://gptunnel.ru/v1/chat/completions"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_sse_line(line):
+    """
+    Parse one line of a chat completions event stream.
+    
+    Returns:
+        tuple: (done, content delta or None)
+    """
+    if not line or not line.startswith("data:"):
+        return False, None
+    payload = line[len("data:"):].strip()
+    if payload == "[DONE]":
+        return True, None
+    choices = json.loads(payload).get("choices") or [{}]
+    return False, choices[0].get("delta", {}).get("content")
+
+
+class GPTTunnelClient:
+    """
+    Reusable gptunnel client with a pooled keep-alive session.
+    
+    Args:
+        api_key (str): gptunnel API key
+        connect_timeout (float): Seconds to establish a connection
+        read_timeout (float): Seconds to wait for each chunk of the response
+        max_retries (int): Retries on connection errors, timeouts and 429/5xx
+        pool_size (int): Kept-alive connections shared by concurrent sessions
+    """
+
+    def __init__(self, api_key, url=GPT_TUNNEL_URL, connect_timeout=5.0, read_timeout=120.0,
+                 max_retries=3, pool_size=10):
+        if not api_key:
+            raise ValueError("API key not found. Please set the GPT_TUNNEL_KEY environment variable.")
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def _post(self, data, stream=False):
+        metrics.inc("llm_requests_total", model=data["model"])
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    self.url, data=json.dumps(data), timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    metrics.inc("llm_errors_total", model=data["model"])
+                    raise
+            else:
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    metrics.inc("llm_errors_total", model=data["model"])
+                    raise Exception(f"Request failed with status code {response.status_code}: {response.text}")
+                response.close()
+            metrics.inc("llm_retries_total", model=data["model"])
+            time.sleep(backoff_delay(attempt))
+
+    def chat_completion(self, messages, model="gpt-4o", **params):
+        data = {"model": model, "messages": messages, **params}
+        result = self._post(data).json()
+        usage = result.get("usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if kind in usage:
+                metrics.inc("llm_tokens_total", usage[kind], model=model, kind=kind.split("_")[0])
+        return result['choices'][0]['message']['content']
+
+    def stream_chat_completion(self, messages, model="gpt-4o", **params):
+        """Yield content deltas; retries only happen before the first byte arrives."""
+        data = {"model": model, "messages": messages, "stream": True, **params}
+        with self._post(data, stream=True) as response:
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                done, delta = parse_sse_line(line)
+                if done:
+                    break
+                if delta:
+                    yield delta
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncGPTTunnelClient:
+    """asyncio counterpart of GPTTunnelClient built on a shared aiohttp session."""
+
+    def __init__(self, api_key, url=GPT_TUNNEL_URL, connect_timeout=5.0, read_timeout=120.0,
+                 max_retries=3, pool_size=10):
+        if not api_key:
+            raise ValueError("API key not found. Please set the GPT_TUNNEL_KEY environment variable.")
+        self.url = url
+        self.api_key = api_key
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=self.timeout,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+        return self._session
+
+    async def _post(self, data):
+        session = self._get_session()
+        metrics.inc("llm_requests_total", model=data["model"])
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await session.post(self.url, json=data)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    metrics.inc("llm_errors_total", model=data["model"])
+                    raise
+            else:
+                if response.status == 200:
+                    return response
+                text = await response.text()
+                response.release()
+                if response.status not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    metrics.inc("llm_errors_total", model=data["model"])
+                    raise Exception(f"Request failed with status code {response.status}: {text}")
+            metrics.inc("llm_retries_total", model=data["model"])
+            await asyncio.sleep(backoff_delay(attempt))
+
+    async def chat_completion(self, messages, model="gpt-4o", **params):
+        response = await self._post({"model": model, "messages": messages, **params})
+        async with response:
+            return (await response.json())['choices'][0]['message']['content']
+
+    async def stream_chat_completion(self, messages, model="gpt-4o", **params):
+        response = await self._post({"model": model, "messages": messages, "stream": True, **params})
+        async with response:
+            async for raw_line in response.content:
+                done, delta = parse_sse_line(raw_line.decode("utf-8").strip())
+                if done:
+                    break
+                if delta:
+                    yield delta
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """Process-wide client so every request reuses the same connection pool."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = GPTTunnelClient(
+                os.environ.get("GPT_TUNNEL_KEY", "shds-MDQXkzA5cvis2wULFY55ZSH1T8j")
+            )
+        return _default_client
+
+
+def get_chat_completion(prompt, model="gpt-4o"):
     data = {
         "model": model,
         "messages": [
@@ -46,37 +228,19 @@ def get_chat_completion(prompt, model="gpt-4o"):
         ],
     }
 
-    response = requests.post(url, headers=headers, data=json.dumps(data))
-
-    if response.status_code == 200:
-        return response.json()['choices'][0]['message']['content']
-    else:
-        raise Exception(f"Request failed with status code {response.status_code}: {response.text}")
+    return get_default_client().chat_completion(data["messages"], model)
 
-def get_chat_completion_with_history(prompt, chat_history, model="gpt-4o"):
+def build_messages_with_history(prompt, chat_history):
     """
-    Get chat completion with conversation history for context.
+    Build the messages array with system prompt, history, and current prompt.
     
     Args:
         prompt (str): Current user prompt
         chat_history (list): List of previous messages in format [{"role": "user/assistant", "content": "..."}]
-        model (str): Model to use
     
     Returns:
-        str: Assistant response
+        list: Messages for the chat completions API
     """
-    url = "https://gptunnel.ru/v1/chat/completions"
-    api_key = "shds-MDQXkzA5cvis2wULFY55ZSH1T8j"
-
-    if not api_key:
-        raise ValueError("API key not found. Please set the GPT_TUNNEL_KEY environment variable.")
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    # Build messages array with system prompt, history, and current prompt
     messages = [
         {
             "role": "system",
@@ -105,7 +269,7 @@ def get_chat_completion_with_history(prompt, chat_history, model="gpt-4o"):
     
     # Add conversation history (limit to avoid token limits)
     for msg in chat_history[-8:]:  # Last 8 messages to keep context manageable
-        if msg["role"] in ["user", "assistant"]:
+        if msg["role"] in ["system", "user", "assistant"]:
             messages.append({
                 "role": msg["role"],
                 "content": msg["content"]
@@ -116,18 +280,42 @@ def get_chat_completion_with_history(prompt, chat_history, model="gpt-4o"):
         "role": "user",
         "content": prompt
     })
-    
-    data = {
-        "model": model,
-        "messages": messages,
-        "max_tokens": 2000,
-        "temperature": 0.7
-    }
+    return messages
 
-    response = requests.post(url, headers=headers, data=json.dumps(data))
+def get_chat_completion_with_history(prompt, chat_history, model="gpt-4o"):
+    """
+    Get chat completion with conversation history for context.
+    
+    Args:
+        prompt (str): Current user prompt
+        chat_history (list): List of previous messages in format [{"role": "user/assistant", "content": "..."}]
+        model (str): Model to use
+    
+    Returns:
+        str: Assistant response
+    """
+    return get_default_client().chat_completion(
+        build_messages_with_history(prompt, chat_history),
+        model,
+        max_tokens=2000,
+        temperature=0.7
+    )
 
-    if response.status_code == 200:
-        return response.json()['choices'][0]['message']['content']
-    else:
-        raise Exception(f"Request failed with status code {response.status_code}: {response.text}")
+def stream_chat_completion_with_history(prompt, chat_history, model="gpt-4o"):
+    """
+    Streaming variant of get_chat_completion_with_history.
+    
+    Args:
+        prompt (str): Current user prompt
+        chat_history (list): List of previous messages in format [{"role": "user/assistant", "content": "..."}]
+        model (str): Model to use
     
+    Yields:
+        str: Pieces of the assistant response as server-sent events arrive
+    """
+    yield from get_default_client().stream_chat_completion(
+        build_messages_with_history(prompt, chat_history),
+        model,
+        max_tokens=2000,
+        temperature=0.7
+    )
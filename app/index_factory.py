@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import argparse
+import faiss
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+INDEX_TYPES = ("flat", "ivfpq", "hnsw")
+
+# Corpus size at which index_type="auto" leaves brute-force search behind
+AUTO_INDEX_THRESHOLD = 100_000
+
+# Below this many vectors PQ codebooks cannot be trained meaningfully
+IVFPQ_MIN_VECTORS = 10_000
+
+# Shorter PQ sub-vectors carry too little signal for a 256-centroid codebook
+PQ_MIN_SUBVECTOR_DIM = 8
+
+
+def choose_index_type(ntotal: int, index_type: str = "auto", large_index_type: str = "ivfpq",
+                      auto_threshold: int = AUTO_INDEX_THRESHOLD) -> str:
+    if index_type == "auto":
+        if large_index_type == "ivfpq":
+            # a low threshold must not train PQ codebooks on too few vectors
+            auto_threshold = max(auto_threshold, IVFPQ_MIN_VECTORS)
+        return large_index_type if ntotal >= auto_threshold else "flat"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}")
+    if index_type == "ivfpq" and ntotal < IVFPQ_MIN_VECTORS:
+        print(f"Only {ntotal} vectors, too few to train IVF-PQ; using a flat index")
+        return "flat"
+    return index_type
+
+
+def default_index_params(index_type: str, ntotal: int, dim: int) -> Dict[str, Any]:
+    """
+    Reasonable parameters for an index of ntotal vectors of size dim.
+
+    IVF uses ~4*sqrt(N) lists (bounded so each list gets enough training
+    points) and PQ with 8-bit codes over at most 64 sub-vectors of at least
+    PQ_MIN_SUBVECTOR_DIM dimensions each.
+    """
+    params = {"type": index_type, "dim": dim}
+    if index_type == "ivfpq":
+        nlist = int(4 * np.sqrt(max(ntotal, 1)))
+        nlist = max(1, min(nlist, 65536, ntotal // 39 or 1))
+        m = max((m for m in range(1, 65) if dim % m == 0 and dim // m >= PQ_MIN_SUBVECTOR_DIM), default=1)
+        params.update({"nlist": nlist, "m": m, "nbits": 8, "nprobe": min(32, nlist), "train_size": 256 * nlist})
+    elif index_type == "hnsw":
+        params.update({"M": 32, "ef_construction": 80, "ef_search": 64})
+    return params
+
+
+def build_index(params: Dict[str, Any], train_vectors: Optional[np.ndarray] = None):
+    """
+    Create an empty index from params, training it on a sample of
+    train_vectors when the index type needs it.
+
+    Flat and HNSW are wrapped in IndexIDMap2; IVF-PQ keeps ids natively.
+    """
+    dim = params["dim"]
+    index_type = params["type"]
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+
+    if index_type == "hnsw":
+        index = faiss.index_factory(dim, f"IDMap2,HNSW{params['M']}")
+        hnsw = faiss.downcast_index(index.index).hnsw
+        hnsw.efConstruction = params["ef_construction"]
+        hnsw.efSearch = params["ef_search"]
+        return index
+
+    if index_type == "ivfpq":
+        index = faiss.index_factory(dim, f"IVF{params['nlist']},PQ{params['m']}x{params['nbits']}")
+        if train_vectors is None or len(train_vectors) == 0:
+            raise ValueError("IVF-PQ index needs training vectors")
+        sample_size = min(len(train_vectors), params.get("train_size", len(train_vectors)))
+        rng = np.random.default_rng(0)
+        sample = train_vectors[np.sort(rng.choice(len(train_vectors), sample_size, replace=False))]
+        index.train(np.ascontiguousarray(sample, dtype="float32"))
+        index.nprobe = params["nprobe"]
+        return index
+
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def apply_search_params(index, params: Dict[str, Any]):
+    """Re-apply query-time knobs (nprobe, efSearch) to a loaded index."""
+    if params.get("type") == "ivfpq":
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    elif params.get("type") == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efSearch = params["ef_search"]
+
+
+def supports_removal(index) -> bool:
+    """HNSW graphs cannot drop vectors; such indexes are rebuilt instead."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return not isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW)
+    return True
+
+
+def index_ids(index) -> np.ndarray:
+    """All ids stored in the index, in no particular order."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map)
+    ivf = faiss.extract_index_ivf(index)
+    invlists = ivf.invlists
+    ids = []
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            ids.append(faiss.rev_swig_ptr(invlists.get_ids(list_no), size).copy())
+    return np.concatenate(ids) if ids else np.empty(0, dtype="int64")
+
+
+def params_file_for(index_file: str) -> str:
+    return os.path.splitext(index_file)[0] + ".json"
+
+
+def save_index_params(index_file: str, params: Dict[str, Any]):
+    tmp_path = f"{params_file_for(index_file)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+    os.replace(tmp_path, params_file_for(index_file))
+
+
+def load_index_params(index_file: str) -> Optional[Dict[str, Any]]:
+    path = params_file_for(index_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_index_modes(vectors: np.ndarray, queries: np.ndarray, top_k: int = 20,
+                        configs: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Measure recall@top_k and per-query latency of index configurations
+    against exact search over the same vectors.
+
+    Args:
+        vectors: Corpus vectors (N x dim)
+        queries: Query vectors (Q x dim)
+        top_k: Number of neighbours to compare
+        configs: Index params to evaluate; defaults for IVF-PQ and HNSW if None
+
+    Returns:
+        List of report rows, the flat baseline first
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    ntotal, dim = vectors.shape
+    ids = np.arange(ntotal, dtype="int64")
+    if configs is None:
+        configs = [default_index_params(t, ntotal, dim) for t in ("ivfpq", "hnsw")]
+
+    report = []
+    truth = None
+    for params in [default_index_params("flat", ntotal, dim)] + configs:
+        start = time.perf_counter()
+        index = build_index(params, vectors)
+        index.add_with_ids(vectors, ids)
+        build_s = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty((len(queries), top_k), dtype="int64")
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, I = index.search(query.reshape(1, -1), top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = I[0]
+
+        if truth is None:
+            truth = found
+        recall = np.mean([len(np.intersect1d(f, t)) / top_k for f, t in zip(found, truth)])
+        report.append({
+            "params": params,
+            "build_s": round(build_s, 3),
+            f"recall@{top_k}": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency report for FAISS index modes")
+    parser.add_argument("--store", default="data/embedding_store", help="Embedding store path")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled query vectors")
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    from embedding_store import EmbeddingStore
+
+    store = EmbeddingStore(args.store)
+    if len(store) == 0:
+        print("Embedding store is empty")
+        return
+    vectors = np.asarray(store._matrix())
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    # perturb sampled corpus vectors so queries are not exact matches
+    queries = queries + rng.normal(0, queries.std() * 0.1, queries.shape).astype("float32")
+
+    for row in compare_index_modes(vectors, queries, args.top_k):
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,86 @@
 import streamlit as st
 from rag_system import RAGSystem
-from gpt_client import get_chat_completion_with_history
-from telegram_client import update_messages
+from gpt_client import get_chat_completion_with_history, stream_chat_completion_with_history
+from refresh_worker import read_refresh_status, refresh_running, refresh_safely
+from resources import SharedRAGSystem
 from chat_manager import ChatManager
+from context_builder import ContextBuilder, ENCODING
+from tokens import count_tokens
+from response_cache import ResponseCache, history_key
+from metrics import annotate, start_metrics_server, timed, timed_stream, trace
+import os
 import traceback
-from datetime import datetime, timezone
+import threading
+from datetime import datetime, timedelta, timezone
 import json
 
-# Initialize systems
-rag_system = RAGSystem(data_file='data/telegram_messages.json', index_file='data/faiss_index.idx')
-chat_manager = ChatManager()
+# Must be the first Streamlit command: cached resources below may show a spinner
+st.set_page_config(
+    page_title="Financial Assistant",
+    page_icon="💰",
+    layout="wide"
+)
+
+SESSIONS_PER_PAGE = 5
+
+# Search period choices: days back from now, None for no limit
+SEARCH_PERIODS = {"Всё время": None, "Сегодня": 0, "Неделя": 7, "Месяц": 30}
+ALL_CHANNELS = "Все каналы"
+
+# Shared, process-wide resources: built once, reused by every rerun and session
+@st.cache_resource
+def get_shared_rag_system():
+    """
+    Read-only RAG system shared by all sessions. A newly published snapshot
+    is loaded in the background and swapped in (read-copy-update), so
+    refreshes never block a rerun.
+    """
+    shared = SharedRAGSystem(
+        lambda query_cache: RAGSystem(
+            data_file='data/telegram_messages.json',
+            index_file='data/faiss_index.idx',
+            query_cache=query_cache,
+            read_only=True,
+        )
+    )
+    shared.warm_up()
+    return shared
+
+@st.cache_resource
+def get_chat_manager():
+    return ChatManager()
+
+@st.cache_resource
+def get_context_builder():
+    # load the tokenizer up front
+    count_tokens("", ENCODING)
+    return ContextBuilder()
+
+# One instance per rerun: a swap during this rerun does not affect it
+rag_system = get_shared_rag_system().current()
+chat_manager = get_chat_manager()
+context_builder = get_context_builder()
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Serve Prometheus metrics on METRICS_PORT, once per server process."""
+    port = os.environ.get("METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return start_metrics_server(int(port))
+    except OSError as e:
+        print(f"Metrics endpoint not started: {e}")
+        return None
+
+start_metrics_endpoint()
+
+@st.cache_resource
+def get_response_cache():
+    """Answer cache shared by all sessions and kept across reruns."""
+    return ResponseCache()
+
+response_cache = get_response_cache()
 
 # Initialize session state for chat history
 if 'chat_history' not in st.session_state:
@@ -21,11 +92,14 @@ if 'show_sources' not in st.session_state:
 if 'current_session_name' not in st.session_state:
     st.session_state.current_session_name = None
 
-st.set_page_config(
-    page_title="Financial Assistant",
-    page_icon="💰",
-    layout="wide"
-)
+if 'sessions_page' not in st.session_state:
+    st.session_state.sessions_page = 0
+
+if 'search_period' not in st.session_state:
+    st.session_state.search_period = "Всё время"
+
+if 'search_channel' not in st.session_state:
+    st.session_state.search_channel = ALL_CHANNELS
 
 st.title("💰 Financial Assistant")
 st.markdown("💬 Задавайте вопросы о финансовых рынках и получайте ответы на основе актуальных новостей")
@@ -44,26 +118,85 @@ def get_session_name_from_first_message():
     return f"session_{datetime.now().strftime('%Y%m%d_%H%M')}"
 
 def update_database():
-    """Update the database with new messages."""
+    """Start a database refresh in the background; the new index is picked up once published."""
+    if refresh_running():
+        st.info("Обновление базы данных уже выполняется. Новые данные появятся автоматически после завершения.")
+        return
     try:
-        new_messages = update_messages()
-        rag_system.update_documents(new_messages)
-        st.success("База данных успешно обновлена!")
+        threading.Thread(target=refresh_safely, daemon=True).start()
+        st.info("Обновление базы данных запущено в фоне. Новые данные появятся автоматически после завершения.")
     except Exception as e:
         st.error(f"Произошла ошибка при обновлении базы данных: {str(e)}")
         st.error(traceback.format_exc())
 
+def show_refresh_status():
+    """Outcome of the latest refresh, whether it was started here or by the refresh worker."""
+    status = read_refresh_status()
+    if not status:
+        return
+    started = datetime.fromisoformat(status["started"]).astimezone().strftime('%d.%m %H:%M')
+    if status["state"] == "running" and refresh_running():
+        st.info(f"Обновление базы данных выполняется (начато {started}).")
+    elif status["state"] == "finished":
+        st.caption(f"Последнее обновление: {started}, новых сообщений: {status['new_messages']}.")
+    else:
+        st.error(f"Последнее обновление ({started}) завершилось ошибкой: {status.get('error', 'процесс был прерван')}")
+
+@st.cache_data
+def get_channel_names(snapshot_version):
+    """Channels of the current snapshot, for the search filter."""
+    return rag_system.documents.channel_names()
+
+def search_filters():
+    """Date range and channel chosen in the sidebar, as get_relevant_documents arguments."""
+    filters = {}
+    days = SEARCH_PERIODS[st.session_state.search_period]
+    if days is not None:
+        now = datetime.now(timezone.utc)
+        start_of_day = datetime.combine(now.date(), datetime.min.time(), tzinfo=timezone.utc)
+        filters["start"] = start_of_day if days == 0 else now - timedelta(days=days)
+    if st.session_state.search_channel != ALL_CHANNELS:
+        filters["channel"] = st.session_state.search_channel
+    return filters
+
+def embed_for_cache(text):
+    """Query embedding used as the response cache key; None if the embedding API is unavailable."""
+    try:
+        return rag_system.embed_query(text)
+    except Exception as e:
+        print(f"Response cache disabled for this request: {e}")
+        return None
+
 def generate_todays_summary():
     """Generate a summary of today's news."""
     try:
         today = datetime.now(timezone.utc).date()
         today_str = today.isoformat()
-        todays_docs = [doc for doc in rag_system.documents if doc['date'].startswith(today_str)]
+        start_of_day = datetime.combine(today, datetime.min.time(), tzinfo=timezone.utc)
+        with timed("todays_documents"):
+            todays_docs = rag_system.documents.between(start_of_day, start_of_day + timedelta(days=1))
 
         if todays_docs:
-            context = "\n".join([f"{doc['text']} [Link to Info]({doc['link']})" for doc in todays_docs])
-            prompt = f"Summarize the following news in 3-4 sentences with reference links in text:\n\n{context}\n\nSummary:"
-            summary = get_chat_completion_with_history(prompt, [])
+            with trace("summary"):
+                summary_request = "Сводка новостей за сегодня"
+                with timed("response_cache_lookup"):
+                    query_embedding = embed_for_cache(summary_request)
+                    cache_key = f"summary:{today_str}"
+                    cached = None
+                    if query_embedding is not None:
+                        cached = response_cache.lookup(query_embedding, rag_system.corpus_version, cache_key)
+                annotate(cache_hit=cached is not None)
+                
+                if cached:
+                    summary, todays_docs = cached["answer"], cached["sources"]
+                else:
+                    with timed("prompt_assembly"):
+                        context, todays_docs = context_builder.build_context(todays_docs)
+                        prompt = f"Summarize the following news in 3-4 sentences with reference links in text:\n\n{context}\n\nSummary:"
+                    with timed("llm"):
+                        summary = get_chat_completion_with_history(prompt, [])
+                    if query_embedding is not None:
+                        response_cache.store(query_embedding, rag_system.corpus_version, summary, todays_docs, cache_key)
             
             # Add to chat history
             st.session_state.chat_history.append({
@@ -90,21 +223,54 @@ def generate_todays_summary():
         st.error(traceback.format_exc())
 
 def answer_question(question):
-    """Answer a user question about financial markets."""
+    """Answer a user question about financial markets, streaming the answer as it is generated."""
     try:
-        relevant_docs = rag_system.get_relevant_documents(question)
-        context = "\n".join([f"{doc['text']} [Link to Info]({doc['link']})" for doc in relevant_docs])
-        
-        # Get chat history for context
-        chat_context = st.session_state.chat_history[-10:]  # Last 10 messages for context
+        question_time = datetime.now().strftime("%H:%M")
+        with st.chat_message("user"):
+            st.write(f"**{question_time}** - {question}")
         
-        answer = get_chat_completion_with_history(f"Context: {context}\n\nQuestion: {question}", chat_context)
+        with trace("answer"):
+            # Recent messages within the history budget, older ones summarized
+            with timed("history"):
+                chat_context = context_builder.build_history(st.session_state.chat_history)
+                filters = search_filters()
+                # the same question over another period or channel has another answer
+                cache_key = f"{history_key(chat_context)}|{st.session_state.search_period}|{st.session_state.search_channel}"
+            corpus_version = rag_system.corpus_version
+            with timed("response_cache_lookup"):
+                query_embedding = embed_for_cache(question)
+                cached = None
+                if query_embedding is not None:
+                    cached = response_cache.lookup(query_embedding, corpus_version, cache_key)
+            annotate(cache_hit=cached is not None)
+            
+            if cached:
+                answer, relevant_docs = cached["answer"], cached["sources"]
+                with st.chat_message("assistant"):
+                    st.write(answer)
+            else:
+                with st.spinner("Поиск источников..."), timed("retrieval"):
+                    # reuse the cache key embedding; if it failed, the API is down and search is lexical
+                    relevant_docs = rag_system.get_relevant_documents(
+                        question, query_embedding=query_embedding, dense=query_embedding is not None, **filters
+                    )
+                with timed("prompt_assembly"):
+                    context, relevant_docs = context_builder.build_context(relevant_docs)
+                    prompt = f"Context: {context}\n\nQuestion: {question}"
+                annotate(context_docs=len(relevant_docs), prompt_tokens=count_tokens(prompt, ENCODING))
+                
+                with st.chat_message("assistant"):
+                    answer = st.write_stream(
+                        timed_stream(stream_chat_completion_with_history(prompt, chat_context), "llm")
+                    )
+                if query_embedding is not None:
+                    response_cache.store(query_embedding, corpus_version, answer, relevant_docs, cache_key)
         
         # Add to chat history
         st.session_state.chat_history.append({
             "role": "user",
             "content": question,
-            "timestamp": datetime.now().strftime("%H:%M")
+            "timestamp": question_time
         })
         st.session_state.chat_history.append({
             "role": "assistant",
@@ -128,8 +294,8 @@ with st.sidebar:
     # Database controls
     st.subheader("База данных")
     if st.button("🔄 Обновить базу данных", use_container_width=True):
-        with st.spinner("Обновление базы данных..."):
-            update_database()
+        update_database()
+    show_refresh_status()
     
     if st.button("📰 Сводка за сегодня", use_container_width=True):
         with st.spinner("Генерация сводки..."):
@@ -137,6 +303,16 @@ with st.sidebar:
     
     st.divider()
     
+    # Search filters
+    st.subheader("🔎 Поиск")
+    st.selectbox("Период", list(SEARCH_PERIODS), key="search_period")
+    channels = [ALL_CHANNELS] + get_channel_names(rag_system.snapshot_version)
+    if st.session_state.search_channel not in channels:
+        st.session_state.search_channel = ALL_CHANNELS
+    st.selectbox("Канал", channels, key="search_channel")
+    
+    st.divider()
+    
     # Chat history controls
     st.subheader("💬 История диалога")
     
@@ -159,11 +335,17 @@ with st.sidebar:
                 st.error(f"Ошибка сохранения: {str(e)}")
     
     # Load saved sessions
-    saved_sessions = chat_manager.list_saved_sessions()
-    if saved_sessions:
+    session_count = chat_manager.count_sessions()
+    if session_count:
         st.subheader("📂 Сохранённые сессии")
         
-        for session in saved_sessions[:5]:  # Show last 5 sessions
+        page_count = (session_count + SESSIONS_PER_PAGE - 1) // SESSIONS_PER_PAGE
+        st.session_state.sessions_page = min(st.session_state.sessions_page, page_count - 1)
+        saved_sessions = chat_manager.list_saved_sessions(
+            limit=SESSIONS_PER_PAGE, offset=st.session_state.sessions_page * SESSIONS_PER_PAGE
+        )
+        
+        for session in saved_sessions:
             col1, col2, col3 = st.columns([3, 1, 1])
             
             with col1:
@@ -191,6 +373,19 @@ with st.sidebar:
                         st.rerun()
                     else:
                         st.error("Ошибка удаления")
+        
+        if page_count > 1:
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("◀", key="sessions_prev", disabled=st.session_state.sessions_page == 0):
+                    st.session_state.sessions_page -= 1
+                    st.rerun()
+            with col2:
+                st.caption(f"Страница {st.session_state.sessions_page + 1} из {page_count}")
+            with col3:
+                if st.button("▶", key="sessions_next", disabled=st.session_state.sessions_page >= page_count - 1):
+                    st.session_state.sessions_page += 1
+                    st.rerun()
     
     st.divider()
     
@@ -225,6 +420,9 @@ with st.sidebar:
     
     if st.session_state.chat_history:
         st.info(f"Сообщений в диалоге: {len(st.session_state.chat_history)}")
+    
+    cache_stats = response_cache.stats()
+    st.caption(f"Кэш ответов: {cache_stats['hits']} попаданий, {cache_stats['misses']} промахов")
 
 # Main chat interface
 st.subheader("💬 Диалог")
@@ -256,13 +454,13 @@ with chat_container:
                     if st.session_state.show_sources[sources_key]:
                         st.markdown("**Источники:**")
                         for doc in message['sources']:
-                            st.markdown(f"• {doc['text']} [Ссылка]({doc['link']})")
+                            reposts = "".join(f" [Репост]({link})" for link in doc.get('alt_links', []))
+                            st.markdown(f"• {doc['text']} [Ссылка]({doc['link']}){reposts}")
 
 # Input for new message
 st.divider()
 question = st.chat_input("Задайте вопрос о финансовых рынках...")
 
 if question:
-    with st.spinner("Обработка вопроса..."):
-        answer_question(question)
-        st.rerun()
+    answer_question(question)
+    st.rerun()
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import threading
+from io import StringIO
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+CURRENCY_API_URL = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies"
+CURRENCY_API_FALLBACK_URL = "https://latest.currency-api.pages.dev/v1/currencies"
+
+
+class MarketDataSource:
+    """
+    One market-data document fetched from the web.
+
+    Subclasses set name, urls (tried in order), ttl (seconds a fetched
+    value counts as fresh) and implement parse(). Fetches send the
+    ETag/Last-Modified of the previous response, so unchanged upstream
+    data costs a 304 and no parsing.
+    """
+
+    name = ""
+    urls = []
+    ttl = 600
+    timeout = (3.05, 10)
+
+    def parse(self, response):
+        raise NotImplementedError
+
+    def fetch(self, session, cached=None):
+        """
+        Returns:
+            dict: Cache entry with "message", "fetched_at", "etag" and "last_modified"
+        """
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        last_error = None
+        for url in self.urls:
+            try:
+                response = session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code == 304 and cached:
+                    return dict(cached, fetched_at=time.time())
+                response.raise_for_status()
+                return {
+                    "message": self.parse(response),
+                    "fetched_at": time.time(),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+
+class KeyRateSource(MarketDataSource):
+    """Bank of Russia key rate; changes a few times a year."""
+
+    name = "cbr_key_rate"
+    urls = ["https://www.cbr.ru/hd_base/keyrate/"]
+    ttl = 6 * 3600
+
+    def parse(self, response):
+        df = pd.read_html(StringIO(response.text))[0]
+        df.columns = ["Date", "Rate"]
+        latest_record = df.iloc[0]
+
+        cb_date = datetime.strptime(latest_record["Date"], "%d.%m.%Y").replace(
+            tzinfo=timezone.utc
+        )
+        cb_rate = float(latest_record["Rate"] / 100)
+
+        return {
+            "text": f"Текущая ставка центрального банка ЦБ России РФ составляет {cb_rate} процентов.",
+            "link": "https://www.cbr.ru/hd_base/keyrate/",
+            "date": cb_date.isoformat(),
+        }
+
+
+class DepositRateSource(MarketDataSource):
+    """FRG100 average deposit rate index; published weekly."""
+
+    name = "frg100"
+    urls = ["https://frankrg.com/frg100index"]
+    ttl = 6 * 3600
+
+    def parse(self, response):
+        df = pd.read_html(StringIO(response.text))[0]
+        deposits_rate = df[0].iloc[1]
+        return {
+            "text": f"На основании данных индекса ставок по вкладам FRG100, средние ставки по вкладам и депозитам в российских банках составляют {deposits_rate}",
+            "link": "https://frankrg.com/frg100index",
+            "date": datetime.now(timezone.utc).isoformat(),
+        }
+
+
+class CurrencySource(MarketDataSource):
+    """Exchange rates from https://github.com/fawazahmed0/exchange-api"""
+
+    name = "usd_rates"
+    ttl = 15 * 60
+    base_currency = "usd"
+    target_currencies = ["rub", "usd", "eur", "cny", "jpy", "gbp"]
+
+    @property
+    def urls(self):
+        return [
+            f"{CURRENCY_API_URL}/{self.base_currency}.json",
+            f"{CURRENCY_API_FALLBACK_URL}/{self.base_currency}.json",
+        ]
+
+    def rates(self, response):
+        data = response.json()
+        return {
+            currency: data[self.base_currency][currency]
+            for currency in self.target_currencies
+            if currency in data[self.base_currency]
+        }
+
+    def parse(self, response):
+        currency_data = self.rates(response)
+        return {
+            "text": f"Курсы валют на сегодняшний день {datetime.now().isoformat()} к {self.base_currency.upper()} - {', '.join([f'{currency.upper()}: {rate}' for currency, rate in currency_data.items()])}.",
+            "link": f"{CURRENCY_API_URL}/{self.base_currency}.json",
+            "date": datetime.now(timezone.utc).isoformat(),
+        }
+
+
+class BitcoinSource(CurrencySource):
+    name = "btc_usd"
+    ttl = 5 * 60
+    base_currency = "btc"
+    target_currencies = ["usd"]
+
+    def parse(self, response):
+        bitcoin_data = self.rates(response)
+        return {
+            "text": f"Курс биткоина (Bitcoin) в долларах на сегодняшний день: USD: {bitcoin_data.get('usd', 'N/A')}.",
+            "link": f"{CURRENCY_API_URL}/btc.json",
+            "date": datetime.now(timezone.utc).isoformat(),
+        }
+
+
+DEFAULT_SOURCES = [KeyRateSource(), DepositRateSource(), CurrencySource(), BitcoinSource()]
+
+
+class MarketDataFetcher:
+    """
+    Fetches all market-data sources concurrently, each with its own timeout.
+
+    The last good value of every source is kept in cache_file. A value
+    younger than the source's ttl is reused without any request, and a
+    failing source falls back to its last good value, so one slow or broken
+    site neither delays nor aborts a refresh.
+    """
+
+    def __init__(self, sources=None, cache_file="data/market_data_cache.json"):
+        self.sources = sources if sources is not None else DEFAULT_SOURCES
+        self.cache_file = cache_file
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self.cache = self.load_cache()
+
+    def load_cache(self):
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading market data cache: {e}")
+        return {}
+
+    def save_cache(self):
+        tmp_path = f"{self.cache_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.cache, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.cache_file)
+
+    def fetch_source(self, source):
+        """
+        Returns:
+            dict: Copy of the source's message, free for the caller to modify, or None
+        """
+        cached = self.cache.get(source.name)
+        if cached and time.time() - cached["fetched_at"] < source.ttl:
+            return dict(cached["message"])
+        try:
+            entry = source.fetch(self.session, cached)
+        except Exception as e:
+            if cached:
+                print(f"Error fetching {source.name}, using last good value: {e}")
+                return dict(cached["message"])
+            print(f"Error fetching {source.name}: {e}")
+            return None
+        with self._lock:
+            self.cache[source.name] = entry
+        return dict(entry["message"])
+
+    def fetch_all(self):
+        """
+        Returns:
+            list: One message per source that has a value, in source order
+        """
+        with ThreadPoolExecutor(max_workers=max(len(self.sources), 1)) as pool:
+            messages = list(pool.map(self.fetch_source, self.sources))
+        self.save_cache()
+        return [message for message in messages if message is not None]
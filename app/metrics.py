@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Tuple
+
+# Upper bounds in seconds, from a cache hit to a slow LLM answer
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Per-request JSONL log, e.g. TRACE_LOG=data/traces.jsonl. Off unless set:
+# the file is appended to on every request and never rotated
+TRACE_LOG = os.environ.get("TRACE_LOG", "")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label_value(value) -> str:
+    """Escape a label value as the Prometheus text format requires."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label_value(value)}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms in the Prometheus data model.
+
+    Recording is a dict update under a lock, cheap enough to leave on for
+    every request; rendering happens only when the endpoint is scraped.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, _label_key(labels))
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][slot] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(counts), total, count)) for key, (counts, total, count) in self._histograms.items()
+            )
+
+        lines, typed = [], set()
+        for (name, key), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        for (name, key), (counts, total, count) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{name}_bucket{_format_labels(key, bucket_label)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class Trace:
+    """Stage timings and attributes of one request, written as a JSONL line when it ends."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.attrs = {}
+
+    def add_span(self, stage: str, seconds: float):
+        self.spans[stage] = round(self.spans.get(stage, 0.0) + seconds * 1000, 3)
+
+
+_log_lock = threading.Lock()
+
+
+def _write_trace(trace: Trace, duration: float, error: Optional[str]):
+    if not TRACE_LOG:
+        return
+    record = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "trace": trace.name,
+        "duration_ms": round(duration * 1000, 3),
+        "spans": trace.spans,
+        **trace.attrs,
+    }
+    if error:
+        record["error"] = error
+    try:
+        with _log_lock, open(TRACE_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Error writing trace log: {e}")
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Trace]:
+    """
+    Collect the stages timed inside the block into one trace record and
+    observe the total as request_seconds{request=name}.
+    """
+    current = Trace(name)
+    token = _current_trace.set(current)
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = type(e).__name__
+        metrics.inc("request_errors_total", request=name)
+        raise
+    finally:
+        _current_trace.reset(token)
+        duration = time.perf_counter() - current.started
+        metrics.observe("request_seconds", duration, request=name)
+        _write_trace(current, duration, error)
+
+
+def annotate(**attrs):
+    """Attach attributes (cache hit, token counts...) to the current trace, if any."""
+    current = _current_trace.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a pipeline stage into stage_seconds{stage=...} and the current trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_stage(stage: str, seconds: float):
+    metrics.observe("stage_seconds", seconds, stage=stage)
+    current = _current_trace.get()
+    if current is not None:
+        current.add_span(stage, seconds)
+
+
+def timed_stream(chunks: Iterator[str], stage: str) -> Iterator[str]:
+    """
+    Pass a streamed answer through, recording time to first chunk as
+    <stage>_first_token and the whole stream as <stage>.
+    """
+    started = time.perf_counter()
+    first = True
+    try:
+        for chunk in chunks:
+            if first:
+                record_stage(f"{stage}_first_token", time.perf_counter() - started)
+                first = False
+            yield chunk
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics for Prometheus from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,48 @@
+import threading
+from typing import Optional, Dict
+
+import numpy as np
+from cachetools import TTLCache
+
+
+def normalize_query(query: str) -> str:
+    """Collapse case, whitespace and trailing punctuation of a question."""
+    return " ".join(query.casefold().split()).rstrip(" ?!.")
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-memory LRU cache of query embeddings with a TTL.
+
+    Kept separate from the corpus EmbeddingStore so user questions are never
+    written to disk. Keys are normalized queries, so "Курс доллара?" and
+    "курс  доллара" share an entry.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        with self._lock:
+            embedding = self._cache.get(normalize_query(query))
+            if embedding is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return embedding
+
+    def put(self, query: str, embedding: np.ndarray):
+        with self._lock:
+            self._cache[normalize_query(query)] = embedding
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "maxsize": int(self._cache.maxsize),
+            }
@@ -3,13 +3,10 @@ import json
 import faiss
 import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import re
 import emoji
-import requests
-import pickle
+import time
 
 from datetime import datetime
 # from bs4 import BeautifulSoup
@@ -22,7 +19,99 @@ import openai
 
 openai.api_key = api_key
 
-from openai import OpenAI
+from chunking import CHUNK_OVERLAP, CHUNK_WORDS, WHOLE, ChunkTable, excerpt
+from dedup import NearDuplicateIndex, collapse_duplicates, minhash
+from doc_id_table import DocIdTable, document_id
+from document_store import DocumentStore
+from embeddings import backend_from_env
+from embedding_store import EmbeddingStore
+from query_cache import QueryEmbeddingCache
+from index_factory import (
+    AUTO_INDEX_THRESHOLD,
+    build_index,
+    choose_index_type,
+    default_index_params,
+    index_ids,
+    load_index_params,
+)
+from shards import COLD, HOT_SHARDS, ShardedIndex, assign_shards, cold_boundary, shard_key
+from sparse_index import SparseIndex
+from market_data import MarketDataFetcher
+from metrics import metrics, timed
+from snapshot import SNAPSHOT_DIR, SnapshotWriter, read_manifest, snapshot_file, verify_snapshot
+
+SNAPSHOT_DOCUMENTS = "documents.sqlite"
+SNAPSHOT_EPOCHS = "epochs.npy"
+SNAPSHOT_IDS = "ids.npy"
+SNAPSHOT_SPARSE = "sparse.npz"
+SNAPSHOT_CHUNKS = "chunks.npz"
+# Unpartitioned index of snapshots written before sharding
+SNAPSHOT_INDEX = "index.faiss"
+
+SECONDS_PER_DAY = 86400.0
+
+# Only Telegram posts are deduplicated; market data documents are replaced by link
+TELEGRAM_LINK_PREFIX = "https://t.me/"
+
+# Backend whose vectors the legacy pickle cache and the unsuffixed embedding
+# store hold; stores of every other backend get the backend name as suffix
+LEGACY_EMBEDDING_BACKEND = "openai-text-embedding-ada-002"
+
+# Filtered searches fetch this many times more hits, since some are filtered out
+FILTER_OVERFETCH = 5
+
+# Hits grow by this factor while they cover fewer than top_k posts
+PARENT_OVERFETCH = 2
+
+
+def parse_epochs(documents):
+    """Parse document dates once into a float64 array of UTC epoch seconds."""
+    if not documents:
+        return np.empty(0, dtype="float64")
+    dates = pd.to_datetime([doc["date"] for doc in documents], utc=True, format="ISO8601")
+    return dates.as_unit("s").asi8.astype("float64")
+
+
+def reciprocal_rank_fusion(ranked_lists, k=60, top_k=20):
+    """
+    Merge ranked id lists with reciprocal-rank fusion.
+
+    Returns:
+        Tuple of (doc_ids, scores), best first
+    """
+    scores = {}
+    for ids in ranked_lists:
+        for rank, doc_id in enumerate(ids.tolist()):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return (
+        np.array([doc_id for doc_id, _ in best], dtype="int64"),
+        np.array([score for _, score in best], dtype="float64"),
+    )
+
+
+def recency_rerank(relevance, epochs, now, half_life_days=7.0, recency_weight=0.7):
+    """
+    Order search hits by a blend of relevance and freshness.
+
+    Relevance scores (higher is better) are min-max normalized into [0, 1],
+    recency decays exponentially with the given half-life, and the two are
+    mixed linearly.
+
+    Returns:
+        np.ndarray: Hit indices, best first
+    """
+    if len(relevance) == 0:
+        return np.empty(0, dtype="int64")
+    spread = relevance.max() - relevance.min()
+    if spread > 0:
+        similarity = (relevance - relevance.min()) / spread
+    else:
+        similarity = np.ones_like(relevance)
+    age_days = np.maximum(now - epochs, 0.0) / SECONDS_PER_DAY
+    recency = np.exp2(-age_days / half_life_days)
+    scores = (1.0 - recency_weight) * similarity + recency_weight * recency
+    return np.argsort(-scores, kind="stable")
 
 
 class RAGSystem:
@@ -31,229 +120,672 @@ class RAGSystem:
         data_file="data/telegram_messages.json",
         index_file="data/faiss_index.idx",
         cache_file="data/embedding_cache.pkl",
+        store_file="data/embedding_store",
+        snapshot_dir=SNAPSHOT_DIR,
+        query_cache_size=1024,
+        query_cache_ttl=3600,
+        query_cache=None,
+        index_type="auto",
+        large_index_type="ivfpq",
+        auto_index_threshold=AUTO_INDEX_THRESHOLD,
+        index_params=None,
+        recency_half_life_days=7.0,
+        recency_weight=0.7,
+        hybrid=True,
+        rrf_k=60,
+        query_embedding_timeout=5.0,
+        embedding_backend=None,
+        chunk_words=CHUNK_WORDS,
+        chunk_overlap=CHUNK_OVERLAP,
+        dedup_bands=32,
+        dedup_window_days=7.0,
+        shard_period="week",
+        hot_shards=HOT_SHARDS,
+        read_only=False,
     ):
-        self.client = OpenAI()
-        self.documents = []
+        # Read-only instances (the Streamlit app) never write data files;
+        # the refresh worker is the only writer
+        self.read_only = read_only
+        self.embedding_backend = embedding_backend or backend_from_env()
+        self.documents = DocumentStore()
         self.embeddings = None
         self.data_file = data_file
         self.index_file = index_file
+        self.ids_file = os.path.splitext(index_file)[0] + ".ids.npy"
+        self.sparse_file = os.path.splitext(index_file)[0] + ".sparse.npz"
         self.cache_file = cache_file
-        self.embedding_cache = self.load_embedding_cache()
+        self.snapshot_dir = snapshot_dir
+        # Version of the snapshot this instance was loaded from or last wrote
+        self.snapshot_version = None
+        if self.embedding_backend.name != LEGACY_EMBEDDING_BACKEND:
+            # Vectors of different models must never share a store
+            store_file = f"{store_file}-{self.embedding_backend.name}"
+        # Readers only embed questions, never corpus texts
+        self.embedding_store = None if read_only else self.load_embedding_store(store_file)
+        # Passed in by SharedRAGSystem so cached questions survive snapshot swaps
+        if query_cache is None:
+            query_cache = QueryEmbeddingCache(query_cache_size, query_cache_ttl)
+        self.query_cache = query_cache
+        self.index_type = index_type
+        self.large_index_type = large_index_type
+        self.auto_index_threshold = auto_index_threshold
+        self.index_params_override = index_params or {}
+        self.recency_half_life_days = recency_half_life_days
+        self.recency_weight = recency_weight
+        self.doc_epochs = np.empty(0, dtype="float64")
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+        self.query_embedding_timeout = query_embedding_timeout
+        self.sparse_index = SparseIndex()
+        # Changes whenever the indexed corpus does; keys the response cache
+        self.corpus_version = "0"
+        # Dense index partitioned by date (see shards.ShardedIndex)
         self.index = None
+        self.shard_period = shard_period
+        self.hot_shards = hot_shards
+        self.id_table = DocIdTable.from_documents([])
+        # The indexes hold chunks of posts; this maps them to their documents
+        self.chunk_words = chunk_words
+        self.chunk_overlap = chunk_overlap
+        self.chunk_table = ChunkTable.empty()
+        self.market_data = MarketDataFetcher()
+        # MinHash signatures of recent posts; built on the first update (writer only)
+        self.dedup_bands = dedup_bands
+        self.dedup_window_days = dedup_window_days
+        self.near_duplicates = None
         self.load_or_create_index()
 
-    def load_embedding_cache(self):
-        """Load the embedding cache from disk if it exists."""
-        if os.path.exists(self.cache_file):
-            with open(self.cache_file, "rb") as f:
-                return pickle.load(f)
-        return {}
-
-    def save_embedding_cache(self):
-        """Save the embedding cache to disk."""
-        with open(self.cache_file, "wb") as f:
-            pickle.dump(self.embedding_cache, f)
+    def load_embedding_store(self, store_file):
+        """Open the embedding store, importing the legacy pickle cache once."""
+        store = EmbeddingStore(store_file)
+        if (
+            len(store) == 0
+            and os.path.exists(self.cache_file)
+            and self.embedding_backend.name == LEGACY_EMBEDDING_BACKEND
+        ):
+            try:
+                store.import_pickle_cache(self.cache_file)
+                print(f"Imported {len(store)} embeddings from {self.cache_file}")
+            except Exception as e:
+                print(f"Error importing embedding cache: {e}")
+        return store
 
     def get_embedding(self, text):
-        cached_embeddings = []
-        texts_to_embed = []
-
-        for t in text:
-            if t in self.embedding_cache:
-                cached_embeddings.append(self.embedding_cache[t])
-            else:
-                texts_to_embed.append(t)
-
-        if not texts_to_embed:
-            return cached_embeddings
+        texts_to_embed = [t for t in dict.fromkeys(text) if t not in self.embedding_store]
 
         try:
-            batch_size = 100
-            text_batches = [
-                texts_to_embed[i : i + batch_size]
-                for i in range(0, len(texts_to_embed), batch_size)
-            ]
-            new_embeddings = []
-
-            for batch in text_batches:
-                response = OpenAI().embeddings.create(
-                    model="text-embedding-ada-002", input=batch
-                )
-                batch_embeddings = [data.embedding for data in response.data]
-
-                for t, emb in zip(batch, batch_embeddings):
-                    self.embedding_cache[t] = emb
-                    new_embeddings.append(emb)
-
-            self.save_embedding_cache()
-
-            final_embeddings = []
-            new_emb_idx = 0
-
-            for t in text:
-                if t in self.embedding_cache:
-                    final_embeddings.append(self.embedding_cache[t])
-                else:
-                    final_embeddings.append(new_embeddings[new_emb_idx])
-                    new_emb_idx += 1
+            if texts_to_embed:
+                # Each finished batch is persisted at once, so a failed run
+                # only has to re-embed the batches that did not make it
+                self.embedding_backend.embed_many(texts_to_embed, self.embedding_store.add)
 
-            return final_embeddings
+            return self.embedding_store.get_many(list(text))
 
         except Exception as e:
             print(f"Error getting embedding: {e}")
             return None
 
+    def embed_query(self, query):
+        """
+        Embed a user question through the in-memory query cache. Questions
+        are never added to the corpus embedding store.
+        """
+        embedding = self.query_cache.get(query)
+        if embedding is None:
+            metrics.inc("query_embedding_cache_total", result="miss")
+            with timed("query_embedding"):
+                embedding = self.embedding_backend.embed(
+                    [query], timeout=self.query_embedding_timeout
+                )[0]
+            self.query_cache.put(query, embedding)
+        else:
+            metrics.inc("query_embedding_cache_total", result="hit")
+        return embedding
+
     def load_or_create_index(self):
+        manifest = read_manifest(self.snapshot_dir)
+        if manifest is not None and self.load_snapshot(manifest):
+            return
+
+        # No usable snapshot: fall back to the legacy data and index files
         if os.path.exists(self.data_file):
             self.load_documents()
+            self.sparse_index = self.load_sparse_index()
 
-            if os.path.exists(self.index_file):
+            # Legacy indexes hold whole posts; a writer rebuilds them chunked,
+            # reusing the stored whole-post embeddings of short posts
+            if os.path.exists(self.index_file) and self.read_only:
                 try:
-                    self.index = faiss.read_index(self.index_file)
-                    if self.index.ntotal == len(
-                        [doc for doc in self.documents if doc["text"] != ""]
-                    ):
+                    index = faiss.read_index(self.index_file)
+                    params = load_index_params(self.index_file)
+                    if isinstance(index, faiss.IndexFlat):
+                        index = self.migrate_flat_index(index)
+                        params = None
+                    if index is not None and self.index_matches_documents(index):
+                        params = params or default_index_params("flat", index.ntotal, index.d)
+                        self.index = ShardedIndex.single(index, params, self.shard_period)
                         print("Existing index loaded successfully")
                         return
+                    print("Index is out of sync with the data file")
                 except Exception as e:
                     print(f"Error loading index: {e}")
 
-            self.create_index()
+            if self.read_only:
+                print("No usable index yet, serving lexical search until the next refresh")
+                return
+            try:
+                self.create_index()
+                self.sparse_index = self.load_sparse_index()
+                self.save_snapshot()
+            except Exception as e:
+                print(f"Error creating index: {e}")
         else:
             print("Data file not found. Please update the database.")
 
-    def load_documents(self):
-        with open(self.data_file, "r", encoding="utf-8") as file:
-            self.documents = json.load(file)
-
-    def load_index(self):
-        try:
-            self.index = faiss.read_index(self.index_file)
-            all_texts = [doc["text"] for doc in self.documents if doc["text"] != ""]
-            self.embeddings = np.array(self.get_embedding(all_texts))
-        except Exception as e:
-            print(f"Error loading index: {e}")
-            self.create_index()
-
-    def create_index(self):
+    def load_snapshot(self, manifest):
+        """
+        Load documents, id table and both indexes from a published snapshot.
+        The manifest and file sizes are checked instead of re-validating the
+        index against the documents.
+
+        Returns:
+            bool: False if the snapshot is unusable and the legacy files should be tried
+        """
+        if not verify_snapshot(manifest, self.snapshot_dir):
+            return False
+        metadata = manifest["metadata"]
+        path = lambda name: snapshot_file(manifest, name, self.snapshot_dir)
         try:
-            all_texts = [doc["text"] for doc in self.documents if doc["text"] != ""]
-            self.embeddings = np.array(self.get_embedding(all_texts))
-            dimension = len(self.embeddings[0]) if len(self.embeddings) > 0 else 1536
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(self.embeddings.astype("float32"))
-            faiss.write_index(self.index, self.index_file)
+            documents = DocumentStore(path(SNAPSHOT_DOCUMENTS))
+            doc_epochs = np.load(path(SNAPSHOT_EPOCHS), mmap_mode="r")
+            id_table = DocIdTable.load(path(SNAPSHOT_IDS))
+            sparse_index = SparseIndex.load(path(SNAPSHOT_SPARSE))
+            if "chunking" in metadata:
+                chunk_table = ChunkTable.load(path(SNAPSHOT_CHUNKS))
+            else:
+                # written before chunking: every post is one chunk
+                chunk_table = ChunkTable.whole_documents(id_table.indexed_ids())
+            index = None
+            if metadata["embedding_backend"] == self.embedding_backend.name:
+                if "shards" in metadata:
+                    index = ShardedIndex.load(
+                        path, metadata["shards"], metadata["sharding"]["period"], metadata["cold_before"]
+                    )
+                else:
+                    index = ShardedIndex.single(
+                        faiss.read_index(path(SNAPSHOT_INDEX)), metadata["index_params"], self.shard_period
+                    )
         except Exception as e:
-            print(f"Error creating index: {e}")
-
-    def preprocess_financial_data(self, text):
-        text = emoji.replace_emoji(text, replace="")
-        text = re.sub(r"[^\w\s.,!?]", "", text)
-        return text
+            print(f"Error loading snapshot {manifest['version']}: {e}")
+            return False
+        if (
+            len(documents) != metadata["documents"]
+            or len(id_table) != len(documents)
+            or len(doc_epochs) != len(documents)
+            or len(chunk_table) != metadata["indexed"]
+            or (index is not None and index.ntotal != metadata["indexed"])
+        ):
+            print(f"Snapshot {manifest['version']} does not match its manifest")
+            return False
+
+        self.documents = documents
+        self.id_table = id_table
+        self.doc_epochs = doc_epochs
+        self.sparse_index = sparse_index
+        self.chunk_table = chunk_table
+        self.corpus_version = metadata["corpus_version"]
+        self.snapshot_version = manifest["version"]
+
+        if index is not None:
+            self.index = index
+        else:
+            print("Snapshot was built with a different embedding backend")
+
+        # Readers serve whatever chunking and sharding the snapshot has; the
+        # writer rebuilds when the settings changed
+        if not self.read_only and (
+            index is None
+            or metadata.get("chunking") != self.chunking()
+            or metadata.get("sharding") != self.sharding()
+        ):
+            try:
+                self.create_index()
+                self.sparse_index = self.load_sparse_index()
+                self.save_snapshot()
+            except Exception as e:
+                print(f"Error creating index: {e}")
+            return True
+
+        print(f"Snapshot {manifest['version']} loaded successfully")
+        return True
+
+    def save_snapshot(self):
+        """Publish the current documents and indexes as one new snapshot."""
+        if self.read_only:
+            return
+        with SnapshotWriter(self.snapshot_dir) as writer:
+            self.documents.save(writer.path(SNAPSHOT_DOCUMENTS))
+            self.write_snapshot(writer)
+        self.open_published_documents(writer.version)
+
+    def write_snapshot(self, writer):
+        """
+        Add id and chunk tables, dates, FAISS shards and BM25 index to a snapshot that
+        already holds the documents.
+        """
+        writer.metadata = {
+            "corpus_version": self.corpus_version,
+            "documents": len(self.documents),
+            "indexed": int(self.index.ntotal),
+            "embedding_backend": self.embedding_backend.name,
+            "chunking": self.chunking(),
+            "sharding": self.sharding(),
+            "cold_before": self.index.cold_before,
+            "shards": self.index.params,
+        }
+        self.id_table.save(writer.path(SNAPSHOT_IDS))
+        self.chunk_table.save(writer.path(SNAPSHOT_CHUNKS))
+        np.save(writer.path(SNAPSHOT_EPOCHS), np.asarray(self.doc_epochs, dtype="float64"))
+        self.sparse_index.save(writer.path(SNAPSHOT_SPARSE))
+        self.index.save(writer.path, self.previous_shard_linker(writer))
+
+    def previous_shard_linker(self, writer):
+        """
+        Link callback for ShardedIndex.save that reuses shard files of the
+        snapshot this instance last loaded or published. None if another
+        process published since, as the clean shards then need not match it.
+        """
+        manifest = read_manifest(self.snapshot_dir)
+        if manifest is None or manifest["version"] != self.snapshot_version:
+            return None
 
-    def get_relevant_documents(self, query, top_k=20):
-        query_embedding = (
-            np.array(self.get_embedding([query])[0]).astype("float32").reshape(1, -1)
+        def link(name):
+            entry = manifest["files"].get(name)
+            if entry is None:
+                return False
+            return writer.link(name, snapshot_file(manifest, name, self.snapshot_dir), entry)
+        return link
+
+    def chunking(self):
+        return {"chunk_words": self.chunk_words, "chunk_overlap": self.chunk_overlap}
+
+    def sharding(self):
+        return {"period": self.shard_period, "hot_shards": self.hot_shards}
+
+    def open_published_documents(self, version):
+        """Switch to the document store of a freshly published snapshot."""
+        self.snapshot_version = version
+        # The published shards are the base the next snapshot links against
+        self.index.dirty.clear()
+        self.documents = DocumentStore(
+            snapshot_file({"version": version}, SNAPSHOT_DOCUMENTS, self.snapshot_dir)
         )
-        D, I = self.index.search(query_embedding, top_k)
-
-        relevant_docs = [self.documents[int(i)] for i in I[0]]
-
-        now = datetime.now(timezone.utc)
-        recency_scores = []
-        for doc in relevant_docs:
-            doc_date = datetime.fromisoformat(doc["date"])
-            if doc_date.tzinfo is None:
-                doc_date = doc_date.replace(tzinfo=timezone.utc)
-            days_diff = (now - doc_date).days
-            recency_scores.append(
-                1 / (1.2 * (days_diff + 1))
-            )  # Adding 1 to avoid division by zero
-
-        combined_scores = 0.3 * D[0] + 0.7 * np.array(recency_scores)
-        ranked_indices = np.argsort(combined_scores)[::-1]
 
-        return [relevant_docs[int(i)] for i in ranked_indices]
+    def warm_up(self):
+        """
+        Touch the lazily loaded parts (local embedding model, memory-mapped
+        arrays, index pages) so the first question does not pay for them.
+        """
+        self.embedding_backend.dimension
+        np.asarray(self.doc_epochs).sum()
+        if self.index is not None and self.index.ntotal:
+            self.index.search(np.zeros((1, self.index.d), dtype="float32"), 1)
+        self.sparse_index.search("ставка", 1)
 
-    def fetch_currency_data(self, base_currency, target_currencies):
-        base_url = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies"
-        fallback_url = "https://latest.currency-api.pages.dev/v1/currencies"
-
-        try:
-            response = requests.get(f"{base_url}/{base_currency}.json")
-            response.raise_for_status()
-            data = response.json()
-        except requests.RequestException:
-            response = requests.get(f"{fallback_url}/{base_currency}.json")
-            response.raise_for_status()
-            data = response.json()
+    def load_documents(self):
+        with open(self.data_file, "r", encoding="utf-8") as file:
+            documents = json.load(file)
+        self.documents = DocumentStore.from_documents(documents)
+        self.corpus_version = f"{os.stat(self.data_file).st_mtime_ns:x}"
+        self.id_table = self.load_id_table()
+        self.chunk_table = ChunkTable.whole_documents(self.id_table.indexed_ids())
+        self.doc_epochs = parse_epochs(documents)
+
+    def load_id_table(self):
+        """
+        Load the persisted id table, checking it against the data file.
+        Falls back to a table computed from the documents if it is missing
+        or was written for a different version of the data file.
+        """
+        expected = DocIdTable.from_documents(self.documents)
+        if os.path.exists(self.ids_file):
+            try:
+                table = DocIdTable.load(self.ids_file)
+                if table.matches(expected):
+                    return table
+                print("Id table does not match the data file")
+            except Exception as e:
+                print(f"Error loading id table: {e}")
+        return expected
+
+    def load_sparse_index(self):
+        """Load the BM25 index, rebuilding it over the chunk table if it is stale."""
+        if os.path.exists(self.sparse_file):
+            try:
+                sparse_index = SparseIndex.load(self.sparse_file)
+                if np.array_equal(sparse_index.live_ids(), np.sort(self.chunk_table.ids)):
+                    return sparse_index
+            except Exception as e:
+                print(f"Error loading sparse index: {e}")
+
+        sparse_index = SparseIndex()
+        texts = {doc_id: doc["text"] for doc_id, doc in self.indexed_documents().items()}
+        sparse_index.add(self.chunk_table.ids.tolist(), self.chunk_table.texts(texts))
+        return sparse_index
+
+    def resolve_index_params(self, ntotal, dim):
+        index_type = choose_index_type(
+            ntotal, self.index_type, self.large_index_type, self.auto_index_threshold
+        )
+        params = default_index_params(index_type, ntotal, dim)
+        params.update(self.index_params_override.get(index_type, {}))
+        return params
 
+    def indexed_documents(self):
+        """Documents that have a vector in the index, keyed by their id."""
         return {
-            currency: data[base_currency][currency]
-            for currency in target_currencies
-            if currency in data[base_currency]
+            document_id(doc): doc for doc in self.documents if doc["text"] != ""
         }
 
-    def update_documents(self, new_messages):
-        # Add Russia Central Bank stack
-        url = "https://www.cbr.ru/hd_base/keyrate/"
-        response = requests.get(url)
-        response.raise_for_status()
-
-        df = pd.read_html(response.text)[0]
-        df.columns = ["Date", "Rate"]
-        latest_record = df.iloc[0]
-
-        cb_date = datetime.strptime(latest_record["Date"], "%d.%m.%Y").replace(
-            tzinfo=timezone.utc
+    def index_matches_documents(self, index):
+        if index.d != self.embedding_backend.dimension:
+            return False
+        expected_ids = np.sort(self.chunk_table.ids)
+        if index.ntotal != len(expected_ids):
+            return False
+        return np.array_equal(np.sort(index_ids(index)), expected_ids)
+
+    def migrate_flat_index(self, index):
+        """Wrap a legacy positional index into an id-mapped one without re-embedding."""
+        indexed = [doc for doc in self.documents if doc["text"] != ""]
+        if index.ntotal != len(indexed):
+            return None
+        vectors = index.reconstruct_n(0, index.ntotal)
+        id_index = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+        id_index.add_with_ids(
+            vectors, np.array([document_id(doc) for doc in indexed], dtype="int64")
         )
-        cb_rate = float(latest_record["Rate"] / 100)
+        return id_index
 
-        cb_message = {
-            "text": f"Текущая ставка центрального банка ЦБ России РФ составляет {cb_rate} процентов.",
-            "link": "https://www.cbr.ru/hd_base/keyrate/",
-            "date": cb_date.isoformat(),
-        }
-
-        new_messages.insert(0, cb_message)
-
-        url = "https://frankrg.com/frg100index"
-        response = requests.get(url)
-        response.raise_for_status()
+    def create_index(self):
+        """
+        Chunk all documents and build the dense shards from scratch. The
+        caller rebuilds the BM25 index if needed and publishes with save_snapshot.
+        """
+        texts = {doc_id: doc["text"] for doc_id, doc in self.indexed_documents().items()}
+        chunk_table = ChunkTable.from_texts(texts, self.chunk_words, self.chunk_overlap)
+        embeddings = self.get_embedding(chunk_table.texts(texts))
+        if embeddings is None:
+            raise RuntimeError("failed to embed documents")
+        dimension = self.embedding_backend.dimension
+        self.embeddings = np.array(embeddings, dtype="float32").reshape(len(chunk_table), dimension)
+        self.chunk_table = chunk_table
+
+        cold_before = cold_boundary(time.time(), self.shard_period, self.hot_shards)
+        index = ShardedIndex(self.shard_period, cold_before)
+        keys = self.chunk_shard_keys(chunk_table, cold_before)
+        for key in dict.fromkeys(keys.tolist()):
+            rows = keys == key
+            index.set_shard(key, *self.build_shard(self.embeddings[rows], chunk_table.ids[rows]))
+        self.index = index
+
+    def update_index(self, stale_ids, fresh):
+        """
+        Bring the index in line with self.documents by touching only the
+        documents that were added, edited or removed.
+        Errors propagate, so a failed update is never published.
+
+        Args:
+            stale_ids: Ids whose old vectors have to go
+            fresh: New or edited texts to embed, keyed by id
+        """
+        if self.index is None:
+            self.corpus_version = f"{time.time_ns():x}"
+            self.create_index()
+            self.sparse_index = self.load_sparse_index()
+            return
+
+        if not stale_ids and not fresh:
+            return
+
+        self.corpus_version = f"{time.time_ns():x}"
+        self.chunk_table, stale_chunks = self.chunk_table.without_parents(stale_ids)
+        new_chunks = ChunkTable.from_texts(fresh, self.chunk_words, self.chunk_overlap)
+        self.chunk_table = self.chunk_table.concat(new_chunks)
+        fresh_ids = new_chunks.ids.tolist()
+        fresh_texts = new_chunks.texts(fresh)
+
+        # The lexical index is local, so it is updated even if embedding fails
+        self.sparse_index.remove(stale_chunks)
+        self.sparse_index.add(fresh_ids, fresh_texts)
+
+        if fresh_ids:
+            embeddings = self.get_embedding(fresh_texts)
+            if embeddings is None:
+                raise RuntimeError("failed to embed new documents")
+        if stale_chunks:
+            for key in self.index.remove_ids(np.array(stale_chunks, dtype="int64")):
+                # HNSW shards cannot drop vectors; rebuild them without the stale chunks
+                ids = index_ids(self.index.shards[key])
+                self.index.drop_shard(key)
+                self.add_to_shard(key, ids[~np.isin(ids, stale_chunks)])
+        if fresh_ids:
+            vectors = np.array(embeddings, dtype="float32").reshape(len(fresh_ids), -1)
+            keys = self.chunk_shard_keys(new_chunks, self.index.cold_before)
+            for key in dict.fromkeys(keys.tolist()):
+                rows = keys == key
+                self.add_to_shard(key, new_chunks.ids[rows], vectors[rows])
+        for key in list(self.index.shards):
+            if self.index.shards[key].ntotal == 0:
+                self.index.drop_shard(key)
+        self.compact_shards()
+        print(
+            f"Index updated: {len(fresh_ids)} chunks added, "
+            f"{len(stale_chunks) - len(set(stale_chunks) & set(fresh_ids))} removed, "
+            f"{len(self.index.hot_keys())} hot shards"
+        )
 
-        # Deposit avg rates
-        df = pd.read_html(response.text)[0]
-        deposits_rate = df[0].iloc[1]
-        deposits_message = {
-            "text": f"На основании данных индекса ставок по вкладам FRG100, средние ставки по вкладам и депозитам в российских банках составляют {deposits_rate}",
-            "link": "https://frankrg.com/frg100index",
-            "date": datetime.now(timezone.utc).isoformat(),
-        }
+    def chunk_shard_keys(self, chunk_table, cold_before):
+        """Shard key of each chunk, from the date of its parent document."""
+        positions = self.id_table.positions(chunk_table.parents)
+        return assign_shards(np.asarray(self.doc_epochs)[positions], self.shard_period, cold_before)
+
+    def chunk_vectors(self, chunk_ids):
+        """Vectors of indexed chunks, read back from the embedding store."""
+        parents, starts, ends = self.chunk_table.lookup(chunk_ids)
+        documents = self.documents.get_many(self.id_table.positions(parents))
+        texts = [
+            doc["text"][start:] if end == WHOLE else doc["text"][start:end]
+            for doc, start, end in zip(documents, starts.tolist(), ends.tolist())
+        ]
+        embeddings = self.get_embedding(texts)
+        if embeddings is None:
+            raise RuntimeError("failed to load chunk embeddings")
+        return np.array(embeddings, dtype="float32").reshape(len(texts), -1)
+
+    def build_shard(self, vectors, ids):
+        """A new shard of the index type that fits its size, holding the given vectors."""
+        params = self.resolve_index_params(len(ids), self.embedding_backend.dimension)
+        shard = build_index(params, vectors)
+        if len(ids) > 0:
+            shard.add_with_ids(vectors, ids)
+        return shard, params
+
+    def add_to_shard(self, key, ids, vectors=None):
+        """
+        Add chunks to a shard, creating it if needed. A shard that outgrows
+        its index type is rebuilt; vectors come from the embedding store, so
+        no text is embedded twice.
+        """
+        if len(ids) == 0:
+            return
+        if vectors is None:
+            vectors = self.chunk_vectors(ids)
+        shard = self.index.shards.get(key)
+        if shard is not None:
+            wanted_type = choose_index_type(
+                shard.ntotal + len(ids), self.index_type, self.large_index_type, self.auto_index_threshold
+            )
+            if wanted_type == self.index.params[key]["type"]:
+                self.index.add_to_shard(key, vectors, np.asarray(ids, dtype="int64"))
+                return
+            old_ids = index_ids(shard)
+            ids = np.concatenate([old_ids, ids])
+            vectors = np.concatenate([self.chunk_vectors(old_ids), vectors])
+        self.index.set_shard(key, *self.build_shard(vectors, np.asarray(ids, dtype="int64")))
+
+    def compact_shards(self):
+        """Move hot shards that aged past the hot window into the cold shard."""
+        cold_before = cold_boundary(time.time(), self.shard_period, self.hot_shards)
+        if cold_before <= self.index.cold_before:
+            return
+        aged = [key for key in self.index.hot_keys() if key < shard_key(cold_before)]
+        ids = [index_ids(self.index.shards[key]) for key in aged]
+        for key in aged:
+            self.index.drop_shard(key)
+        self.index.cold_before = cold_before
+        if aged:
+            self.add_to_shard(COLD, np.concatenate(ids))
+            print(f"Compacted {len(aged)} shards into the cold tier")
 
-        new_messages.insert(1, deposits_message)
-
-        # Fetch currency rates
-        # Source for currencies https://github.com/fawazahmed0/exchange-api?tab=readme-ov-file#endpoints
-        target_currencies = ["rub", "usd", "eur", "cny", "jpy", "gbp"]
-        base_currency = "usd"
-        currency_data = self.fetch_currency_data("usd", target_currencies)
-        currency_message = {
-            "text": f"Курсы валют на сегодняшний день {datetime.now().isoformat()} к {base_currency.upper()} - {', '.join([f'{currency.upper()}: {rate}' for currency, rate in currency_data.items()])}.",
-            "link": "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json",
-            "date": datetime.now(timezone.utc).isoformat(),
-        }
+    def preprocess_financial_data(self, text):
+        text = emoji.replace_emoji(text, replace="")
+        text = re.sub(r"[^\w\s.,!?]", "", text)
+        return text
 
-        new_messages.insert(2, currency_message)
+    def filter_chunks(self, chunk_ids, start=None, end=None, channel=None):
+        """Keep the chunks whose documents are dated in [start, end) and belong to channel."""
+        positions = self.id_table.positions(self.chunk_table.lookup(chunk_ids)[0])
+        keep = positions >= 0
+        if not keep.any():
+            return chunk_ids[keep]
+        epochs = np.asarray(self.doc_epochs)[np.where(keep, positions, 0)]
+        if start is not None:
+            keep &= epochs >= start.timestamp()
+        if end is not None:
+            keep &= epochs < end.timestamp()
+        if channel is not None and keep.any():
+            channels = self.documents.channels_at(positions[keep])
+            keep[keep] = [channels.get(pos) == channel for pos in positions[keep].tolist()]
+        return chunk_ids[keep]
+
+    def get_relevant_documents(self, query, top_k=20, start=None, end=None, channel=None,
+                               query_embedding=None, dense=True):
+        """
+        Retrieve documents for a question. Dense FAISS hits and BM25 hits are
+        merged with reciprocal-rank fusion; if the embedding API fails or
+        times out, the lexical results are used alone.
+
+        Both indexes hold chunks of posts. Each returned document carries the
+        parent's link and date, but its text is only the matching chunks.
+
+        Args:
+            top_k: Documents to return; the search goes deeper while the hits
+                are chunks of fewer posts than that
+            start, end: Only documents dated in [start, end) (aware datetimes);
+                dense search then only visits the shards of that range
+            channel: Only documents of this channel (see document_store.channel_of)
+            query_embedding: Embedding of the query if the caller already has it
+            dense: False if the caller already failed to embed the query; the
+                search is then lexical without calling the embedding API again
+        """
+        filtered = start is not None or end is not None or channel is not None
+        fetch_k = top_k * FILTER_OVERFETCH if filtered else top_k
+        if not dense:
+            # the caller's embedding call already failed and was reported
+            metrics.inc("dense_retrieval_failures_total")
+        while True:
+            ranked_lists = []
+            if dense:
+                try:
+                    if query_embedding is None:
+                        query_embedding = self.embed_query(query)
+                    with timed("dense_search"):
+                        _, I = self.index.search(
+                            np.asarray(query_embedding, dtype="float32").reshape(1, -1),
+                            fetch_k,
+                            start.timestamp() if start is not None else None,
+                            end.timestamp() if end is not None else None,
+                        )
+                    ranked_lists.append(I[0][I[0] != -1])
+                except Exception as e:
+                    metrics.inc("dense_retrieval_failures_total")
+                    print(f"Dense retrieval failed, using lexical search only: {e}")
+                    dense = False
+
+            if self.hybrid or not ranked_lists:
+                with timed("sparse_search"):
+                    _, sparse_ids = self.sparse_index.search(query, fetch_k)
+                ranked_lists.append(sparse_ids)
+
+            if filtered:
+                with timed("filter"):
+                    ranked_lists = [self.filter_chunks(ids, start, end, channel) for ids in ranked_lists]
+
+            with timed("fusion"):
+                chunk_ids, fused_scores = reciprocal_rank_fusion(ranked_lists, self.rrf_k, fetch_k)
+                parents, starts, ends = self.chunk_table.lookup(chunk_ids)
+            # Several hits can be chunks of one post; search deeper until the
+            # hits cover top_k posts or the whole index
+            if len(np.unique(parents[parents != -1])) >= top_k or fetch_k >= len(self.chunk_table):
+                break
+            fetch_k *= PARENT_OVERFETCH
+
+        with timed("fusion"):
+            # a document scores as its best chunk; chunks come best first
+            spans, first_hits = {}, []
+            for hit, parent in enumerate(parents.tolist()):
+                if parent == -1:
+                    continue
+                if parent not in spans:
+                    spans[parent] = []
+                    first_hits.append(hit)
+                spans[parent].append((int(starts[hit]), int(ends[hit])))
+            first_hits = np.array(first_hits, dtype="int64")
+            positions = self.id_table.positions(parents[first_hits])
+            found = positions >= 0
+            first_hits = first_hits[found][:top_k]
+            positions = positions[found][:top_k]
+        with timed("recency_rerank"):
+            ranked = recency_rerank(
+                fused_scores[first_hits],
+                self.doc_epochs[positions],
+                datetime.now(timezone.utc).timestamp(),
+                self.recency_half_life_days,
+                self.recency_weight,
+            )
+
+        with timed("document_fetch"):
+            parent_ids = parents[first_hits][ranked].tolist()
+            documents = self.documents.get_many(positions[ranked])
+            for parent, doc in zip(parent_ids, documents):
+                doc["text"] = excerpt(doc["text"], spans[parent])
+            return documents
+
+    def load_near_duplicate_index(self) -> NearDuplicateIndex:
+        """Signatures of the stored posts from the dedup window, computed once per writer."""
+        now = datetime.now(timezone.utc)
+        if self.near_duplicates is None:
+            self.near_duplicates = NearDuplicateIndex(self.dedup_bands, self.dedup_window_days)
+            start = now - timedelta(days=self.dedup_window_days)
+            for doc in self.documents.between(start, now + timedelta(days=1)):
+                if not doc["link"].startswith(TELEGRAM_LINK_PREFIX):
+                    continue
+                signature = minhash(doc["text"])
+                if signature is not None:
+                    self.near_duplicates.add(doc["link"], signature, datetime.fromisoformat(doc["date"]).timestamp())
+        self.near_duplicates.expire(now.timestamp())
+        return self.near_duplicates
+
+    def load_documents_by_link(self, links):
+        return self.documents.get_many(doc["pos"] for doc in self.documents.find_links(links))
 
-        # Fetch Bitcoin rate
-        bitcoin_data = self.fetch_currency_data("btc", ["usd"])
-        bitcoin_message = {
-            "text": f"Курс биткоина (Bitcoin) в долларах на сегодняшний день: USD: {bitcoin_data.get('usd', 'N/A')}.",
-            "link": "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/btc.json",
-            "date": datetime.now(timezone.utc).isoformat(),
-        }
+    def update_documents(self, new_messages):
+        if self.read_only:
+            raise RuntimeError("update_documents called on a read-only RAGSystem")
 
-        new_messages.insert(3, bitcoin_message)
+        # Key rate, deposit rates, currency and bitcoin rates, fetched concurrently
+        new_messages = self.market_data.fetch_all() + new_messages
 
         spam_words = {"аудиоверсия", "скидка", "реклама", "промокод"}
         for msg in new_messages:
@@ -264,21 +796,49 @@ class RAGSystem:
                 date = date.replace(tzinfo=timezone.utc)
             msg["date"] = date.isoformat()
 
-        old_docs = self.documents.copy() if self.documents else []
-        self.documents = new_messages
-
-        with open(self.data_file, "w", encoding="utf-8") as file:
-            json.dump(self.documents, file, ensure_ascii=False, indent=4)
-
-        if len(old_docs) != len(self.documents) or any(
-            old != new for old, new in zip(old_docs, self.documents)
-        ):
-            self.create_index()
-
-
-# data update
-# from telegram_client import update_messages
+        # Reposts of the same news collapse into one canonical document, so
+        # they are neither embedded nor shown to the LLM twice
+        with timed("near_duplicates"):
+            new_messages, duplicates = collapse_duplicates(
+                new_messages,
+                self.load_near_duplicate_index(),
+                self.load_documents_by_link,
+                include=lambda msg: msg["link"].startswith(TELEGRAM_LINK_PREFIX),
+            )
+        if duplicates:
+            metrics.inc("ingest_duplicates_total", duplicates)
+            print(f"Skipped {duplicates} near-duplicate posts")
+
+        # Ingestion is incremental, so the batch only holds new posts and the
+        # refreshed market data; stored documents stay unless superseded
+        replaced = self.documents.find_links(msg["link"] for msg in new_messages)
+        old_texts = {document_id(doc): doc["text"] for doc in replaced if doc["text"] != ""}
+        fresh = {}
+        for msg in new_messages:
+            if msg["text"] != "":
+                fresh.setdefault(document_id(msg), msg["text"])
+        stale_ids = [
+            doc_id for doc_id, text in old_texts.items() if fresh.get(doc_id) != text
+        ]
+        fresh = {
+            doc_id: text for doc_id, text in fresh.items() if old_texts.get(doc_id) != text
+        }
 
-# rag_system = RAGSystem(data_file='data/telegram_messages.json', index_file='data/faiss_index.idx')
-# new_messages = update_messages()
-# rag_system.update_documents(new_messages)
+        keep = np.ones(len(self.documents), dtype=bool)
+        keep[[doc["pos"] for doc in replaced]] = False
+
+        # Documents and indexes are published together, only once both are done
+        with SnapshotWriter(self.snapshot_dir) as writer:
+            self.documents = DocumentStore.create(
+                writer.path(SNAPSHOT_DOCUMENTS),
+                new_messages,
+                base=self.documents,
+                exclude_positions=[doc["pos"] for doc in replaced],
+            )
+            self.id_table = DocIdTable(np.concatenate([
+                DocIdTable.from_documents(new_messages).ids, self.id_table.ids[keep]
+            ]))
+            self.doc_epochs = np.concatenate([parse_epochs(new_messages), self.doc_epochs[keep]])
+            self.update_index(stale_ids, fresh)
+            self.write_snapshot(writer)
+        self.open_published_documents(writer.version)
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import argparse
+import traceback
+from datetime import datetime, timezone
+
+from filelock import FileLock, Timeout
+
+from metrics import timed, trace
+from snapshot import SNAPSHOT_DIR, read_manifest
+
+LOCK_FILE = "data/refresh.lock"
+STATUS_FILE = "data/refresh_status.json"
+
+
+def read_published_version(snapshot_dir=SNAPSHOT_DIR):
+    """Version of the current snapshot, or None if nothing was published yet."""
+    manifest = read_manifest(snapshot_dir)
+    return manifest["version"] if manifest else None
+
+
+def read_refresh_status(status_file=STATUS_FILE):
+    """Outcome of the latest refresh as written by refresh(), or None before the first one."""
+    try:
+        with open(status_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Error reading refresh status: {e}")
+        return None
+
+
+def write_refresh_status(status, status_file=STATUS_FILE):
+    tmp_path = f"{status_file}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, status_file)
+
+
+def refresh_running(lock_file=LOCK_FILE):
+    """True while some process holds the refresh lock."""
+    lock = FileLock(lock_file)
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        return True
+    lock.release()
+    return False
+
+
+def refresh(rag_system=None, lock_file=LOCK_FILE, status_file=STATUS_FILE):
+    """
+    Run one ingestion + indexing pass and publish the result.
+
+    Args:
+        rag_system: Writable RAGSystem to reuse between passes; created if None
+        status_file: Where the state and outcome of the pass are recorded for the app
+
+    Returns:
+        RAGSystem used for the pass, or None if another refresh holds the lock
+    """
+    from rag_system import RAGSystem
+    from telegram_client import update_messages, save_high_water_marks
+
+    lock = FileLock(lock_file)
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        print("Another refresh is already running")
+        return None
+
+    status = {"state": "running", "started": datetime.now(timezone.utc).isoformat()}
+    try:
+        write_refresh_status(status, status_file)
+        if rag_system is None:
+            rag_system = RAGSystem()
+        started = time.monotonic()
+        with trace("refresh"):
+            with timed("telegram_fetch"):
+                new_messages = update_messages()
+            # Publishes a new snapshot; readers pick it up from its manifest
+            with timed("update_documents"):
+                rag_system.update_documents(new_messages)
+            save_high_water_marks(new_messages)
+        print(f"Refresh finished in {time.monotonic() - started:.1f}s, "
+              f"{len(new_messages)} new messages, snapshot {rag_system.snapshot_version}")
+        status.update(state="finished", new_messages=len(new_messages), snapshot=rag_system.snapshot_version)
+        return rag_system
+    except Exception as e:
+        status.update(state="failed", error=str(e) or type(e).__name__)
+        raise
+    finally:
+        status["finished"] = datetime.now(timezone.utc).isoformat()
+        try:
+            write_refresh_status(status, status_file)
+        except OSError as e:
+            print(f"Error writing refresh status: {e}")
+        lock.release()
+
+
+def refresh_safely():
+    """refresh() for background threads: errors are logged instead of raised."""
+    try:
+        refresh()
+    except Exception:
+        traceback.print_exc()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh Telegram messages, market data and the search index")
+    parser.add_argument("--once", action="store_true", help="Run a single refresh and exit")
+    parser.add_argument("--interval", type=float, default=1800, help="Seconds between refreshes")
+    args = parser.parse_args()
+
+    rag_system = None
+    published = None
+    while True:
+        if read_published_version() != published:
+            # someone else (e.g. the app's refresh button) published meanwhile
+            rag_system = None
+        try:
+            rag_system = refresh(rag_system) or rag_system
+        except Exception:
+            traceback.print_exc()
+            # the in-memory state may be half-updated; reload the last snapshot
+            rag_system = None
+        published = read_published_version()
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
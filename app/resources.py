@@ -0,0 +1,85 @@
+import time
+import threading
+import traceback
+from typing import Callable, Optional
+
+from query_cache import QueryEmbeddingCache
+from refresh_worker import read_published_version
+
+
+class SharedRAGSystem:
+    """
+    One read-only RAGSystem per process, replaced by read-copy-update.
+
+    current() is cheap and lock-free on the hot path: it returns whatever
+    instance is published at the moment. When the refresh worker publishes
+    a new snapshot, the replacement is loaded in a background thread while
+    the old instance keeps serving; once loaded it is swapped in with a
+    single reference assignment. Callers that already hold the old instance
+    finish with it and it is garbage collected afterwards.
+
+    The query embedding cache does not depend on the snapshot, so it is
+    owned here and handed to every instance the loader builds.
+
+    Args:
+        loader: Builds a read-only RAGSystem from the published snapshot,
+            using the query embedding cache it is given
+        check_interval: Seconds between checks for a newly published version
+        query_cache: Shared query embedding cache; a new one if None
+    """
+
+    def __init__(self, loader: Callable[[QueryEmbeddingCache], object], check_interval: float = 5.0,
+                 query_cache: Optional[QueryEmbeddingCache] = None):
+        self.loader = loader
+        self.check_interval = check_interval
+        self.query_cache = query_cache if query_cache is not None else QueryEmbeddingCache()
+        self._lock = threading.Lock()
+        self._current = None
+        self._version = None
+        self._reloading = False
+        self._next_check = 0.0
+
+    def warm_up(self):
+        """Load the current snapshot synchronously and touch its lazy parts."""
+        with self._lock:
+            if self._current is None:
+                self._version = read_published_version()
+                self._current = self.loader(self.query_cache)
+                self._next_check = time.monotonic() + self.check_interval
+        self._current.warm_up()
+
+    def current(self):
+        if self._current is None:
+            self.warm_up()
+        elif time.monotonic() >= self._next_check:
+            self._maybe_reload()
+        return self._current
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    def _maybe_reload(self):
+        with self._lock:
+            if self._reloading or time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            version = read_published_version()
+            if version == self._version:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(version,), daemon=True).start()
+
+    def _reload(self, version):
+        try:
+            rag_system = self.loader(self.query_cache)
+            rag_system.warm_up()
+            with self._lock:
+                self._current, self._version = rag_system, version
+            print(f"Switched to snapshot {version}")
+        except Exception:
+            # keep serving the old instance; the next check retries
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self._reloading = False
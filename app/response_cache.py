@@ -0,0 +1,105 @@
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from metrics import metrics
+
+
+def history_key(chat_history: List[Dict[str, Any]]) -> str:
+    """
+    Fingerprint of the conversation an answer depends on. Empty for the
+    first question of a session, so those answers are shared across sessions.
+    """
+    if not chat_history:
+        return ""
+    payload = json.dumps(
+        [(msg["role"], msg["content"]) for msg in chat_history], ensure_ascii=False
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """
+    Semantic cache of final answers.
+
+    An entry is reused when a new question's embedding has cosine
+    similarity of at least similarity_threshold with a cached question, the
+    corpus version is the same and the conversation so far is identical.
+    Entries expire after ttl seconds and the least recently used one is
+    evicted once maxsize is reached; entries of an outdated corpus version
+    are dropped on the next lookup.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, maxsize: int = 256, ttl: float = 3600):
+        self.similarity_threshold = similarity_threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype="float32")
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def _purge(self, corpus_version: str):
+        now = time.monotonic()
+        stale = [
+            key for key, entry in self._entries.items()
+            if entry["corpus_version"] != corpus_version or now - entry["created"] > self.ttl
+        ]
+        for key in stale:
+            del self._entries[key]
+
+    def lookup(self, query_embedding: np.ndarray, corpus_version: str, context_key: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Returns:
+            Dict with "answer" and "sources" of the best matching entry, or None
+        """
+        with self._lock:
+            self._purge(corpus_version)
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if entry["context_key"] == context_key
+            ]
+            if candidates:
+                matrix = np.stack([entry["embedding"] for _, entry in candidates])
+                similarities = matrix @ self._normalize(query_embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc("response_cache_total", result="hit")
+                    return {"answer": entry["answer"], "sources": entry["sources"]}
+            self.misses += 1
+            metrics.inc("response_cache_total", result="miss")
+            return None
+
+    def store(self, query_embedding: np.ndarray, corpus_version: str, answer: str,
+              sources: List[Dict[str, Any]], context_key: str = ""):
+        with self._lock:
+            self._entries[self._next_key] = {
+                "embedding": self._normalize(query_embedding),
+                "corpus_version": corpus_version,
+                "context_key": context_key,
+                "answer": answer,
+                "sources": sources,
+                "created": time.monotonic(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
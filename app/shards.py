@@ -0,0 +1,208 @@
+import os
+import threading
+import faiss
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from index_factory import apply_search_params, index_ids, supports_removal
+
+SHARD_PERIODS = {"day": 86400, "week": 7 * 86400}
+
+# Partitions younger than this many periods stay hot; older ones are
+# compacted into the single cold shard
+HOT_SHARDS = 8
+
+COLD = "cold"
+
+# The Unix epoch was a Thursday; weekly shards start on Mondays
+WEEK_OFFSET = 3 * 86400
+
+SEARCH_WORKERS = min(8, os.cpu_count() or 1)
+
+_search_pool = None
+_search_pool_lock = threading.Lock()
+
+
+def search_pool() -> ThreadPoolExecutor:
+    """Threads shared by all fan-out searches; FAISS releases the GIL while searching."""
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="shard-search")
+        return _search_pool
+
+
+def partition_start(epochs, period: str):
+    """Start (UTC epoch seconds) of the day or week each timestamp falls in."""
+    seconds = SHARD_PERIODS[period]
+    offset = WEEK_OFFSET if period == "week" else 0
+    return np.floor((np.asarray(epochs, dtype="float64") + offset) / seconds) * seconds - offset
+
+
+def cold_boundary(now: float, period: str, hot_shards: int = HOT_SHARDS) -> float:
+    """Documents dated before this go to the cold shard."""
+    return float(partition_start(now, period)) - (hot_shards - 1) * SHARD_PERIODS[period]
+
+
+def shard_key(start: float) -> str:
+    return datetime.fromtimestamp(start, timezone.utc).date().isoformat()
+
+
+def shard_start(key: str) -> float:
+    return datetime.fromisoformat(key).replace(tzinfo=timezone.utc).timestamp()
+
+
+def shard_file(key: str) -> str:
+    return f"index-{key}.faiss"
+
+
+def assign_shards(epochs: np.ndarray, period: str, cold_before: float) -> np.ndarray:
+    """Shard key of each timestamp: its partition if hot, COLD otherwise."""
+    epochs = np.asarray(epochs, dtype="float64")
+    starts = partition_start(epochs, period)
+    keys = np.full(len(epochs), COLD, dtype=object)
+    hot = epochs >= cold_before
+    for start in np.unique(starts[hot]):
+        keys[hot & (starts == start)] = shard_key(start)
+    return keys
+
+
+class ShardedIndex:
+    """
+    Dense index partitioned by document date.
+
+    Each hot shard holds the chunks of one day or week; everything dated
+    before cold_before lives in one compacted cold shard. A search only
+    visits the shards overlapping the requested date range, in parallel,
+    and merges their hits by distance. Shards are plain FAISS indexes built
+    by index_factory, so each picks its type from its own size.
+
+    Shards changed since they were loaded or last published are tracked in
+    dirty; save() can link the others from the previous snapshot instead of
+    writing them again.
+    """
+
+    def __init__(self, period: str = "week", cold_before: float = float("-inf")):
+        self.period = period
+        self.cold_before = cold_before
+        self.shards = {}
+        self.params = {}
+        self.dirty = set()
+
+    @classmethod
+    def single(cls, index, params: Dict, period: str = "week") -> "ShardedIndex":
+        """Wrap an unpartitioned index, as built before sharding, as one cold shard."""
+        sharded = cls(period, cold_before=float("inf"))
+        sharded.set_shard(COLD, index, params)
+        return sharded
+
+    @classmethod
+    def load(cls, path: Callable[[str], str], params: Dict[str, Dict], period: str, cold_before: float) -> "ShardedIndex":
+        """
+        Args:
+            path: Maps a shard file name to its path
+            params: Index params of each shard, keyed by shard key
+        """
+        sharded = cls(period, cold_before)
+        for key, shard_params in params.items():
+            sharded.set_shard(key, faiss.read_index(path(shard_file(key))), shard_params)
+        sharded.dirty.clear()
+        return sharded
+
+    def save(self, path: Callable[[str], str], link: Optional[Callable[[str], bool]] = None):
+        """
+        Args:
+            path: Maps a shard file name to its path
+            link: Called with the file name of each shard that is not dirty;
+                returns True if it provided the file, e.g. as a hard link to
+                the previous snapshot, so the shard is not written
+        """
+        for key, shard in self.shards.items():
+            if link is not None and key not in self.dirty and link(shard_file(key)):
+                continue
+            faiss.write_index(shard, path(shard_file(key)))
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards.values())
+
+    @property
+    def d(self) -> int:
+        return next(iter(self.shards.values())).d if self.shards else 0
+
+    def set_shard(self, key: str, index, params: Dict):
+        apply_search_params(index, params)
+        self.shards[key] = index
+        self.params[key] = params
+        self.dirty.add(key)
+
+    def add_to_shard(self, key: str, vectors: np.ndarray, ids: np.ndarray):
+        """Add vectors to an existing shard in place."""
+        self.shards[key].add_with_ids(vectors, ids)
+        self.dirty.add(key)
+
+    def drop_shard(self, key: str):
+        self.shards.pop(key, None)
+        self.params.pop(key, None)
+        self.dirty.discard(key)
+
+    def hot_keys(self) -> List[str]:
+        return [key for key in self.shards if key != COLD]
+
+    def keys_for(self, start: Optional[float] = None, end: Optional[float] = None) -> List[str]:
+        """Shards that may hold documents dated in [start, end)."""
+        keys = []
+        for key in self.shards:
+            if key == COLD:
+                low, high = float("-inf"), self.cold_before
+            else:
+                low = shard_start(key)
+                high = low + SHARD_PERIODS[self.period]
+            if (end is None or low < end) and (start is None or high > start):
+                keys.append(key)
+        return keys
+
+    def search(self, queries: np.ndarray, top_k: int, start: Optional[float] = None,
+               end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the shards overlapping [start, end) in parallel.
+
+        Returns:
+            Tuple of (distances, ids) like faiss.Index.search, ids -1 where
+            fewer than top_k hits were found
+        """
+        keys = self.keys_for(start, end)
+        if not keys:
+            return (
+                np.full((len(queries), top_k), np.inf, dtype="float32"),
+                np.full((len(queries), top_k), -1, dtype="int64"),
+            )
+        if len(keys) == 1:
+            results = [self.shards[keys[0]].search(queries, top_k)]
+        else:
+            results = list(search_pool().map(lambda key: self.shards[key].search(queries, top_k), keys))
+
+        D = np.concatenate([D for D, _ in results], axis=1)
+        I = np.concatenate([I for _, I in results], axis=1)
+        order = np.argsort(np.where(I >= 0, D, np.inf), axis=1, kind="stable")[:, :top_k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def remove_ids(self, ids: np.ndarray) -> List[str]:
+        """
+        Remove ids from every shard that supports removal.
+
+        Returns:
+            Keys of shards that hold some of the ids but cannot remove them
+            (HNSW); the caller rebuilds those
+        """
+        ids = np.asarray(ids, dtype="int64")
+        blocked = []
+        for key, shard in self.shards.items():
+            if supports_removal(shard):
+                if shard.remove_ids(ids):
+                    self.dirty.add(key)
+            elif np.isin(index_ids(shard), ids).any():
+                blocked.append(key)
+        return blocked
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+SNAPSHOT_DIR = "data/snapshots"
+MANIFEST_FILE = "CURRENT.json"
+
+# Older snapshots are kept for readers that are still loading them
+KEEP_SNAPSHOTS = 3
+
+# Temp directories older than this are leftovers of a crashed writer
+STALE_TMP_SECONDS = 3600
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fsync_path(path: str):
+    """fsync a file or, where the OS allows it, a directory entry list."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def manifest_checksum(manifest: Dict[str, Any]) -> str:
+    body = {key: value for key, value in manifest.items() if key != "checksum"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SnapshotWriter:
+    """
+    Writes one snapshot into a temporary directory and publishes it atomically.
+
+    Files are written through path() or hard-linked from an earlier
+    snapshot with link(); on a clean exit from the with-block every written
+    file is fsynced and checksummed, the directory is renamed to the
+    snapshot version and CURRENT.json is replaced to point at it. On an
+    exception the temporary directory is removed and the published snapshot
+    stays untouched, so readers only ever see complete snapshots.
+
+    Args:
+        root: Directory holding the snapshots and the manifest
+        metadata: Extra JSON-serializable fields stored in the manifest
+    """
+
+    def __init__(self, root: str = SNAPSHOT_DIR, metadata: Optional[Dict[str, Any]] = None):
+        self.root = root
+        self.metadata = metadata or {}
+        self.version = f"{time.time_ns():x}"
+        self.tmp_dir = None
+        self.linked = {}
+
+    def __enter__(self) -> "SnapshotWriter":
+        os.makedirs(self.root, exist_ok=True)
+        self.tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            return False
+        self.commit()
+        return False
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp_dir, name)
+
+    def link(self, name: str, source: str, entry: Dict[str, Any]) -> bool:
+        """
+        Hard-link an unchanged file of an earlier snapshot instead of writing it.
+        Snapshot files are never modified in place, so both snapshots can share it.
+
+        Args:
+            source: Path of the file in the earlier snapshot
+            entry: Its manifest entry, reused instead of hashing the file again
+
+        Returns:
+            bool: False if the file could not be linked and has to be written
+        """
+        try:
+            os.link(source, self.path(name))
+        except OSError as e:
+            print(f"Error linking {name} from an earlier snapshot: {e}")
+            return False
+        self.linked[name] = entry
+        return True
+
+    def commit(self):
+        files = {}
+        for name in sorted(os.listdir(self.tmp_dir)):
+            if name in self.linked:
+                files[name] = self.linked[name]
+                continue
+            path = self.path(name)
+            fsync_path(path)
+            files[name] = {"size": os.path.getsize(path), "sha256": file_sha256(path)}
+        fsync_path(self.tmp_dir)
+
+        final_dir = os.path.join(self.root, self.version)
+        os.rename(self.tmp_dir, final_dir)
+        fsync_path(self.root)
+
+        manifest = {
+            "version": self.version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "files": files,
+            "metadata": self.metadata,
+        }
+        manifest["checksum"] = manifest_checksum(manifest)
+        manifest_path = os.path.join(self.root, MANIFEST_FILE)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+        fsync_path(self.root)
+
+        prune_snapshots(self.root, self.version)
+
+
+def read_manifest(root: str = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """The published manifest, or None if there is none or it fails its checksum."""
+    path = os.path.join(root, MANIFEST_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Error reading snapshot manifest: {e}")
+        return None
+    if manifest.get("checksum") != manifest_checksum(manifest):
+        print("Snapshot manifest checksum mismatch")
+        return None
+    return manifest
+
+
+def snapshot_file(manifest: Dict[str, Any], name: str, root: str = SNAPSHOT_DIR) -> str:
+    return os.path.join(root, manifest["version"], name)
+
+
+def verify_snapshot(manifest: Dict[str, Any], root: str = SNAPSHOT_DIR, deep: bool = False) -> bool:
+    """
+    Check the files of a snapshot against its manifest.
+
+    By default only presence and sizes are compared, which is enough to
+    catch truncated or missing files without reading them; deep=True also
+    re-hashes every file.
+    """
+    for name, entry in manifest["files"].items():
+        path = snapshot_file(manifest, name, root)
+        try:
+            if os.path.getsize(path) != entry["size"]:
+                print(f"Snapshot file {name} has the wrong size")
+                return False
+        except OSError:
+            print(f"Snapshot file {name} is missing")
+            return False
+        if deep and file_sha256(path) != entry["sha256"]:
+            print(f"Snapshot file {name} fails its checksum")
+            return False
+    return True
+
+
+def prune_snapshots(root: str = SNAPSHOT_DIR, current: Optional[str] = None, keep: int = KEEP_SNAPSHOTS):
+    """Remove all but the newest keep snapshots and stale temp directories."""
+    now = time.time()
+    snapshots = []
+    for entry in os.scandir(root):
+        if not entry.is_dir():
+            continue
+        if entry.name.startswith(".tmp-"):
+            if now - entry.stat().st_mtime > STALE_TMP_SECONDS:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        elif entry.name != current:
+            snapshots.append(entry)
+    snapshots.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in snapshots[max(keep - 1, 0):]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the published snapshot against its checksums")
+    parser.add_argument("--root", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    manifest = read_manifest(args.root)
+    if manifest is None:
+        raise SystemExit("No valid snapshot manifest")
+    if not verify_snapshot(manifest, args.root, deep=True):
+        raise SystemExit(1)
+    print(f"Snapshot {manifest['version']} is intact ({len(manifest['files'])} files)")
+
+
+if __name__ == "__main__":
+    main()
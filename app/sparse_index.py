@@ -0,0 +1,164 @@
+import os
+import re
+import numpy as np
+import scipy.sparse as sp
+from typing import List, Tuple
+from sklearn.feature_extraction.text import HashingVectorizer
+
+# Words, tickers ($SBER) and numbers with decimals/percent ("21%", "16,11%")
+TOKEN_PATTERN = re.compile(r"\$?\w+(?:[.,]\d+)*%?")
+
+N_FEATURES = 2 ** 20
+MAX_SEGMENTS = 8
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+class SparseIndex:
+    """
+    Incremental BM25 index over hashed term counts.
+
+    Rows are stored in append-only CSC segments so new documents never
+    rewrite existing ones; removed documents are tombstoned and their term
+    counts subtracted from the document frequencies. Segments are merged
+    once there are more than MAX_SEGMENTS of them and on save.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vectorizer = HashingVectorizer(
+            n_features=N_FEATURES,
+            tokenizer=tokenize,
+            token_pattern=None,
+            lowercase=False,
+            alternate_sign=False,
+            norm=None,
+        )
+        self.segments = []
+        self.slot_ids = np.empty(0, dtype="int64")
+        self.doc_len = np.empty(0, dtype="float32")
+        self.df = np.zeros(N_FEATURES, dtype="int32")
+        self.id_to_slot = {}
+
+    def __len__(self) -> int:
+        return len(self.id_to_slot)
+
+    def live_ids(self) -> np.ndarray:
+        return np.sort(self.slot_ids[self.slot_ids >= 0])
+
+    def add(self, doc_ids: List[int], texts: List[str]):
+        """Index new documents. Ids that are already present are replaced."""
+        if not doc_ids:
+            return
+        self.remove([doc_id for doc_id in doc_ids if doc_id in self.id_to_slot])
+
+        counts = self.vectorizer.transform(texts).tocsc()
+        counts.data = counts.data.astype("float32")
+        start = len(self.slot_ids)
+        self.segments.append(counts)
+        self.slot_ids = np.concatenate([self.slot_ids, np.asarray(doc_ids, dtype="int64")])
+        doc_len = np.asarray(counts.sum(axis=1)).ravel().astype("float32")
+        self.doc_len = np.concatenate([self.doc_len, doc_len])
+        self.df += np.diff(counts.indptr).astype("int32")
+        self.id_to_slot.update(zip(doc_ids, range(start, start + len(doc_ids))))
+
+        if len(self.segments) > MAX_SEGMENTS:
+            self.compact()
+
+    def remove(self, doc_ids: List[int]):
+        slots = [self.id_to_slot.pop(doc_id) for doc_id in doc_ids if doc_id in self.id_to_slot]
+        if not slots:
+            return
+        slots = np.asarray(slots, dtype="int64")
+        offsets = np.cumsum([0] + [segment.shape[0] for segment in self.segments])
+        for segment, start, end in zip(self.segments, offsets[:-1], offsets[1:]):
+            local = slots[(slots >= start) & (slots < end)] - start
+            if len(local):
+                self.df -= np.diff(segment[local, :].indptr).astype("int32")
+        self.slot_ids[slots] = -1
+
+    def _matrix(self) -> sp.csc_matrix:
+        if len(self.segments) == 1:
+            return self.segments[0]
+        if not self.segments:
+            return sp.csc_matrix((0, N_FEATURES), dtype="float32")
+        return sp.vstack(self.segments, format="csc")
+
+    def compact(self):
+        """Merge segments and drop tombstoned rows."""
+        live = np.flatnonzero(self.slot_ids >= 0)
+        matrix = self._matrix().tocsr()[live].tocsc()
+        self.segments = [matrix] if matrix.shape[0] else []
+        self.slot_ids = self.slot_ids[live]
+        self.doc_len = self.doc_len[live]
+        self.id_to_slot = dict(zip(self.slot_ids.tolist(), range(len(live))))
+
+    def search(self, query: str, top_k: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 search.
+
+        Returns:
+            Tuple of (scores, doc_ids), best first; only documents sharing at
+            least one term with the query are returned.
+        """
+        query_counts = self.vectorizer.transform([query])
+        terms = np.unique(query_counts.indices)
+        if len(terms) == 0 or len(self) == 0:
+            return np.empty(0, dtype="float32"), np.empty(0, dtype="int64")
+
+        n_docs = len(self)
+        df = self.df[terms].astype("float32")
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        live = self.slot_ids >= 0
+        avg_len = max(float(self.doc_len[live].mean()), 1.0)
+
+        scores = np.zeros(len(self.slot_ids), dtype="float32")
+        offset = 0
+        for segment in self.segments:
+            sub = segment[:, terms].tocoo()
+            rows = sub.row + offset
+            tf = sub.data
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[rows] / avg_len)
+            contrib = idf[sub.col] * tf * (self.k1 + 1) / (tf + norm)
+            scores += np.bincount(rows, weights=contrib, minlength=len(scores)).astype("float32")
+            offset += segment.shape[0]
+
+        scores[~live] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return scores[order], self.slot_ids[order]
+
+    def save(self, path: str):
+        self.compact()
+        matrix = self._matrix()
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            data=matrix.data,
+            indices=matrix.indices,
+            indptr=matrix.indptr,
+            shape=np.asarray(matrix.shape),
+            slot_ids=self.slot_ids,
+            doc_len=self.doc_len,
+            df=self.df,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SparseIndex":
+        index = cls()
+        with np.load(path) as data:
+            matrix = sp.csc_matrix(
+                (data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"])
+            )
+            index.segments = [matrix] if matrix.shape[0] else []
+            index.slot_ids = data["slot_ids"]
+            index.doc_len = data["doc_len"]
+            index.df = data["df"]
+        index.id_to_slot = dict(zip(index.slot_ids.tolist(), range(len(index.slot_ids))))
+        return index
@@ -1,44 +1,126 @@
 import os
+import re
+import json
 import asyncio
 from telethon import TelegramClient
 from dotenv import load_dotenv
 
 load_dotenv()
 
-api_id = 
+api_id = os.environ.get("TELEGRAM_API_ID")
 api_hash = ''
 phone_number = ""
 channel_username_list = '@finprofit,@omyinvestments,@ecotopor'.split(',')
 
-async def get_channel_messages(limit=200):
+STATE_FILE = "data/telegram_state.json"
+MAX_CONCURRENT_CHANNELS = 8
+PAGE_SIZE = 100
+
+def load_high_water_marks(state_file=STATE_FILE):
+    """Last stored message id per channel."""
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_high_water_marks(messages, state_file=STATE_FILE):
+    """
+    Advance the per-channel high-water marks past the given messages.
+    Call only after the messages are safely stored, so a failed refresh
+    fetches them again next time.
+    """
+    marks = load_high_water_marks(state_file)
+    for msg in messages:
+        match = re.match(r"https://t\.me/([^/]+)/(\d+)$", msg["link"])
+        if match:
+            channel_username = f"@{match.group(1)}"
+            marks[channel_username] = max(marks.get(channel_username, 0), int(match.group(2)))
+
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(marks, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, state_file)
+
+def clean_message(message, channel_username):
+    try:
+        video = message.media.video
+    except:
+        video = False
+    if message.text and not video:
+        channel_username_link = channel_username.lstrip("@")
+        message_link = f"https://t.me/{channel_username_link}/{message.id}"
+        return {
+            "text": message.text,
+            "link": message_link,
+            "date": message.date.isoformat()
+        }
+    return None
+
+async def fetch_channel(client, channel_username, min_id, limit, semaphore):
+    """
+    Page backwards from the newest post in PAGE_SIZE chunks until min_id
+    (exclusive) or limit posts are reached.
+    """
+    async with semaphore:
+        chat_info = await client.get_entity(channel_username)
+        cleaned_messages = []
+        offset_id = 0
+        fetched = 0
+        while limit is None or fetched < limit:
+            page_size = PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - fetched)
+            messages = await client.get_messages(
+                entity=chat_info, limit=page_size, offset_id=offset_id, min_id=min_id
+            )
+            if not messages:
+                break
+            for message in messages:
+                cleaned = clean_message(message, channel_username)
+                if cleaned:
+                    cleaned_messages.append(cleaned)
+            fetched += len(messages)
+            offset_id = messages[-1].id
+            if len(messages) < page_size:
+                break
+        return cleaned_messages
+
+async def get_channel_messages(limit=200, backfill_limit=None, state_file=STATE_FILE):
+    """
+    Fetch posts from all channels concurrently over one client.
+
+    Channels with a high-water mark only return posts newer than it; new
+    channels get their latest `limit` posts. With backfill_limit set, the
+    marks are ignored and up to that many posts per channel are paged in.
+    """
+    marks = {} if backfill_limit else load_high_water_marks(state_file)
+
     async with TelegramClient('session', api_id, api_hash) as client:
         await client.start(phone=phone_number)
 
-        cleaned_messages = []
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHANNELS)
+        tasks = []
         for channel_username in channel_username_list:
-            chat_info = await client.get_entity(channel_username)
-            messages = await client.get_messages(entity=chat_info, limit=limit)
-            
-            for message in messages:
-                try:
-                    video = message.media.video
-                except:
-                    video = False
-                if message.text and not video:
-                    channel_username_link = channel_username.lstrip("@")
-                    message_link = f"https://t.me/{channel_username_link}/{message.id}"
-                    cleaned_messages.append({
-                        "text": message.text,
-                        "link": message_link,
-                        "date": message.date.isoformat()
-                    })
-        
+            min_id = marks.get(channel_username, 0)
+            if backfill_limit:
+                channel_limit = backfill_limit
+            else:
+                channel_limit = None if min_id else limit
+            tasks.append(fetch_channel(client, channel_username, min_id, channel_limit, semaphore))
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        cleaned_messages = []
+        for channel_username, result in zip(channel_username_list, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching {channel_username}: {result}")
+                continue
+            cleaned_messages.extend(result)
+
         return cleaned_messages
 
-def update_messages():
+def update_messages(backfill_limit=None):
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        return loop.run_until_complete(get_channel_messages())
+        return loop.run_until_complete(get_channel_messages(backfill_limit=backfill_limit))
     finally:
         loop.close()
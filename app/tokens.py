@@ -0,0 +1,51 @@
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encodings = {}
+
+
+def _get_encoding(encoding_name):
+    """
+    The tiktoken encoding, or None if tiktoken is missing or the encoding
+    cannot be loaded (tiktoken downloads it on first use, so offline
+    machines without a local copy fall back to the byte estimate).
+    """
+    if tiktoken is None:
+        return None
+    if encoding_name not in _encodings:
+        try:
+            _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            print(f"Tokenizer {encoding_name} unavailable, estimating token counts: {e}")
+            _encodings[encoding_name] = None
+    return _encodings[encoding_name]
+
+
+def count_tokens(text, encoding_name="cl100k_base"):
+    """
+    Count tokens with a local tokenizer.
+
+    Uses tiktoken when its encoding can be loaded; otherwise returns an upper-bound
+    estimate (OpenAI tokenizers need at most ~1 token per 3 UTF-8 bytes of
+    Russian or English text).
+    """
+    encoding = _get_encoding(encoding_name)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def truncate_tokens(text, max_tokens, encoding_name="cl100k_base"):
+    """Cut text down to at most max_tokens tokens, marking the cut with an ellipsis."""
+    encoding = _get_encoding(encoding_name)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[: max_tokens - 1]) + "…"
+    encoded = text.encode("utf-8")
+    if len(encoded) // 3 + 1 <= max_tokens:
+        return text
+    return encoded[: (max_tokens - 2) * 3].decode("utf-8", errors="ignore") + "…"
@@ -0,0 +1,30 @@
+import pytest
+
+import metrics
+from benchmarks.corpus import generate_corpus, write_corpus
+from benchmarks.fakes import FakeEmbeddingBackend
+from benchmarks.run import corpus_paths
+from market_data import MarketDataFetcher
+from rag_system import RAGSystem
+
+
+@pytest.fixture(autouse=True)
+def no_trace_log(monkeypatch):
+    monkeypatch.setattr(metrics, "TRACE_LOG", "")
+
+
+@pytest.fixture
+def make_rag(tmp_path):
+    """Build a RAGSystem in tmp_path on the fake embedding backend, offline."""
+
+    def make(documents=None, **kwargs):
+        paths = corpus_paths(str(tmp_path))
+        if documents is None:
+            documents = generate_corpus(50)
+        write_corpus(paths["data_file"], documents)
+        kwargs.setdefault("embedding_backend", FakeEmbeddingBackend())
+        rag = RAGSystem(**paths, **kwargs)
+        rag.market_data = MarketDataFetcher(sources=[], cache_file=str(tmp_path / "market.json"))
+        return rag
+
+    return make
@@ -0,0 +1,24 @@
+from benchmarks.run import find_regressions, parse_size, run_size
+
+
+def test_benchmark_runs_offline(monkeypatch):
+    monkeypatch.setenv("TRACE_LOG", "")
+    result = run_size(300, n_queries=5)
+
+    assert result["size"] == 300
+    for metric in ("build_s", "update_s", "cold_start_s", "retrieval_p50_ms", "answer_p99_ms"):
+        assert result[metric] > 0
+
+
+def test_parse_size():
+    assert parse_size("1k") == 1_000
+    assert parse_size("1.5m") == 1_500_000
+    assert parse_size("250") == 250
+
+
+def test_regressions_need_relative_and_absolute_slowdown():
+    baseline = {"size": 1000, "retrieval_p50_ms": 2.0, "build_s": 10.0, "serve_peak_rss_mb": 200.0}
+    result = {"size": 1000, "retrieval_p50_ms": 2.3, "build_s": 14.0, "serve_peak_rss_mb": 210.0}
+
+    # 2.0 -> 2.3 ms is +15%; 200 -> 210 MB is below the memory floor
+    assert find_regressions(result, baseline, tolerance=0.25) == ["build_s: 10.0 -> 14.0"]
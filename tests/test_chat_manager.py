@@ -0,0 +1,85 @@
+import json
+import os
+
+from chat_manager import ChatManager
+
+
+def messages(n, start=0):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Сообщение {i}", "timestamp": "10:00"}
+        for i in range(start, start + n)
+    ]
+
+
+def read_log(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_growing_session_is_appended(tmp_path):
+    manager = ChatManager(str(tmp_path))
+    path = manager.save_chat_history(messages(2), "session")
+    with open(path, "rb") as f:
+        first = f.read()
+
+    manager.save_chat_history(messages(4), "session")
+
+    with open(path, "rb") as f:
+        assert f.read().startswith(first)
+    assert read_log(path) == messages(4)
+    assert manager.load_chat_history("session.jsonl") == messages(4)
+    assert manager.list_saved_sessions()[0]["message_count"] == 4
+
+
+def test_partial_append_is_ignored_and_cut(tmp_path):
+    manager = ChatManager(str(tmp_path))
+    path = manager.save_chat_history(messages(2), "session")
+    with open(path, "ab") as f:
+        f.write(b'{"role": "user", "cont')
+
+    assert manager.load_chat_history("session.jsonl") == messages(2)
+
+    manager.save_chat_history(messages(3), "session")
+    assert read_log(path) == messages(3)
+
+
+def test_diverged_history_rewrites_the_log(tmp_path):
+    manager = ChatManager(str(tmp_path))
+    path = manager.save_chat_history(messages(4), "session")
+
+    manager.save_chat_history(messages(2, start=10), "session")
+
+    assert read_log(path) == messages(2, start=10)
+    assert manager.load_chat_history("session.jsonl") == messages(2, start=10)
+
+
+def test_legacy_session_is_indexed_and_converted(tmp_path):
+    legacy = {"metadata": {"session_name": "old", "created_at": "2025-01-01T00:00:00"}, "chat_history": messages(2)}
+    with open(tmp_path / "old.json", "w", encoding="utf-8") as f:
+        json.dump(legacy, f, ensure_ascii=False)
+
+    manager = ChatManager(str(tmp_path))
+    [session] = manager.list_saved_sessions()
+    assert session["filename"] == "old.json"
+    assert session["message_count"] == 2
+    assert manager.load_chat_history("old.json") == messages(2)
+
+    manager.save_chat_history(messages(3), "old")
+
+    assert not os.path.exists(tmp_path / "old.json")
+    assert [s["filename"] for s in manager.list_saved_sessions()] == ["old.jsonl"]
+
+
+def test_sessions_are_paginated_and_survive_restart(tmp_path):
+    manager = ChatManager(str(tmp_path))
+    for i in range(7):
+        manager.save_chat_history(messages(2), f"session{i}")
+
+    manager = ChatManager(str(tmp_path))
+    pages = [manager.list_saved_sessions(limit=3, offset=offset) for offset in (0, 3, 6)]
+
+    assert manager.count_sessions() == 7
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [s["session_name"] for page in pages for s in page] == [f"session{i}" for i in reversed(range(7))]
+    assert manager.delete_session("session0.jsonl")
+    assert manager.count_sessions() == 6
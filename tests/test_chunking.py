@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from chunking import WHOLE, ChunkTable, chunk_id, chunk_spans, excerpt
+
+
+def words(n, prefix="слово"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_short_text_is_one_whole_chunk():
+    assert chunk_spans(words(120)) == [(0, WHOLE)]
+
+
+def test_long_text_is_split_into_overlapping_windows():
+    text = words(300)
+    spans = chunk_spans(text, chunk_words=120, overlap_words=30)
+
+    chunks = [text[start:end].split() for start, end in spans]
+    assert [len(chunk) for chunk in chunks] == [120, 120, 120]
+    assert chunks[0][-30:] == chunks[1][:30]
+    assert chunks[-1][-1] == "слово299"
+
+
+def test_table_maps_chunks_to_parents():
+    texts = {11: "Короткий пост", 22: words(300)}
+    table = ChunkTable.from_texts(texts)
+
+    assert table.ids[0] == 11
+    assert table.ids[1:].tolist() == [chunk_id(22, n) for n in range(3)]
+    assert table.texts(texts)[0] == "Короткий пост"
+
+    parents, starts, ends = table.lookup(np.array([table.ids[2], 11, 999]))
+    assert parents.tolist() == [22, 11, -1]
+    assert texts[22][starts[0]:ends[0]] == table.texts(texts)[2]
+
+
+def test_removing_a_parent_drops_all_its_chunks(tmp_path):
+    table = ChunkTable.from_texts({11: "Короткий пост", 22: words(300)})
+
+    kept, removed = table.without_parents([22])
+
+    assert kept.ids.tolist() == [11]
+    assert removed == [chunk_id(22, n) for n in range(3)]
+    path = str(tmp_path / "chunks.npz")
+    table.save(path)
+    assert ChunkTable.load(path).ids.tolist() == table.ids.tolist()
+
+
+def test_excerpt_merges_overlapping_spans():
+    text = "abcdefghij"
+    assert excerpt(text, [(6, 9), (0, 3), (2, 5)]) == "abcde … ghi"
+    assert excerpt(text, [(0, 3), (0, WHOLE)]) == text
+
+
+def test_retrieval_returns_the_matching_chunk_with_its_parent(make_rag):
+    long_post = " ".join([words(200, "вода")] + ["Норникель увеличил дивиденды"] + [words(200, "шум")])
+    documents = [
+        {"text": long_post, "link": "https://t.me/finprofit/1", "date": datetime.now(timezone.utc).isoformat()},
+    ]
+    rag = make_rag(documents)
+
+    [doc] = rag.get_relevant_documents("Норникель дивиденды", top_k=1)
+
+    assert doc["link"] == "https://t.me/finprofit/1"
+    assert "Норникель увеличил дивиденды" in doc["text"]
+    assert len(doc["text"]) < len(long_post)
+
+
+def test_multi_chunk_post_does_not_crowd_out_other_posts(make_rag):
+    now = datetime.now(timezone.utc).isoformat()
+    long_post = " ".join(f"Норникель дивиденды слово{i}" for i in range(300))
+    documents = [{"text": long_post, "link": "https://t.me/finprofit/1", "date": now}] + [
+        {"text": f"Дивиденды компании {i} за квартал", "link": f"https://t.me/finprofit/{i}", "date": now}
+        for i in range(2, 8)
+    ]
+    rag = make_rag(documents)
+    assert len(rag.chunk_table) > 6
+
+    result = rag.get_relevant_documents("Норникель дивиденды", top_k=3)
+
+    assert len(result) == 3
+    assert len({doc["link"] for doc in result}) == 3
+    assert "https://t.me/finprofit/1" in {doc["link"] for doc in result}
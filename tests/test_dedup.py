@@ -0,0 +1,73 @@
+import numpy as np
+
+from dedup import NearDuplicateIndex, collapse_duplicates, minhash
+
+SIGNATURE = "Подписывайтесь на наш канал"
+
+
+def post(channel, number, text, hour=0):
+    return {"text": text, "link": f"https://t.me/{channel}/{number}", "date": f"2026-03-02T{hour:02d}:00:00+00:00"}
+
+
+def random_text(rng, words):
+    return " ".join(f"слово{i}" for i in rng.integers(0, 5000, size=words))
+
+
+def test_short_reposts_with_a_signature_collapse():
+    rng = np.random.default_rng(7)
+    for i in range(200):
+        text = random_text(rng, 20)
+        messages = [post("origin", i, text), post("repost", i, f"{text} {SIGNATURE}", hour=1)]
+
+        kept, dropped = collapse_duplicates(messages, NearDuplicateIndex(), lambda links: [])
+
+        assert dropped == 1
+        assert kept == [messages[0]]
+        assert messages[0]["alt_links"] == [messages[1]["link"]]
+
+
+def test_templated_posts_stay_separate():
+    template = "Курс доллара на {} составил {} рубля, евро {} рубля по данным Мосбиржи на закрытие торгов"
+    messages = [
+        post("finprofit", day, template.format(f"{day} марта", 90 + day, 98 + day), hour=day)
+        for day in range(1, 10)
+    ]
+
+    kept, dropped = collapse_duplicates(messages, NearDuplicateIndex(), lambda links: [])
+
+    assert dropped == 0
+    assert len(kept) == len(messages)
+
+
+def test_repost_of_a_stored_document_updates_it():
+    text = random_text(np.random.default_rng(1), 30)
+    stored = post("origin", 1, text)
+    index = NearDuplicateIndex()
+    index.add(stored["link"], minhash(text), 0.0)
+
+    kept, dropped = collapse_duplicates(
+        [post("repost", 1, f"{text} {SIGNATURE}", hour=1)], index, lambda links: [dict(stored)]
+    )
+
+    assert dropped == 1
+    assert kept[0]["link"] == stored["link"]
+    assert kept[0]["alt_links"] == ["https://t.me/repost/1"]
+
+
+def test_index_expires_and_removes_entries():
+    rng = np.random.default_rng(2)
+    index = NearDuplicateIndex(window_days=1)
+    signature = minhash(random_text(rng, 30))
+    index.add("old", signature, 0.0)
+    index.add("new", signature, 2 * 86400.0)
+
+    assert sorted(index.candidates(signature)) == ["new", "old"]
+    index.expire(2.5 * 86400)
+    assert index.candidates(signature) == ["new"]
+    index.remove("new")
+    assert len(index) == 0
+    assert all(not bucket for bucket in index.buckets)
+
+
+def test_short_texts_have_no_signature():
+    assert minhash("Рубль укрепился") is None
@@ -0,0 +1,38 @@
+import numpy as np
+
+from doc_id_table import NOT_INDEXED, DocIdTable, document_id
+
+
+def docs(*texts):
+    return [{"text": text, "link": f"https://t.me/finprofit/{i}", "date": "2026-03-02"} for i, text in enumerate(texts)]
+
+
+def test_ids_are_stable_and_skip_blank_posts():
+    documents = docs("Ставка сохранена", "", "Рубль укрепился")
+    table = DocIdTable.from_documents(documents)
+
+    assert table.ids.tolist() == [document_id(documents[0]), NOT_INDEXED, document_id(documents[2])]
+    assert document_id({"link": "https://t.me/finprofit/0"}) == table.ids[0]
+    assert 0 <= table.ids[0] < 2**63
+    assert table.indexed_ids().tolist() == sorted([table.ids[0], table.ids[2]])
+
+
+def test_positions_of_search_hits():
+    documents = docs("a", "", "b", "c")
+    table = DocIdTable.from_documents(documents)
+    hits = np.array([document_id(documents[3]), -1, 12345, document_id(documents[0])])
+
+    assert table.positions(hits).tolist() == [3, -1, -1, 0]
+    assert DocIdTable.from_documents([]).positions(hits).tolist() == [-1, -1, -1, -1]
+
+
+def test_save_and_load(tmp_path):
+    table = DocIdTable.from_documents(docs("a", "", "b"))
+    path = str(tmp_path / "ids.npy")
+    table.save(path)
+
+    loaded = DocIdTable.load(path)
+
+    assert loaded.matches(table)
+    assert not loaded.matches(DocIdTable.from_documents(docs("a", "b", "")))
+    assert loaded.positions(table.ids[2:]).tolist() == [2]
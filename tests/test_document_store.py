@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from document_store import DocumentStore, channel_of
+
+DOCUMENTS = [
+    {"text": "Ставка сохранена", "link": "https://t.me/finprofit/3", "date": "2026-03-03T09:00:00+00:00"},
+    {"text": "Рубль укрепился", "link": "https://t.me/markettwits/7", "date": "2026-03-02T12:00:00+00:00",
+     "alt_links": ["https://t.me/bankrollo/1"]},
+    {"text": "Ключевая ставка: 21%", "link": "https://www.cbr.ru/", "date": "2026-03-01T00:00:00"},
+]
+
+
+def utc(day, hour=0):
+    return datetime(2026, 3, day, hour, tzinfo=timezone.utc)
+
+
+def test_channel_of():
+    assert channel_of("https://t.me/finprofit/3") == "finprofit"
+    assert channel_of("https://www.cbr.ru/hd_base/KeyRate/") == "www.cbr.ru"
+
+
+def test_in_memory_store_round_trips_documents():
+    store = DocumentStore.from_documents(DOCUMENTS)
+
+    assert len(store) == 3
+    assert list(store) == DOCUMENTS
+    assert store[1]["alt_links"] == ["https://t.me/bankrollo/1"]
+    assert store.get_many([2, 0, 99]) == [DOCUMENTS[2], DOCUMENTS[0]]
+    with pytest.raises(IndexError):
+        store[3]
+
+
+def test_create_merges_new_documents_before_kept_ones(tmp_path):
+    base = DocumentStore.from_documents(DOCUMENTS)
+    edited = dict(DOCUMENTS[1], text="Рубль ослаб")
+    new = {"text": "Нефть дорожает", "link": "https://t.me/ecotopor/9", "date": "2026-03-04T08:00:00+00:00"}
+
+    store = DocumentStore.create(str(tmp_path / "documents.sqlite"), [new, edited], base=base, exclude_positions=[1])
+
+    assert [doc["text"] for doc in store] == ["Нефть дорожает", "Рубль ослаб", "Ставка сохранена", "Ключевая ставка: 21%"]
+    reopened = DocumentStore(store.path)
+    assert len(reopened) == 4
+    assert reopened.get_many([3]) == [DOCUMENTS[2]]
+
+
+def test_between_filters_by_date_and_channel():
+    store = DocumentStore.from_documents(DOCUMENTS)
+
+    assert [doc["link"] for doc in store.between(utc(2), utc(4))] == [DOCUMENTS[0]["link"], DOCUMENTS[1]["link"]]
+    assert [doc["link"] for doc in store.between(utc(1), utc(4), channel="markettwits")] == [DOCUMENTS[1]["link"]]
+    assert store.between(utc(1), utc(4), limit=1) == [DOCUMENTS[0]]
+    # naive dates are stored as UTC
+    assert store.between(utc(1), utc(1, 1)) == [DOCUMENTS[2]]
+
+
+def test_link_and_channel_lookups():
+    store = DocumentStore.from_documents(DOCUMENTS)
+
+    assert store.find_links(["https://t.me/markettwits/7", "https://t.me/unknown/1"]) == [
+        {"pos": 1, "link": "https://t.me/markettwits/7", "text": "Рубль укрепился"}
+    ]
+    assert store.channels_at([2, 0]) == {0: "finprofit", 2: "www.cbr.ru"}
+    assert store.channel_names() == ["finprofit", "markettwits", "www.cbr.ru"]
+    assert store.epochs().tolist() == [utc(3, 9).timestamp(), utc(2, 12).timestamp(), utc(1).timestamp()]
+
+
+def test_save_copies_the_store(tmp_path):
+    path = str(tmp_path / "copy.sqlite")
+    DocumentStore.from_documents(DOCUMENTS).save(path)
+    assert list(DocumentStore(path)) == DOCUMENTS
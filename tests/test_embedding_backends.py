@@ -0,0 +1,88 @@
+import os
+import pickle
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.fakes import FakeEmbeddingBackend
+from embeddings import OpenAIEmbeddingBackend, backend_from_env
+from rag_system import LEGACY_EMBEDDING_BACKEND
+
+
+def backend_named(name):
+    backend = FakeEmbeddingBackend()
+    backend.name = name
+    return backend
+
+
+def write_legacy_cache(tmp_path):
+    with open(tmp_path / "embedding_cache.pkl", "wb") as f:
+        pickle.dump({"старый текст": np.ones(256, dtype="float32")}, f)
+
+
+def test_legacy_model_keeps_the_unsuffixed_store_and_imports_the_pickle(make_rag, tmp_path):
+    write_legacy_cache(tmp_path)
+
+    rag = make_rag(embedding_backend=backend_named(LEGACY_EMBEDDING_BACKEND))
+
+    assert rag.embedding_store.vectors_file == str(tmp_path / "embedding_store.f32")
+    assert "старый текст" in rag.embedding_store
+
+
+def test_other_openai_models_get_their_own_store(make_rag, tmp_path):
+    write_legacy_cache(tmp_path)
+
+    rag = make_rag(embedding_backend=backend_named("openai-text-embedding-3-small"))
+
+    assert rag.embedding_store.vectors_file == str(tmp_path / "embedding_store-openai-text-embedding-3-small.f32")
+    assert "старый текст" not in rag.embedding_store
+    assert not os.path.exists(tmp_path / "embedding_store.f32")
+
+
+class StubEmbeddings:
+    def __init__(self, size):
+        self.size = size
+        self.requests = []
+
+    def create(self, model, input, timeout=None, **params):
+        self.requests.append(params)
+        size = params.get("dimensions", self.size)
+        data = [SimpleNamespace(embedding=[0.5] * size) for _ in input]
+        return SimpleNamespace(data=data, usage=None)
+
+
+def openai_backend(monkeypatch, size, **kwargs):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = OpenAIEmbeddingBackend(**kwargs)
+    backend.client = SimpleNamespace(embeddings=StubEmbeddings(size))
+    return backend
+
+
+def test_openai_dimension_follows_the_model(monkeypatch):
+    assert openai_backend(monkeypatch, 1536).dimension == 1536
+    large = openai_backend(monkeypatch, 3072, model="text-embedding-3-large")
+    assert large.dimension == 3072
+    assert large.name == "openai-text-embedding-3-large"
+    assert large.client.embeddings.requests == []
+
+
+def test_unknown_model_dimension_comes_from_a_response(monkeypatch):
+    backend = openai_backend(monkeypatch, 768, model="text-embedding-future")
+    assert backend.embed(["a", "b"]).shape == (2, 768)
+    assert backend.dimension == 768
+
+    probed = openai_backend(monkeypatch, 1024, model="text-embedding-future")
+    assert probed.dimension == 1024
+
+
+def test_shortened_dimension_is_requested_and_named(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    monkeypatch.setenv("EMBEDDING_DIMENSION", "256")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = backend_from_env()
+    backend.client = SimpleNamespace(embeddings=StubEmbeddings(3072))
+
+    assert backend.dimension == 256
+    assert backend.name == "openai-text-embedding-3-large-256"
+    assert backend.embed(["a"]).shape == (1, 256)
+    assert backend.client.embeddings.requests == [{"dimensions": 256}]
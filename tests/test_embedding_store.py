@@ -0,0 +1,75 @@
+import os
+import pickle
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+
+def vectors(n, dim=4, start=0):
+    return np.arange(start * dim, (start + n) * dim, dtype="float32").reshape(n, dim)
+
+
+def test_add_get_and_reopen(tmp_path):
+    path = str(tmp_path / "store")
+    store = EmbeddingStore(path)
+    store.add(["a", "b", "a"], vectors(3))
+    store.add(["b", "c"], vectors(2, start=3))
+
+    assert len(store) == 3
+    assert "c" in store and "d" not in store
+    assert store.get("d") is None
+    np.testing.assert_array_equal(store.get_many(["c", "a"]), [vectors(1, start=4)[0], vectors(1)[0]])
+
+    reopened = EmbeddingStore(path)
+    assert len(reopened) == 3
+    np.testing.assert_array_equal(reopened.get("b"), vectors(1, start=1)[0])
+    assert reopened.get_many([]).shape == (0, 4)
+
+
+def test_get_is_a_view_of_the_mapped_matrix(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "store"))
+    store.add(["a", "b"], vectors(2))
+
+    view = store.get("b")
+
+    assert np.shares_memory(view, store._matrix())
+    assert not view.flags.writeable
+
+
+def test_torn_append_is_truncated_to_complete_rows(tmp_path):
+    path = str(tmp_path / "store")
+    EmbeddingStore(path).add(["a", "b"], vectors(2))
+    # a crash mid-append: half a vector and no key for it
+    with open(f"{path}.f32", "ab") as f:
+        f.write(vectors(1, start=9).tobytes()[:8])
+
+    store = EmbeddingStore(path)
+
+    assert len(store) == 2
+    assert os.path.getsize(f"{path}.f32") == 2 * 4 * 4
+    store.add(["c"], vectors(1, start=2))
+    np.testing.assert_array_equal(EmbeddingStore(path).get("c"), vectors(1, start=2)[0])
+
+
+def test_orphan_vectors_without_keys_are_dropped(tmp_path):
+    path = str(tmp_path / "store")
+    EmbeddingStore(path).add(["a"], vectors(1))
+    with open(f"{path}.f32", "ab") as f:
+        f.write(vectors(1, start=5).tobytes())
+
+    store = EmbeddingStore(path)
+
+    assert len(store) == 1
+    assert os.path.getsize(f"{path}.f32") == 4 * 4
+
+
+def test_import_pickle_cache(tmp_path):
+    cache_file = str(tmp_path / "cache.pkl")
+    with open(cache_file, "wb") as f:
+        pickle.dump({"a": [1.0, 2.0], "b": [3.0, 4.0]}, f)
+
+    store = EmbeddingStore(str(tmp_path / "store"))
+    store.import_pickle_cache(cache_file)
+
+    np.testing.assert_array_equal(store.get_many(["b", "a"]), [[3.0, 4.0], [1.0, 2.0]])
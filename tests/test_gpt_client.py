@@ -0,0 +1,214 @@
+import asyncio
+import json
+
+import pytest
+import requests
+
+import gpt_client
+from gpt_client import AsyncGPTTunnelClient, GPTTunnelClient, parse_sse_line
+from metrics import metrics
+
+MODEL = "test-model"
+
+
+def counter(name):
+    return metrics._counters.get((name, (("model", MODEL),)), 0)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(gpt_client, "backoff_delay", lambda attempt: 0)
+
+
+def sse(*deltas):
+    lines = [f'data: {json.dumps({"choices": [{"delta": {"content": d}}]})}' for d in deltas]
+    return lines + ["", "data: [DONE]"]
+
+
+class StubResponse:
+    def __init__(self, status_code, body=None, lines=()):
+        self.status_code = status_code
+        self.body = body or {}
+        self.lines = list(lines)
+        self.text = json.dumps(self.body)
+        self.closed = False
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StubSession:
+    """Replays a scripted list of responses or exceptions, one per post()."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def sync_client(outcomes, max_retries=3):
+    client = GPTTunnelClient("key", max_retries=max_retries)
+    client.session = StubSession(outcomes)
+    return client
+
+
+def completion(text):
+    return {"choices": [{"message": {"content": text}}], "usage": {"prompt_tokens": 3, "completion_tokens": 2}}
+
+
+def test_parse_sse_line():
+    assert parse_sse_line("") == (False, None)
+    assert parse_sse_line(": keep-alive") == (False, None)
+    assert parse_sse_line("data: [DONE]") == (True, None)
+    assert parse_sse_line('data: {"choices": [{"delta": {"content": "Курс"}}]}') == (False, "Курс")
+    assert parse_sse_line('data: {"choices": [{"delta": {"role": "assistant"}}]}') == (False, None)
+    assert parse_sse_line('data: {"choices": []}') == (False, None)
+
+
+def test_retries_on_429_and_5xx_then_succeeds():
+    throttled, unavailable = StubResponse(429), StubResponse(503)
+    client = sync_client([throttled, unavailable, StubResponse(200, completion("ok"))])
+    requests_before, retries_before = counter("llm_requests_total"), counter("llm_retries_total")
+
+    assert client.chat_completion([], model=MODEL) == "ok"
+
+    assert client.session.calls == 3
+    assert throttled.closed and unavailable.closed
+    assert counter("llm_requests_total") == requests_before + 1
+    assert counter("llm_retries_total") == retries_before + 2
+
+
+def test_retries_on_connection_errors():
+    client = sync_client([requests.ConnectionError(), requests.Timeout(), StubResponse(200, completion("ok"))])
+
+    assert client.chat_completion([], model=MODEL) == "ok"
+    assert client.session.calls == 3
+
+
+def test_gives_up_after_max_retries():
+    client = sync_client([StubResponse(502)] * 3, max_retries=2)
+    errors_before = counter("llm_errors_total")
+
+    with pytest.raises(Exception, match="502"):
+        client.chat_completion([], model=MODEL)
+
+    assert client.session.calls == 3
+    assert counter("llm_errors_total") == errors_before + 1
+
+
+def test_client_errors_are_not_retried():
+    client = sync_client([StubResponse(400, {"error": "bad request"})])
+    errors_before = counter("llm_errors_total")
+
+    with pytest.raises(Exception, match="400"):
+        client.chat_completion([], model=MODEL)
+
+    assert client.session.calls == 1
+    assert counter("llm_errors_total") == errors_before + 1
+
+
+def test_stream_yields_deltas_until_done():
+    response = StubResponse(200, lines=sse("Курс ", "вырос") + ['data: {"choices": [{"delta": {"content": "late"}}]}'])
+    client = sync_client([StubResponse(500), response])
+
+    assert list(client.stream_chat_completion([], model=MODEL)) == ["Курс ", "вырос"]
+    assert response.closed
+
+
+class AsyncStubResponse:
+    def __init__(self, status, body=None, lines=()):
+        self.status = status
+        self.body = body or {}
+        self.lines = [f"{line}\n".encode("utf-8") for line in lines]
+        self.released = False
+
+    async def text(self):
+        return json.dumps(self.body)
+
+    async def json(self):
+        return self.body
+
+    def release(self):
+        self.released = True
+
+    @property
+    def content(self):
+        async def lines():
+            for line in self.lines:
+                yield line
+        return lines()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class AsyncStubSession(StubSession):
+    closed = False
+
+    async def post(self, url, **kwargs):
+        return super().post(url, **kwargs)
+
+    async def close(self):
+        self.closed = True
+
+
+def async_client(outcomes, max_retries=3):
+    client = AsyncGPTTunnelClient("key", max_retries=max_retries)
+    client._session = AsyncStubSession(outcomes)
+    return client
+
+
+def test_async_client_retries_and_records_metrics():
+    throttled = AsyncStubResponse(429)
+    client = async_client([throttled, asyncio.TimeoutError(), AsyncStubResponse(200, completion("ok"))])
+    requests_before, retries_before = counter("llm_requests_total"), counter("llm_retries_total")
+
+    assert asyncio.run(client.chat_completion([], model=MODEL)) == "ok"
+
+    assert client._session.calls == 3
+    assert throttled.released
+    assert counter("llm_requests_total") == requests_before + 1
+    assert counter("llm_retries_total") == retries_before + 2
+
+
+def test_async_client_records_errors():
+    client = async_client([AsyncStubResponse(401)])
+    errors_before = counter("llm_errors_total")
+
+    with pytest.raises(Exception, match="401"):
+        asyncio.run(client.chat_completion([], model=MODEL))
+
+    assert client._session.calls == 1
+    assert counter("llm_errors_total") == errors_before + 1
+
+
+def test_async_stream_yields_deltas():
+    client = async_client([AsyncStubResponse(200, lines=sse("a", "b"))])
+
+    async def collect():
+        async with client:
+            return [delta async for delta in client.stream_chat_completion([], model=MODEL)]
+
+    assert asyncio.run(collect()) == ["a", "b"]
+    assert client._session.closed
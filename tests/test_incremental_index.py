@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.corpus import generate_corpus
+from chunking import ChunkTable
+from index_factory import index_ids
+
+
+def all_index_ids(rag):
+    return np.sort(np.concatenate([index_ids(shard) for shard in rag.index.shards.values()]))
+
+
+def record_embedded_texts(rag):
+    embedded = []
+    embed_many = rag.embedding_backend.embed_many
+
+    def recording(texts, on_batch):
+        embedded.extend(texts)
+        embed_many(texts, on_batch)
+
+    rag.embedding_backend.embed_many = recording
+    return embedded
+
+
+def test_update_only_embeds_new_and_edited_posts(make_rag):
+    documents = generate_corpus(50)
+    rag = make_rag(documents)
+    embedded = record_embedded_texts(rag)
+    edited = dict(documents[0], text=documents[0]["text"] + " Дополнение: ставка сохранена")
+    new = {
+        "text": "Совет директоров рекомендовал дивиденды за первый квартал выше ожиданий аналитиков рынка",
+        "link": "https://t.me/finprofit/100000",
+        "date": datetime.now(timezone.utc).isoformat(),
+    }
+
+    rag.update_documents([edited, new])
+
+    # unchanged chunks of the edited post come from the embedding store
+    texts = {1: edited["text"], 2: new["text"]}
+    assert set(embedded) <= set(ChunkTable.from_texts(texts).texts(texts))
+    assert new["text"] in embedded
+    assert len(rag.documents) == 51
+    assert rag.index.ntotal == len(rag.chunk_table)
+    assert np.array_equal(all_index_ids(rag), np.sort(rag.chunk_table.ids))
+    assert [doc["text"] for doc in rag.documents.find_links([edited["link"]])] == [edited["text"]]
+
+
+def test_unchanged_posts_are_not_reindexed(make_rag):
+    documents = generate_corpus(50)
+    rag = make_rag(documents)
+    embedded = record_embedded_texts(rag)
+    version = rag.corpus_version
+
+    rag.update_documents([dict(doc) for doc in documents[:5]])
+
+    assert embedded == []
+    assert rag.corpus_version == version
+    assert len(rag.documents) == 50
+
+
+def test_blanked_post_leaves_the_index(make_rag):
+    documents = generate_corpus(50)
+    rag = make_rag(documents)
+    spam = dict(documents[3], text=documents[3]["text"] + " промокод")
+    before = rag.index.ntotal
+
+    rag.update_documents([spam])
+
+    assert rag.index.ntotal == before - 1
+    assert len(rag.documents) == 50
+    assert np.array_equal(all_index_ids(rag), np.sort(rag.chunk_table.ids))
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from index_factory import (
+    IVFPQ_MIN_VECTORS,
+    build_index,
+    choose_index_type,
+    compare_index_modes,
+    default_index_params,
+    index_ids,
+    supports_removal,
+)
+
+
+@pytest.mark.parametrize("dim, m", [(64, 8), (256, 32), (384, 48), (1536, 64), (100, 10), (7, 1)])
+def test_pq_sub_vectors_have_at_least_eight_dims(dim, m):
+    params = default_index_params("ivfpq", 100_000, dim)
+    assert params["m"] == m
+    assert dim % m == 0
+
+
+def clustered(rng, n, dim, clusters=200):
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, n)] + rng.normal(scale=0.3, size=(n, dim))).astype("float32")
+
+
+def test_ivfpq_recall_against_exact_search():
+    rng = np.random.default_rng(0)
+    vectors = clustered(rng, 4000, 64)
+    queries = vectors[rng.choice(len(vectors), 50, replace=False)] + rng.normal(scale=0.05, size=(50, 64)).astype("float32")
+    params = dict(default_index_params("ivfpq", len(vectors), 64), nlist=16, nprobe=8)
+
+    flat, ivfpq = compare_index_modes(vectors, queries, top_k=10, configs=[params])
+
+    assert flat["recall@10"] == 1.0
+    assert ivfpq["params"]["m"] == 8
+    assert ivfpq["recall@10"] >= 0.5
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_ids_and_removal(index_type):
+    vectors = clustered(np.random.default_rng(1), 100, 16)
+    index = build_index(default_index_params(index_type, len(vectors), 16))
+    index.add_with_ids(vectors, np.arange(100, 200, dtype="int64"))
+
+    assert sorted(index_ids(index).tolist()) == list(range(100, 200))
+    assert supports_removal(index) == (index_type == "flat")
+
+
+def test_auto_respects_the_ivfpq_training_floor():
+    assert choose_index_type(5_000, "auto", "ivfpq", auto_threshold=1_000) == "flat"
+    assert choose_index_type(IVFPQ_MIN_VECTORS, "auto", "ivfpq", auto_threshold=1_000) == "ivfpq"
+    assert choose_index_type(5_000, "auto", "hnsw", auto_threshold=1_000) == "hnsw"
+    assert choose_index_type(50_000, "auto") == "flat"
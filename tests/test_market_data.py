@@ -0,0 +1,117 @@
+import requests
+
+from market_data import MarketDataFetcher, MarketDataSource
+
+
+class StubResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class StubSession:
+    """Replays scripted responses or exceptions and records the request headers."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class KeyRate(MarketDataSource):
+    name = "key_rate"
+    urls = ["https://example.com/rate", "https://mirror.example.com/rate"]
+    ttl = 600
+
+    def __init__(self):
+        self.parsed = 0
+
+    def parse(self, response):
+        self.parsed += 1
+        return {"text": f"Ставка {response.text}", "link": "https://example.com/rate", "date": "2024-10-01"}
+
+
+def fetcher(tmp_path, *outcomes, ttl=600):
+    source = KeyRate()
+    source.ttl = ttl
+    market_data = MarketDataFetcher(sources=[source], cache_file=str(tmp_path / "market_data_cache.json"))
+    market_data.session = StubSession(*outcomes)
+    return market_data, source
+
+
+def test_fresh_value_is_reused_without_a_request(tmp_path):
+    market_data, source = fetcher(tmp_path, StubResponse(200, "19%"))
+
+    first = market_data.fetch_all()
+    first[0]["id"] = 1
+    second = market_data.fetch_all()
+
+    assert second == [{"text": "Ставка 19%", "link": "https://example.com/rate", "date": "2024-10-01"}]
+    assert len(market_data.session.requests) == 1
+    assert source.parsed == 1
+
+
+def test_cache_survives_a_restart(tmp_path):
+    market_data, _ = fetcher(tmp_path, StubResponse(200, "19%"))
+    market_data.fetch_all()
+
+    restarted, _ = fetcher(tmp_path)
+
+    assert restarted.fetch_all()[0]["text"] == "Ставка 19%"
+    assert restarted.session.requests == []
+
+
+def test_not_modified_reuses_the_cached_message(tmp_path):
+    market_data, source = fetcher(
+        tmp_path,
+        StubResponse(200, "19%", {"ETag": '"v1"', "Last-Modified": "Tue, 01 Oct 2024 00:00:00 GMT"}),
+        StubResponse(304),
+        ttl=0,
+    )
+    market_data.fetch_all()
+    fetched_at = market_data.cache["key_rate"]["fetched_at"]
+
+    messages = market_data.fetch_all()
+    messages[0]["id"] = 1
+
+    assert market_data.session.requests[1][1] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Tue, 01 Oct 2024 00:00:00 GMT",
+    }
+    assert source.parsed == 1
+    assert market_data.cache["key_rate"]["fetched_at"] >= fetched_at
+    assert "id" not in market_data.cache["key_rate"]["message"]
+
+
+def test_next_url_is_tried_when_one_fails(tmp_path):
+    market_data, _ = fetcher(tmp_path, requests.ConnectionError(), StubResponse(200, "19%"))
+
+    assert market_data.fetch_all()[0]["text"] == "Ставка 19%"
+    assert [url for url, _ in market_data.session.requests] == KeyRate.urls
+
+
+def test_failing_source_falls_back_to_last_good_value(tmp_path):
+    market_data, _ = fetcher(
+        tmp_path, StubResponse(200, "19%"), StubResponse(500), requests.Timeout(), ttl=0
+    )
+    market_data.fetch_all()
+
+    assert market_data.fetch_all()[0]["text"] == "Ставка 19%"
+
+
+def test_failing_source_without_a_cached_value_is_skipped(tmp_path):
+    market_data, _ = fetcher(tmp_path, StubResponse(503), StubResponse(503))
+
+    assert market_data.fetch_all() == []
+    assert market_data.cache == {}
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import metrics as metrics_module
+from metrics import Metrics, timed, trace
+
+
+def test_render_prometheus():
+    registry = Metrics(buckets=(0.1, 1.0))
+    registry.inc("llm_requests_total", model="gpt-4o")
+    registry.inc("llm_requests_total", 2, model="gpt-4o")
+    registry.inc("ingest_duplicates_total", 5)
+    registry.observe("stage_seconds", 0.05, stage="embed")
+    registry.observe("stage_seconds", 0.5, stage="embed")
+    registry.observe("stage_seconds", 3.0, stage="embed")
+
+    assert registry.render_prometheus().splitlines() == [
+        "# TYPE ingest_duplicates_total counter",
+        "ingest_duplicates_total 5",
+        "# TYPE llm_requests_total counter",
+        'llm_requests_total{model="gpt-4o"} 3',
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="embed",le="0.1"} 1',
+        'stage_seconds_bucket{stage="embed",le="1.0"} 2',
+        'stage_seconds_bucket{stage="embed",le="+Inf"} 3',
+        'stage_seconds_sum{stage="embed"} 3.55',
+        'stage_seconds_count{stage="embed"} 3',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Metrics()
+    registry.inc("request_errors_total", request='say "hi"\\\nbye')
+
+    assert registry.render_prometheus().splitlines()[1] == (
+        'request_errors_total{request="say \\"hi\\"\\\\\\nbye"} 1'
+    )
+
+
+def test_trace_log_is_written_only_when_configured(tmp_path, monkeypatch):
+    log = tmp_path / "traces.jsonl"
+    with trace("ask"):
+        with timed("retrieval"):
+            pass
+    assert not log.exists()
+
+    monkeypatch.setattr(metrics_module, "TRACE_LOG", str(log))
+    with pytest.raises(ValueError):
+        with trace("ask"):
+            raise ValueError("boom")
+
+    record = json.loads(log.read_text(encoding="utf-8"))
+    assert record["trace"] == "ask"
+    assert record["error"] == "ValueError"
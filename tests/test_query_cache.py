@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+
+from query_cache import QueryEmbeddingCache, normalize_query
+
+
+def test_normalized_questions_share_an_entry():
+    cache = QueryEmbeddingCache()
+    cache.put("Курс доллара?", np.ones(3))
+
+    assert normalize_query("  курс   ДОЛЛАРА!? ") == "курс доллара"
+    np.testing.assert_array_equal(cache.get("курс  доллара"), np.ones(3))
+    assert cache.get("курс евро") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 1024}
+
+
+def test_entries_expire_after_ttl():
+    cache = QueryEmbeddingCache(ttl=0.05)
+    cache.put("ставка", np.ones(3))
+    assert cache.get("ставка") is not None
+
+    time.sleep(0.1)
+
+    assert cache.get("ставка") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryEmbeddingCache(maxsize=2)
+    cache.put("a", np.zeros(1))
+    cache.put("b", np.zeros(1))
+    cache.get("a")
+
+    cache.put("c", np.zeros(1))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
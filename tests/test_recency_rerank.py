@@ -0,0 +1,38 @@
+import numpy as np
+
+from rag_system import SECONDS_PER_DAY, recency_rerank
+
+NOW = 1_800_000_000.0
+
+
+def days_ago(*days):
+    return NOW - np.array(days, dtype="float64") * SECONDS_PER_DAY
+
+
+def test_newer_hit_outranks_equally_relevant_older_one():
+    order = recency_rerank(np.array([0.8, 0.8, 0.8]), days_ago(10, 0, 3), NOW)
+    assert order.tolist() == [1, 2, 0]
+
+
+def test_recency_halves_every_half_life():
+    # an old, highly relevant hit against a fresh, barely relevant one:
+    # score old = 0.4 * 1 + 0.6 * 2 ** (-7 / half_life), fresh = 0.6
+    relevance = np.array([1.0, 0.0])
+    epochs = days_ago(7, 0)
+
+    assert recency_rerank(relevance, epochs, NOW, half_life_days=7.0, recency_weight=0.6).tolist() == [0, 1]
+    assert recency_rerank(relevance, epochs, NOW, half_life_days=1.0, recency_weight=0.6).tolist() == [1, 0]
+
+
+def test_weights_blend_relevance_and_recency():
+    relevance = np.array([0.1, 0.9, 0.5])
+    epochs = days_ago(0, 30, 1)
+
+    assert recency_rerank(relevance, epochs, NOW, recency_weight=0.0).tolist() == [1, 2, 0]
+    assert recency_rerank(relevance, epochs, NOW, recency_weight=1.0).tolist() == [0, 2, 1]
+    assert recency_rerank(np.empty(0), np.empty(0), NOW).tolist() == []
+
+
+def test_future_dates_count_as_fresh():
+    order = recency_rerank(np.array([0.5, 0.5]), np.array([NOW + 3600, NOW - 3600]), NOW)
+    assert order.tolist() == [0, 1]
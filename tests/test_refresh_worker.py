@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+from filelock import FileLock
+
+import telegram_client
+from refresh_worker import read_refresh_status, refresh, refresh_running
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(telegram_client, "update_messages", lambda: [{"link": "https://t.me/finprofit/1"}])
+    monkeypatch.setattr(telegram_client, "save_high_water_marks", lambda messages: None)
+    return {"lock_file": str(tmp_path / "refresh.lock"), "status_file": str(tmp_path / "refresh_status.json")}
+
+
+def test_finished_refresh_is_recorded(paths):
+    rag_system = SimpleNamespace(update_documents=lambda messages: None, snapshot_version="v2")
+    assert read_refresh_status(paths["status_file"]) is None
+
+    assert refresh(rag_system, **paths) is rag_system
+
+    status = read_refresh_status(paths["status_file"])
+    assert status["state"] == "finished"
+    assert status["new_messages"] == 1
+    assert status["snapshot"] == "v2"
+    assert not refresh_running(paths["lock_file"])
+
+
+def test_failed_refresh_is_recorded(paths):
+    def fail(messages):
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        refresh(SimpleNamespace(update_documents=fail), **paths)
+
+    status = read_refresh_status(paths["status_file"])
+    assert status["state"] == "failed"
+    assert status["error"] == "disk full"
+    assert not refresh_running(paths["lock_file"])
+
+
+def test_refresh_is_skipped_while_another_one_runs(paths):
+    with FileLock(paths["lock_file"]):
+        assert refresh_running(paths["lock_file"])
+        assert refresh(SimpleNamespace(), **paths) is None
+
+    assert read_refresh_status(paths["status_file"]) is None
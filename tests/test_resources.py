@@ -0,0 +1,30 @@
+import resources
+from benchmarks.fakes import FakeEmbeddingBackend
+from resources import SharedRAGSystem
+
+
+def test_query_cache_survives_snapshot_swap(make_rag, monkeypatch):
+    make_rag()
+    backend = FakeEmbeddingBackend()
+    monkeypatch.setattr(resources, "read_published_version", lambda: "v1")
+    shared = SharedRAGSystem(
+        lambda query_cache: make_rag(embedding_backend=backend, query_cache=query_cache, read_only=True)
+    )
+
+    first = shared.current()
+    first.embed_query("Курс доллара?")
+    calls = backend.calls
+
+    shared._reload("v2")
+    second = shared.current()
+
+    assert second is not first
+    assert shared.version == "v2"
+    assert second.query_cache is first.query_cache is shared.query_cache
+    second.embed_query("курс  доллара")
+    assert backend.calls == calls
+
+
+def test_readers_do_not_open_the_embedding_store(make_rag):
+    make_rag()
+    assert make_rag(read_only=True).embedding_store is None
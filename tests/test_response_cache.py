@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+
+from response_cache import ResponseCache, history_key
+
+QUESTION = np.array([1.0, 0.0, 0.0])
+SOURCES = [{"link": "https://t.me/c/1"}]
+
+
+def test_similar_question_hits_and_distant_one_misses():
+    cache = ResponseCache(similarity_threshold=0.95)
+    cache.store(QUESTION, "v1", "ответ", SOURCES)
+
+    # cos = 0.98 and 0.71 against the stored question
+    hit = cache.lookup(np.array([1.0, 0.2, 0.0]), "v1")
+    miss = cache.lookup(np.array([1.0, 1.0, 0.0]), "v1")
+
+    assert hit == {"answer": "ответ", "sources": SOURCES}
+    assert miss is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_new_corpus_version_drops_entries():
+    cache = ResponseCache()
+    cache.store(QUESTION, "v1", "ответ", SOURCES)
+
+    assert cache.lookup(QUESTION, "v2") is None
+    assert cache.stats()["size"] == 0
+    assert cache.lookup(QUESTION, "v1") is None
+
+
+def test_entries_are_separated_by_conversation():
+    history = [{"role": "user", "content": "Курс доллара?"}, {"role": "assistant", "content": "90"}]
+    cache = ResponseCache()
+    cache.store(QUESTION, "v1", "первый вопрос", SOURCES)
+    cache.store(QUESTION, "v1", "продолжение", SOURCES, history_key(history))
+
+    assert history_key([]) == ""
+    assert history_key(history) == history_key([dict(msg) for msg in history])
+    assert cache.lookup(QUESTION, "v1")["answer"] == "первый вопрос"
+    assert cache.lookup(QUESTION, "v1", history_key(history))["answer"] == "продолжение"
+    assert cache.lookup(QUESTION, "v1", history_key(history[:1])) is None
+
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(ttl=0.05)
+    cache.store(QUESTION, "v1", "ответ", SOURCES)
+    assert cache.lookup(QUESTION, "v1") is not None
+
+    time.sleep(0.1)
+
+    assert cache.lookup(QUESTION, "v1") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    a, b, c = np.eye(3)
+    cache = ResponseCache(maxsize=2)
+    cache.store(a, "v1", "a", SOURCES)
+    cache.store(b, "v1", "b", SOURCES)
+    cache.lookup(a, "v1")
+
+    cache.store(c, "v1", "c", SOURCES)
+
+    assert cache.lookup(a, "v1")["answer"] == "a"
+    assert cache.lookup(b, "v1") is None
+    assert cache.lookup(c, "v1")["answer"] == "c"
@@ -0,0 +1,21 @@
+def test_given_embedding_is_not_recomputed(make_rag):
+    rag = make_rag()
+    embedding = rag.embed_query("ставка ЦБ инфляция")
+    calls = rag.embedding_backend.calls
+
+    docs = rag.get_relevant_documents("ставка ЦБ инфляция", query_embedding=embedding)
+
+    assert docs
+    assert rag.embedding_backend.calls == calls
+    assert docs == rag.get_relevant_documents("ставка ЦБ инфляция")
+
+
+def test_failed_embedding_is_not_retried(make_rag):
+    rag = make_rag()
+    calls = rag.embedding_backend.calls
+
+    docs = rag.get_relevant_documents("ставка ЦБ инфляция", dense=False)
+
+    assert docs
+    assert rag.embedding_backend.calls == calls
+    assert all(any(word in doc["text"] for word in ("ставка", "ЦБ", "инфляция")) for doc in docs)
@@ -0,0 +1,123 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from benchmarks.corpus import generate_corpus
+from document_store import channel_of
+from index_factory import build_index, default_index_params, index_ids
+from shards import (
+    COLD, ShardedIndex, assign_shards, cold_boundary, partition_start, shard_file, shard_key, shard_start,
+)
+from snapshot import read_manifest, snapshot_file, verify_snapshot
+
+DAY = 86400
+
+
+def epoch(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def flat_shard(ids, vectors):
+    index = build_index(default_index_params("flat", len(ids), vectors.shape[1]))
+    index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    return index
+
+
+def test_weekly_shards_start_on_monday():
+    # 2026-03-02 is a Monday
+    epochs = [epoch(2026, 3, 2), epoch(2026, 3, 8, 23), epoch(2026, 3, 9, 1), epoch(2026, 1, 1)]
+
+    keys = assign_shards(epochs, "week", cold_before=epoch(2026, 2, 1))
+
+    assert keys.tolist() == ["2026-03-02", "2026-03-02", "2026-03-09", COLD]
+    assert shard_start("2026-03-09") == epoch(2026, 3, 9)
+    assert shard_key(cold_boundary(epoch(2026, 3, 11), "week", hot_shards=2)) == "2026-03-02"
+    assert assign_shards([epoch(2026, 3, 2, 5)], "day", float("-inf")).tolist() == ["2026-03-02"]
+
+
+def test_search_visits_overlapping_shards_and_merges_by_distance():
+    sharded = ShardedIndex("week", cold_before=epoch(2026, 3, 2))
+    vectors = np.eye(4, dtype="float32")
+    sharded.set_shard(COLD, flat_shard([1, 2], vectors[:2]), default_index_params("flat", 2, 4))
+    sharded.set_shard("2026-03-02", flat_shard([3], vectors[2:3]), default_index_params("flat", 1, 4))
+    sharded.set_shard("2026-03-09", flat_shard([4], vectors[3:]), default_index_params("flat", 1, 4))
+    query = np.array([[0.1, 0.0, 0.9, 0.2]], dtype="float32")
+
+    assert sharded.keys_for(epoch(2026, 3, 3), epoch(2026, 3, 10)) == ["2026-03-02", "2026-03-09"]
+    assert sharded.keys_for(end=epoch(2026, 3, 1)) == [COLD]
+
+    D, I = sharded.search(query, 3)
+    assert I[0].tolist() == [3, 4, 1]
+    assert np.all(np.diff(D[0]) >= 0)
+
+    _, I = sharded.search(query, 3, start=epoch(2026, 3, 9))
+    assert I[0].tolist() == [4, -1, -1]
+    _, I = sharded.search(query, 2, start=epoch(2030, 1, 1))
+    assert I[0].tolist() == [-1, -1]
+
+
+def test_removal_reports_hnsw_shards():
+    vectors = np.random.default_rng(0).normal(size=(20, 8)).astype("float32")
+    sharded = ShardedIndex("week")
+    sharded.set_shard(COLD, flat_shard(range(10), vectors[:10]), default_index_params("flat", 10, 8))
+    hnsw_params = default_index_params("hnsw", 10, 8)
+    hnsw = build_index(hnsw_params)
+    hnsw.add_with_ids(vectors[10:], np.arange(10, 20, dtype="int64"))
+    sharded.set_shard("2026-03-02", hnsw, hnsw_params)
+
+    blocked = sharded.remove_ids(np.array([1, 15]))
+
+    assert blocked == ["2026-03-02"]
+    assert sorted(index_ids(sharded.shards[COLD]).tolist()) == [0] + list(range(2, 10))
+
+
+def test_filters_restrict_retrieved_documents(make_rag):
+    rag = make_rag(generate_corpus(120))
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+
+    recent = rag.get_relevant_documents("ставка ЦБ инфляция", start=start)
+    channel = rag.get_relevant_documents("ставка ЦБ инфляция", channel="markettwits")
+
+    assert recent and channel
+    assert all(datetime.fromisoformat(doc["date"]) >= start for doc in recent)
+    assert all(channel_of(doc["link"]) == "markettwits" for doc in channel)
+
+
+def test_aged_shards_are_compacted_into_cold(make_rag):
+    rag = make_rag(generate_corpus(120))
+    ids = np.sort(np.concatenate([index_ids(shard) for shard in rag.index.shards.values()]))
+    hot_before = len(rag.index.hot_keys())
+
+    rag.hot_shards = 2
+    rag.compact_shards()
+
+    assert len(rag.index.hot_keys()) <= 2 < hot_before
+    assert rag.index.cold_before == cold_boundary(datetime.now(timezone.utc).timestamp(), "week", 2)
+    assert np.array_equal(np.sort(np.concatenate([index_ids(shard) for shard in rag.index.shards.values()])), ids)
+
+
+def test_unchanged_shards_are_linked_from_the_previous_snapshot(make_rag):
+    rag = make_rag(generate_corpus(120))
+    previous = read_manifest(rag.snapshot_dir)
+    now = datetime.now(timezone.utc)
+
+    rag.update_documents([{
+        "text": "Совет директоров рекомендовал дивиденды за первый квартал выше ожиданий",
+        "link": "https://t.me/finprofit/100000",
+        "date": now.isoformat(),
+    }])
+
+    manifest = read_manifest(rag.snapshot_dir)
+    changed = shard_file(shard_key(partition_start(now.timestamp(), "week")))
+    shard_files = [name for name in manifest["files"] if name.startswith("index-")]
+    assert changed in shard_files and len(shard_files) > 1
+    for name in shard_files:
+        linked = os.path.samefile(
+            snapshot_file(manifest, name, rag.snapshot_dir), snapshot_file(previous, name, rag.snapshot_dir)
+        ) if name in previous["files"] else False
+        assert linked == (name != changed)
+        if linked:
+            assert manifest["files"][name] == previous["files"][name]
+    assert verify_snapshot(manifest, rag.snapshot_dir, deep=True)
+    assert make_rag(read_only=True).index.ntotal == rag.index.ntotal
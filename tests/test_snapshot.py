@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+from snapshot import MANIFEST_FILE, SnapshotWriter, read_manifest, snapshot_file, verify_snapshot
+
+
+def write_snapshot(root, contents, metadata=None):
+    with SnapshotWriter(str(root), metadata) as writer:
+        for name, data in contents.items():
+            with open(writer.path(name), "w", encoding="utf-8") as f:
+                f.write(data)
+    return writer.version
+
+
+def test_commit_publishes_files_and_checksums(tmp_path):
+    version = write_snapshot(tmp_path, {"a.txt": "alpha", "b.txt": "beta"}, {"corpus_version": "1"})
+
+    manifest = read_manifest(str(tmp_path))
+    assert manifest["version"] == version
+    assert manifest["metadata"] == {"corpus_version": "1"}
+    assert manifest["files"]["a.txt"]["size"] == 5
+    with open(snapshot_file(manifest, "b.txt", str(tmp_path)), encoding="utf-8") as f:
+        assert f.read() == "beta"
+    assert verify_snapshot(manifest, str(tmp_path), deep=True)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+
+def test_failed_write_keeps_the_published_snapshot(tmp_path):
+    version = write_snapshot(tmp_path, {"a.txt": "alpha"})
+
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter(str(tmp_path)) as writer:
+            with open(writer.path("a.txt"), "w", encoding="utf-8") as f:
+                f.write("half written")
+            raise RuntimeError("crashed mid-write")
+
+    assert read_manifest(str(tmp_path))["version"] == version
+    assert sorted(os.listdir(tmp_path)) == sorted([MANIFEST_FILE, version])
+
+
+def test_damaged_files_and_manifest_are_detected(tmp_path):
+    write_snapshot(tmp_path, {"a.txt": "alpha"})
+    manifest = read_manifest(str(tmp_path))
+    path = snapshot_file(manifest, "a.txt", str(tmp_path))
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("ALPHA")
+    assert verify_snapshot(manifest, str(tmp_path))
+    assert not verify_snapshot(manifest, str(tmp_path), deep=True)
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("alp")
+    assert not verify_snapshot(manifest, str(tmp_path))
+
+    manifest_path = tmp_path / MANIFEST_FILE
+    tampered = json.loads(manifest_path.read_text(encoding="utf-8"))
+    tampered["metadata"] = {"corpus_version": "forged"}
+    manifest_path.write_text(json.dumps(tampered), encoding="utf-8")
+    assert read_manifest(str(tmp_path)) is None
+
+
+def test_old_snapshots_are_pruned(tmp_path):
+    versions = [write_snapshot(tmp_path, {"a.txt": str(i)}) for i in range(5)]
+
+    remaining = sorted(name for name in os.listdir(tmp_path) if name != MANIFEST_FILE)
+    assert len(remaining) == 3
+    assert versions[-1] in remaining
+
+
+def test_failed_update_is_not_published(make_rag):
+    rag = make_rag()
+    version = read_manifest(rag.snapshot_dir)["version"]
+
+    def unavailable(texts, on_batch):
+        raise TimeoutError("embedding API down")
+
+    rag.embedding_backend.embed_many = unavailable
+    with pytest.raises(RuntimeError):
+        rag.update_documents([{
+            "text": "Совет директоров рекомендовал дивиденды за первый квартал выше ожиданий",
+            "link": "https://t.me/finprofit/100000",
+            "date": "2026-03-02T10:00:00+00:00",
+        }])
+
+    assert read_manifest(rag.snapshot_dir)["version"] == version
+
+
+def test_linked_files_reuse_their_manifest_entry(tmp_path):
+    write_snapshot(tmp_path, {"a.txt": "alpha", "b.txt": "beta"})
+    previous = read_manifest(str(tmp_path))
+
+    with SnapshotWriter(str(tmp_path)) as writer:
+        assert writer.link("a.txt", snapshot_file(previous, "a.txt", str(tmp_path)), previous["files"]["a.txt"])
+        assert not writer.link("c.txt", str(tmp_path / "missing.txt"), {})
+        with open(writer.path("b.txt"), "w", encoding="utf-8") as f:
+            f.write("BETA")
+
+    manifest = read_manifest(str(tmp_path))
+    assert manifest["files"]["a.txt"] == previous["files"]["a.txt"]
+    assert sorted(manifest["files"]) == ["a.txt", "b.txt"]
+    assert os.path.samefile(
+        snapshot_file(manifest, "a.txt", str(tmp_path)), snapshot_file(previous, "a.txt", str(tmp_path))
+    )
+    assert verify_snapshot(manifest, str(tmp_path), deep=True)
@@ -0,0 +1,95 @@
+import numpy as np
+
+from rag_system import reciprocal_rank_fusion
+from sparse_index import MAX_SEGMENTS, SparseIndex, tokenize
+
+TEXTS = {
+    1: "ЦБ сохранил ключевую ставку 21%",
+    2: "Рубль укрепился к доллару",
+    3: "Сбербанк $SBER отчитался о рекордной прибыли",
+    4: "Ключевую ставку могут снизить в июне",
+}
+
+
+def build(ids):
+    index = SparseIndex()
+    index.add(list(ids), [TEXTS[i] for i in ids])
+    return index
+
+
+def test_tokenize_keeps_tickers_and_percentages():
+    assert tokenize("Ставка 16,5% и $SBER") == ["ставка", "16,5%", "и", "$sber"]
+
+
+def test_search_ranks_matching_documents_only():
+    scores, ids = build(TEXTS).search("ключевую ставку")
+
+    assert sorted(ids.tolist()) == [1, 4]
+    assert np.all(np.diff(scores) <= 0)
+    assert build(TEXTS).search("нефть")[1].tolist() == []
+
+
+def test_remove_and_replace_keep_document_frequencies_exact():
+    index = build(TEXTS)
+    index.remove([4, 99])
+    index.add([2], ["Ключевую ставку оставили"])
+
+    expected = SparseIndex()
+    expected.add([1, 3, 2], [TEXTS[1], TEXTS[3], "Ключевую ставку оставили"])
+    assert len(index) == 3
+    assert np.array_equal(index.df, expected.df)
+    assert index.live_ids().tolist() == [1, 2, 3]
+    assert sorted(index.search("ставку")[1].tolist()) == [1, 2]
+
+
+def test_segments_are_merged_and_tombstones_dropped():
+    index = SparseIndex()
+    for doc_id, text in TEXTS.items():
+        index.add([doc_id], [text])
+    index.remove([3])
+    for i in range(MAX_SEGMENTS):
+        index.add([100 + i], [f"пост {i}"])
+
+    assert len(index.segments) <= MAX_SEGMENTS
+    index.compact()
+    assert len(index.segments) == 1
+    assert -1 not in index.slot_ids.tolist()
+    assert index.search("сбербанк")[1].tolist() == []
+
+
+def test_save_load_round_trip(tmp_path):
+    index = build(TEXTS)
+    index.remove([2])
+    path = str(tmp_path / "sparse.npz")
+    index.save(path)
+
+    loaded = SparseIndex.load(path)
+
+    assert len(loaded) == 3
+    assert np.array_equal(loaded.df, index.df)
+    for query in ("ключевую ставку", "рубль", "$SBER прибыль"):
+        np.testing.assert_array_equal(loaded.search(query)[1], index.search(query)[1])
+        np.testing.assert_allclose(loaded.search(query)[0], index.search(query)[0])
+    loaded.add([5], ["Рубль ослаб"])
+    assert loaded.search("рубль")[1].tolist() == [5]
+
+
+def test_rrf_prefers_ids_ranked_by_both_lists():
+    ids, scores = reciprocal_rank_fusion([np.array([1, 2, 3]), np.array([3, 4, 1])], k=60, top_k=3)
+
+    assert ids.tolist() == [1, 3, 2]
+    assert scores[0] == 1 / 61 + 1 / 63
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_lexical_results_when_embedding_fails(make_rag):
+    rag = make_rag()
+
+    def unavailable(texts, timeout=None):
+        raise TimeoutError("embedding API down")
+
+    rag.embedding_backend.embed = unavailable
+    docs = rag.get_relevant_documents("Сбербанк дивиденды")
+
+    assert docs
+    assert all("Сбербанк" in doc["text"] or "дивиденды" in doc["text"] for doc in docs)
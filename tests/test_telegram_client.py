@@ -0,0 +1,106 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import telegram_client
+from telegram_client import fetch_channel, get_channel_messages, load_high_water_marks, save_high_water_marks
+
+
+def post(message_id, text="новость"):
+    return SimpleNamespace(id=message_id, text=text, media=None, date=datetime(2024, 10, 1, tzinfo=timezone.utc))
+
+
+class FakeTelegramClient:
+    """Serves each channel's posts newest first, the way get_messages pages them."""
+
+    def __init__(self, channels):
+        self.channels = channels
+        self.calls = []
+
+    async def get_entity(self, channel_username):
+        return channel_username
+
+    async def get_messages(self, entity, limit, offset_id=0, min_id=0):
+        self.calls.append((entity, limit, offset_id, min_id))
+        newest_first = sorted(self.channels[entity], key=lambda m: m.id, reverse=True)
+        page = [m for m in newest_first if m.id > min_id and (not offset_id or m.id < offset_id)]
+        return page[:limit]
+
+    async def start(self, phone=None):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def fetch(client, channel, min_id=0, limit=None):
+    return asyncio.run(fetch_channel(client, channel, min_id, limit, asyncio.Semaphore(1)))
+
+
+def test_high_water_marks_round_trip(tmp_path):
+    state_file = str(tmp_path / "telegram_state.json")
+    assert load_high_water_marks(state_file) == {}
+
+    save_high_water_marks([
+        {"link": "https://t.me/finprofit/10"},
+        {"link": "https://t.me/finprofit/12"},
+        {"link": "https://ru.investing.com/news/1"},
+    ], state_file)
+    save_high_water_marks([
+        {"link": "https://t.me/finprofit/11"},
+        {"link": "https://t.me/ecotopor/5"},
+    ], state_file)
+
+    assert load_high_water_marks(state_file) == {"@finprofit": 12, "@ecotopor": 5}
+    assert list(tmp_path.iterdir()) == [tmp_path / "telegram_state.json"]
+
+
+def test_limit_is_paged_past_page_size(monkeypatch):
+    monkeypatch.setattr(telegram_client, "PAGE_SIZE", 3)
+    client = FakeTelegramClient({"@finprofit": [post(i) for i in range(1, 21)]})
+
+    messages = fetch(client, "@finprofit", limit=7)
+
+    assert [m["link"] for m in messages] == [f"https://t.me/finprofit/{i}" for i in range(20, 13, -1)]
+    assert [limit for _, limit, _, _ in client.calls] == [3, 3, 1]
+    assert [offset_id for _, _, offset_id, _ in client.calls] == [0, 18, 15]
+
+
+def test_paging_stops_at_the_high_water_mark(monkeypatch):
+    monkeypatch.setattr(telegram_client, "PAGE_SIZE", 3)
+    client = FakeTelegramClient({"@finprofit": [post(i) for i in range(1, 21)]})
+
+    messages = fetch(client, "@finprofit", min_id=13)
+
+    assert [m["link"] for m in messages] == [f"https://t.me/finprofit/{i}" for i in range(20, 13, -1)]
+    assert len(client.calls) == 3
+
+
+def test_posts_without_text_are_skipped():
+    client = FakeTelegramClient({"@finprofit": [post(1), post(2, text=""), post(3)]})
+
+    messages = fetch(client, "@finprofit", limit=10)
+
+    assert [m["link"] for m in messages] == ["https://t.me/finprofit/3", "https://t.me/finprofit/1"]
+    assert messages[0] == {"text": "новость", "link": "https://t.me/finprofit/3", "date": "2024-10-01T00:00:00+00:00"}
+
+
+def test_channels_resume_from_their_marks(monkeypatch, tmp_path):
+    state_file = tmp_path / "telegram_state.json"
+    state_file.write_text(json.dumps({"@finprofit": 18}), encoding="utf-8")
+    client = FakeTelegramClient({
+        "@finprofit": [post(i) for i in range(1, 21)],
+        "@ecotopor": [post(i) for i in range(1, 21)],
+    })
+    monkeypatch.setattr(telegram_client, "TelegramClient", lambda *args: client)
+    monkeypatch.setattr(telegram_client, "channel_username_list", ["@finprofit", "@ecotopor"])
+
+    messages = asyncio.run(get_channel_messages(limit=5, state_file=str(state_file)))
+
+    links = [m["link"] for m in messages]
+    assert links[:2] == ["https://t.me/finprofit/20", "https://t.me/finprofit/19"]
+    assert links[2:] == [f"https://t.me/ecotopor/{i}" for i in range(20, 15, -1)]
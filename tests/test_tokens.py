@@ -0,0 +1,36 @@
+import tokens
+
+
+class OfflineTiktoken:
+    """tiktoken whose encodings cannot be downloaded."""
+
+    @staticmethod
+    def get_encoding(name):
+        raise ConnectionError("no network")
+
+
+def test_falls_back_to_byte_estimate_when_encoding_cannot_load(monkeypatch):
+    monkeypatch.setattr(tokens, "tiktoken", OfflineTiktoken)
+    monkeypatch.setattr(tokens, "_encodings", {})
+    text = "Ключевая ставка 21%"
+
+    assert tokens.count_tokens(text) == len(text.encode("utf-8")) // 3 + 1
+    truncated = tokens.truncate_tokens(text * 20, 10)
+    assert truncated.endswith("…")
+    assert tokens.count_tokens(truncated) <= 10
+
+
+def test_failed_encoding_load_is_not_retried(monkeypatch):
+    calls = []
+
+    class CountingTiktoken:
+        @staticmethod
+        def get_encoding(name):
+            calls.append(name)
+            raise ConnectionError("no network")
+
+    monkeypatch.setattr(tokens, "tiktoken", CountingTiktoken)
+    monkeypatch.setattr(tokens, "_encodings", {})
+    tokens.count_tokens("a")
+    tokens.count_tokens("b")
+    assert calls == ["cl100k_base"]